@@ -1,19 +1,37 @@
-from flask import Flask, request, abort
+from flask import Flask, request, abort, jsonify
 from linebot import LineBotApi, WebhookHandler
 from linebot.exceptions import InvalidSignatureError
 from linebot.models import (
-    MessageEvent, TextMessage, TextSendMessage,
-    QuickReply, QuickReplyButton, MessageAction,
-    FlexSendMessage
+    MessageEvent, TextMessage, TextSendMessage
 )
 import os
 from datetime import datetime, timedelta
-import sqlite3
-from collections import defaultdict
-import threading
 import time
 import re
 import logging
+import atexit
+import hmac
+from functools import partial
+from collections import namedtuple
+
+from config import Config
+from webhook_queue import WebhookQueue
+from game_registry import GameRegistry
+from session_store import VersionConflict, SQLiteSessionStore, create_store
+from router import CommandRouter
+from profile_cache import ProfileCache
+from outbound import OutboundDispatcher, ReplyBuffer
+import flex_templates
+import quick_replies
+from leaderboard import Leaderboard, GroupLeaderboards
+from rank_index import RankIndex
+from db_pool import ConnectionPool
+from db_writer import DBWriter
+from score_buffer import ScoreBuffer, merge_pending, merge_pending_rows, utc_timestamp, ALL_GAMES
+from compactor import HistoryCompactor
+from snapshots import SnapshotManager
+from checkpoint import Checkpointer, claim_slot, slot_path
+from timers import TimerWheel
 
 # إعداد السجلات (Logging)
 logging.basicConfig(
@@ -24,6 +42,7 @@ logger = logging.getLogger(__name__)
 
 # استيراد الألعاب
 try:
+    from games.base_game import DisplayName
     from games.iq_game import IQGame
     from games.word_color_game import WordColorGame
     from games.chain_words_game import ChainWordsGame
@@ -39,6 +58,7 @@ try:
     from games.opposite_game import OppositeGame
     from games.emoji_game import EmojiGame
     from games.song_game import SongGame
+    from games import state as game_state
     logger.info("تم استيراد جميع الألعاب بنجاح")
 except Exception as e:
     logger.error(f"خطأ في استيراد الألعاب: {e}")
@@ -57,6 +77,17 @@ if LINE_CHANNEL_SECRET == 'YOUR_CHANNEL_SECRET':
 line_bot_api = LineBotApi(LINE_CHANNEL_ACCESS_TOKEN)
 handler = WebhookHandler(LINE_CHANNEL_SECRET)
 
+# جميع الردود تمر عبر مرسل واحد بجلسة HTTP مشتركة بحجم عدد العمال
+outbound = OutboundDispatcher(
+    LINE_CHANNEL_ACCESS_TOKEN,
+    base_url=Config.LINE_API_BASE_URL,
+    pool_size=Config.WEBHOOK_WORKERS,
+    max_retries=Config.OUTBOUND_MAX_RETRIES,
+    backoff=Config.OUTBOUND_BACKOFF_SECONDS,
+    timeout=Config.OUTBOUND_TIMEOUT_SECONDS,
+    dead_letter_path=Config.DEAD_LETTER_PATH
+)
+
 # إعدادات Gemini AI (دعم متعدد المفاتيح)
 GEMINI_API_KEYS = [
     os.getenv('GEMINI_API_KEY_1', ''),
@@ -86,14 +117,43 @@ def switch_gemini_key():
         return True
     return False
 
-# تخزين الألعاب النشطة واللاعبين المسجلين
-active_games = {}
-registered_players = set()
-user_message_count = defaultdict(lambda: {'count': 0, 'reset_time': datetime.now()})
+def attach_game(game):
+    """إعادة ربط لعبة محمّلة من مخزن الجلسات بخدمات هذه العملية"""
+    game.line_bot_api = line_bot_api
+    if hasattr(game, 'use_ai'):
+        game.get_api_key = get_gemini_api_key
+        game.switch_key = switch_gemini_key
 
-# قفل thread-safe للوصول للبيانات المشتركة
-games_lock = threading.Lock()
-players_lock = threading.Lock()
+# تخزين الألعاب النشطة واللاعبين المسجلين وعدادات الرسائل
+session_store = create_store(
+    Config.SESSION_STORE,
+    shards=Config.GAME_REGISTRY_SHARDS,
+    path=Config.SESSION_STORE_PATH,
+    url=Config.REDIS_URL
+)
+# ملفات الألعاب المحلية لكل عملية gunicorn: slot نقطة الحفظ يحدد ملف الألعاب النائمة أيضاً
+slot_claim = None if session_store.shared else claim_slot(Config.CHECKPOINT_PATH)
+hibernate_path = None
+if slot_claim is not None and Config.GAME_IDLE_SECONDS > 0:
+    hibernate_path = slot_path(Config.HIBERNATE_PATH, slot_claim[0])
+registry = GameRegistry(
+    store=session_store,
+    attach=attach_game,
+    codec=game_state,
+    cold_store=SQLiteSessionStore(hibernate_path) if hibernate_path else None,
+    # عمل السجل على لعبة (انتهاء المهلة، تحديث المشاركين) يمر بطابورها
+    run=lambda game_id, task: run_in_background(game_id, task)
+)
+
+# الألعاب والتسجيلات في الذاكرة تُحفظ دورياً وتُستعاد هنا قبل استقبال الأحداث
+checkpointer = None
+if not registry.shared and Config.CHECKPOINT_INTERVAL_SECONDS > 0:
+    checkpointer = Checkpointer(registry, Config.CHECKPOINT_PATH,
+                                interval=Config.CHECKPOINT_INTERVAL_SECONDS, claim=slot_claim,
+                                companions=[Config.HIBERNATE_PATH] if hibernate_path else [])
+    checkpointer.restore()
+    checkpointer.start()
+    atexit.register(checkpointer.stop)
 
 # دالة تطبيع النص
 def normalize_text(text):
@@ -112,527 +172,517 @@ def normalize_text(text):
 # قاعدة البيانات
 DB_NAME = 'game_scores.db'
 
+DB_OPTIONS = dict(
+    busy_timeout_ms=Config.DB_BUSY_TIMEOUT_MS,
+    cache_size_kb=Config.DB_CACHE_SIZE_KB,
+    mmap_size_mb=Config.DB_MMAP_SIZE_MB
+)
+
+# كل الكتابات تمر عبر thread واحد؛ القراءة عبر اتصالات للقراءة فقط
+writer = DBWriter(
+    DB_NAME,
+    batch_size=Config.DB_WRITER_BATCH_SIZE,
+    interval_ms=Config.SCORE_FLUSH_INTERVAL_MS,
+    auto_vacuum='INCREMENTAL',
+    **DB_OPTIONS
+)
+writer.start()
+atexit.register(writer.stop)
+
+db = ConnectionPool(DB_NAME, readonly=True, **DB_OPTIONS)
+
 def get_db_connection():
-    """إنشاء اتصال آمن بقاعدة البيانات"""
-    conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """اتصال القراءة الدائم لهذا الـ thread - الكتابة عبر writer فقط"""
+    return db.connection()
+
+def add_column_if_missing(c, table, column, definition):
+    """ترحيل بسيط: إضافة عمود لجدول قديم إذا لم يكن موجوداً - يعيد True عند الإضافة"""
+    columns = [row['name'] for row in c.execute(f'PRAGMA table_info({table})')]
+    if column not in columns:
+        c.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        logger.info(f"تمت إضافة العمود {column} إلى {table}")
+        return True
+    return False
+
+def create_schema(conn):
+    """إنشاء الجداول والفهارس وترحيل الجداول القديمة"""
+    c = conn.cursor()
+    
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+                 (user_id TEXT PRIMARY KEY, 
+                  display_name TEXT,
+                  total_points INTEGER DEFAULT 0,
+                  games_played INTEGER DEFAULT 0,
+                  wins INTEGER DEFAULT 0,
+                  last_played TEXT,
+                  registered_at TEXT DEFAULT CURRENT_TIMESTAMP)''')
+    
+    c.execute('''CREATE TABLE IF NOT EXISTS game_history
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  user_id TEXT,
+                  game_type TEXT,
+                  points INTEGER,
+                  won INTEGER,
+                  played_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                  FOREIGN KEY (user_id) REFERENCES users(user_id))''')
+    
+    # جلسة لعب واحدة لكل لعبة منتهية - سطور game_history ترتبط بها
+    c.execute('''CREATE TABLE IF NOT EXISTS game_sessions
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  game_type TEXT,
+                  chat_id TEXT,
+                  status TEXT,
+                  players INTEGER,
+                  winner_id TEXT,
+                  started_at TEXT,
+                  ended_at TEXT)''')
+    add_column_if_missing(c, 'game_history', 'session_id', 'INTEGER REFERENCES game_sessions(id)')
+    if add_column_if_missing(c, 'game_history', 'group_id', 'TEXT'):
+        c.execute('''UPDATE game_history SET group_id = 
+                         (SELECT chat_id FROM game_sessions WHERE game_sessions.id = game_history.session_id)
+                     WHERE session_id IS NOT NULL''')
+    
+    # مجموع نقاط كل لاعب في كل مجموعة - يُحدّث مع كل جلسة مسجلة
+    group_scores_exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'group_scores'"
+    ).fetchone()
+    c.execute('''CREATE TABLE IF NOT EXISTS group_scores
+                 (group_id TEXT,
+                  user_id TEXT,
+                  display_name TEXT,
+                  total_points INTEGER DEFAULT 0,
+                  games_played INTEGER DEFAULT 0,
+                  wins INTEGER DEFAULT 0,
+                  last_played TEXT,
+                  PRIMARY KEY (group_id, user_id)) WITHOUT ROWID''')
+    if not group_scores_exists:
+        c.execute('''INSERT INTO group_scores 
+                     SELECT h.group_id, h.user_id, u.display_name, SUM(h.points), COUNT(*), SUM(h.won), MAX(h.played_at)
+                     FROM game_history h LEFT JOIN users u ON u.user_id = h.user_id
+                     WHERE h.group_id IS NOT NULL
+                     GROUP BY h.group_id, h.user_id''')
+    
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_user_points 
+                 ON users(total_points DESC)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_game_history_user 
+                 ON game_history(user_id, played_at)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_game_history_session 
+                 ON game_history(session_id)''')
+    # نقاط كل لاعب لكل يوم ونوع لعبة (و '*' لكل الألعاب) - الصدارة اليومية والأسبوعية والشهرية
+    # تجمع 31 صفاً على الأكثر لكل لاعب مهما كبر game_history
+    daily_scores_exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_scores'"
+    ).fetchone()
+    c.execute('''CREATE TABLE IF NOT EXISTS daily_scores
+                 (game_type TEXT,
+                  day TEXT,
+                  user_id TEXT,
+                  display_name TEXT,
+                  total_points INTEGER DEFAULT 0,
+                  games_played INTEGER DEFAULT 0,
+                  wins INTEGER DEFAULT 0,
+                  PRIMARY KEY (game_type, day, user_id)) WITHOUT ROWID''')
+    if not daily_scores_exists:
+        for game_type in ('h.game_type', f"'{ALL_GAMES}'"):
+            c.execute(f'''INSERT INTO daily_scores 
+                          SELECT {game_type}, substr(h.played_at, 1, 10), h.user_id, u.display_name,
+                                 SUM(h.points), COUNT(DISTINCT h.session_id), SUM(h.won)
+                          FROM game_history h LEFT JOIN users u ON u.user_id = h.user_id
+                          WHERE h.played_at IS NOT NULL
+                          GROUP BY 1, 2, 3''')
+    
+    # فهرس يغطي صدارة المجموعة: قراءة مدى واحد من الفهرس دون الرجوع للجدول
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_group_scores_rank 
+                 ON group_scores(group_id, total_points DESC, user_id, display_name, games_played, wins)''')
+    
+    # رقم آخر دفعة نقاط مكتوبة لكل عملية (ScoreBuffer.consistent_read)
+    c.execute('''CREATE TABLE IF NOT EXISTS score_flushes
+                 (pid INTEGER PRIMARY KEY,
+                  seq INTEGER)''')
+    
+    # اختيار الصدارة في كل مجموعة - مشترك بين كل العمليات
+    c.execute('''CREATE TABLE IF NOT EXISTS chat_settings
+                 (chat_id TEXT PRIMARY KEY,
+                  global_leaderboard INTEGER DEFAULT 0) WITHOUT ROWID''')
 
 def init_db():
-    """إنشاء جداول قاعدة البيانات"""
+    """إنشاء جداول قاعدة البيانات عبر الكاتب"""
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        
-        c.execute('''CREATE TABLE IF NOT EXISTS users
-                     (user_id TEXT PRIMARY KEY, 
-                      display_name TEXT,
-                      total_points INTEGER DEFAULT 0,
-                      games_played INTEGER DEFAULT 0,
-                      wins INTEGER DEFAULT 0,
-                      last_played TEXT,
-                      registered_at TEXT DEFAULT CURRENT_TIMESTAMP)''')
-        
-        c.execute('''CREATE TABLE IF NOT EXISTS game_history
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                      user_id TEXT,
-                      game_type TEXT,
-                      points INTEGER,
-                      won INTEGER,
-                      played_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                      FOREIGN KEY (user_id) REFERENCES users(user_id))''')
-        
-        c.execute('''CREATE INDEX IF NOT EXISTS idx_user_points 
-                     ON users(total_points DESC)''')
-        c.execute('''CREATE INDEX IF NOT EXISTS idx_game_history_user 
-                     ON game_history(user_id, played_at)''')
-        
-        conn.commit()
-        conn.close()
+        writer.call(create_schema)
         logger.info("تم إنشاء قاعدة البيانات بنجاح")
     except Exception as e:
         logger.error(f"خطأ في إنشاء قاعدة البيانات: {e}")
 
 init_db()
 
-def update_user_points(user_id, display_name, points, won=False, game_type=""):
-    """تحديث نقاط المستخدم"""
+score_buffer = ScoreBuffer(
+    writer.pool,
+    max_rows=Config.SCORE_FLUSH_MAX_ROWS,
+    on_full=writer.wake
+)
+writer.add_periodic(score_buffer.flush)
+
+# حذف السجل الأقدم من مدة الاحتفاظ - ملخصه باقٍ في daily_scores
+# الحذف نهائي فلا يعمل إلا إذا حُددت HISTORY_RETENTION_DAYS صراحة
+compactor = None
+if Config.HISTORY_RETENTION_DAYS > 0:
+    compactor = HistoryCompactor(
+        writer.pool,
+        retention_days=Config.HISTORY_RETENTION_DAYS,
+        batch_size=Config.COMPACTION_BATCH_SIZE,
+        vacuum_pages=Config.COMPACTION_VACUUM_PAGES,
+        interval=Config.COMPACTION_INTERVAL_SECONDS
+    )
+    writer.add_periodic(compactor)
+
+# نسخ احتياطية متسقة أثناء التشغيل - مجدولة إن حُددت مدة، ويدوياً عبر /admin/snapshot
+snapshots = SnapshotManager(
+    DB_NAME,
+    Config.SNAPSHOT_DIR,
+    keep=Config.SNAPSHOT_KEEP,
+    pages=Config.SNAPSHOT_PAGES_PER_STEP,
+    sleep_ms=Config.SNAPSHOT_STEP_SLEEP_MS,
+    compress=Config.SNAPSHOT_COMPRESS,
+    interval=Config.SNAPSHOT_INTERVAL_SECONDS
+)
+snapshots.start_schedule()
+atexit.register(snapshots.stop)
+
+def record_game_session(game_id, game_data, status):
+    """تسجيل جلسة لعب منتهية: صف في game_sessions ومجموع كل لاعب في معاملة واحدة
+
+    status: completed عند انتهاء الأسئلة، stopped عند الإيقاف أو البدء بلعبة أخرى، expired عند انتهاء المهلة
+    """
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        
-        c.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-        user = c.fetchone()
-        
-        if user:
-            new_points = user['total_points'] + points
-            new_games = user['games_played'] + 1
-            new_wins = user['wins'] + (1 if won else 0)
-            c.execute('''UPDATE users SET total_points = ?, games_played = ?, 
-                         wins = ?, last_played = ?, display_name = ?
-                         WHERE user_id = ?''',
-                      (new_points, new_games, new_wins, datetime.now().isoformat(), 
-                       display_name, user_id))
-        else:
-            c.execute('''INSERT INTO users (user_id, display_name, total_points, 
-                         games_played, wins, last_played) VALUES (?, ?, ?, ?, ?, ?)''',
-                      (user_id, display_name, points, 1, 1 if won else 0, 
-                       datetime.now().isoformat()))
-        
-        if game_type:
-            c.execute('''INSERT INTO game_history (user_id, game_type, points, won) 
-                         VALUES (?, ?, ?, ?)''',
-                      (user_id, game_type, points, 1 if won else 0))
+        players = game_data['game'].session_results()
+        if not players:
+            return False
+        score_buffer.add_session(game_data['type'], game_id, status,
+                                 utc_timestamp(game_data['created_at']), players)
         
-        conn.commit()
-        conn.close()
-        logger.info(f"تم تحديث نقاط {display_name}: +{points}")
+        for player in players:
+            stats = get_user_stats(player['user_id'])
+            if stats:
+                leaderboard.record(player['user_id'], player['display_name'], stats['total_points'],
+                                   stats['games_played'], stats['wins'])
+                rank_index.update(player['user_id'], player['display_name'], stats['total_points'])
+            group_stats = get_group_stats(game_id, player['user_id'])
+            if group_stats:
+                group_leaderboards.record(game_id, player['user_id'], player['display_name'],
+                                          group_stats['total_points'], group_stats['games_played'],
+                                          group_stats['wins'])
+        logger.info(f"تم تسجيل جلسة {game_data['type']} في {game_id}: {len(players)} لاعبين ({status})")
         return True
     except Exception as e:
-        logger.error(f"خطأ في تحديث النقاط: {e}")
+        logger.error(f"خطأ في تسجيل جلسة اللعب: {e}")
         return False
 
 def get_user_stats(user_id):
-    """الحصول على إحصائيات المستخدم"""
+    """الحصول على إحصائيات المستخدم مع النقاط التي لم تُكتب بعد"""
     try:
         conn = get_db_connection()
-        c = conn.cursor()
-        c.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-        user = c.fetchone()
-        conn.close()
-        return user
+        user, delta = score_buffer.consistent_read(conn, lambda seen: (
+            conn.execute('SELECT * FROM users WHERE user_id = ?', (user_id,)).fetchone(),
+            score_buffer.pending(user_id, seen)
+        ))
+        return merge_pending(user_id, user, delta)
     except Exception as e:
         logger.error(f"خطأ في الحصول على الإحصائيات: {e}")
         return None
 
+def load_leaderboard(limit):
+    """قراءة أعلى اللاعبين من قاعدة البيانات مع دمج النقاط المعلقة - تُستدعى من Leaderboard فقط"""
+    conn = get_db_connection()
+    
+    def read(seen):
+        c = conn.cursor()
+        c.execute('''SELECT user_id, display_name, total_points, games_played, wins 
+                     FROM users ORDER BY total_points DESC LIMIT ?''', (limit,))
+        rows = {row['user_id']: row for row in c.fetchall()}
+        pending = score_buffer.pending_all(seen)
+        
+        # لاعبون لديهم نقاط معلقة من خارج القائمة قد يدخلونها بعد الدمج
+        missing = [user_id for user_id in pending if user_id not in rows]
+        if missing:
+            placeholders = ','.join('?' * len(missing))
+            c.execute(f'''SELECT user_id, display_name, total_points, games_played, wins 
+                          FROM users WHERE user_id IN ({placeholders})''', missing)
+            rows.update((row['user_id'], row) for row in c.fetchall())
+        return rows, pending
+    
+    rows, pending = score_buffer.consistent_read(conn, read)
+    return merge_pending_rows(rows, pending, limit)
+
+leaderboard = Leaderboard(
+    load_leaderboard,
+    size=Config.LEADERBOARD_SIZE,
+    refresh_interval=Config.LEADERBOARD_REFRESH_SECONDS
+)
+
 def get_leaderboard(limit=10):
-    """الحصول على لوحة الصدارة"""
+    """الحصول على لوحة الصدارة من الذاكرة"""
+    return leaderboard.top(limit)
+
+def get_group_stats(group_id, user_id):
+    """مجموع اللاعب داخل مجموعة واحدة مع النقاط التي لم تُكتب بعد"""
     try:
         conn = get_db_connection()
-        c = conn.cursor()
-        c.execute('''SELECT display_name, total_points, games_played, wins 
-                     FROM users ORDER BY total_points DESC LIMIT ?''', (limit,))
-        leaders = c.fetchall()
-        conn.close()
-        return leaders
+        row, delta = score_buffer.consistent_read(conn, lambda seen: (
+            conn.execute('''SELECT user_id, display_name, total_points, games_played, wins 
+                            FROM group_scores WHERE group_id = ? AND user_id = ?''',
+                         (group_id, user_id)).fetchone(),
+            score_buffer.pending_group(group_id, user_id, seen)
+        ))
+        return merge_pending(user_id, row, delta)
     except Exception as e:
-        logger.error(f"خطأ في الحصول على الصدارة: {e}")
-        return []
+        logger.error(f"خطأ في الحصول على نقاط المجموعة: {e}")
+        return None
 
-def check_rate_limit(user_id, max_messages=20, time_window=60):
-    """فحص حد المعدل"""
-    now = datetime.now()
-    user_data = user_message_count[user_id]
+def load_group_leaderboard(group_id, limit):
+    """أعلى لاعبي مجموعة من group_scores عبر الفهرس المغطي - تُستدعى من GroupLeaderboards فقط"""
+    conn = get_db_connection()
     
-    if now - user_data['reset_time'] > timedelta(seconds=time_window):
-        user_data['count'] = 0
-        user_data['reset_time'] = now
+    def read(seen):
+        c = conn.cursor()
+        c.execute('''SELECT user_id, display_name, total_points, games_played, wins 
+                     FROM group_scores WHERE group_id = ? 
+                     ORDER BY total_points DESC LIMIT ?''', (group_id, limit))
+        rows = {row['user_id']: row for row in c.fetchall()}
+        pending = score_buffer.pending_group(group_id, seen=seen)
+        
+        missing = [user_id for user_id in pending if user_id not in rows]
+        if missing:
+            placeholders = ','.join('?' * len(missing))
+            c.execute(f'''SELECT user_id, display_name, total_points, games_played, wins 
+                          FROM group_scores WHERE group_id = ? AND user_id IN ({placeholders})''',
+                      [group_id] + missing)
+            rows.update((row['user_id'], row) for row in c.fetchall())
+        return rows, pending
     
-    if user_data['count'] >= max_messages:
+    rows, pending = score_buffer.consistent_read(conn, read)
+    return merge_pending_rows(rows, pending, limit)
+
+group_leaderboards = GroupLeaderboards(
+    load_group_leaderboard,
+    size=Config.LEADERBOARD_SIZE,
+    refresh_interval=Config.LEADERBOARD_REFRESH_SECONDS,
+    max_groups=Config.GROUP_LEADERBOARDS_MAX
+)
+
+def uses_global_leaderboard(chat_id):
+    """هل اختارت المجموعة الصدارة العامة بدل صدارة المجموعة"""
+    try:
+        row = get_db_connection().execute(
+            'SELECT global_leaderboard FROM chat_settings WHERE chat_id = ?', (chat_id,)
+        ).fetchone()
+        return bool(row and row['global_leaderboard'])
+    except Exception as e:
+        logger.error(f"خطأ في قراءة إعدادات المجموعة: {e}")
+        return False
+
+def set_global_leaderboard(chat_id, enabled):
+    """حفظ اختيار الصدارة للمجموعة عبر الكاتب"""
+    writer.submit(partial(_save_global_leaderboard, chat_id, int(enabled)))
+
+def _save_global_leaderboard(chat_id, enabled, conn):
+    conn.execute('''INSERT INTO chat_settings (chat_id, global_leaderboard) VALUES (?, ?)
+                    ON CONFLICT(chat_id) DO UPDATE SET global_leaderboard = excluded.global_leaderboard''',
+                 (chat_id, enabled))
+
+# الصدارة خلال فترة: عدد الأيام بما فيها اليوم الحالي
+PERIODS = {
+    'اليوم': 1,
+    'الأسبوع': 7,
+    'الشهر': 30
+}
+
+def period_start(period):
+    """أول يوم (YYYY-MM-DD بتوقيت UTC مثل daily_scores) داخل الفترة"""
+    return utc_timestamp(datetime.now() - timedelta(days=PERIODS[period] - 1))[:10]
+
+def load_period_leaderboard(key, limit):
+    """أعلى اللاعبين خلال فترة من daily_scores مع دمج النقاط المعلقة - key هو (الفترة، نوع اللعبة)"""
+    period, game_type = key
+    since = period_start(period)
+    conn = get_db_connection()
+    rows, pending = score_buffer.consistent_read(conn, lambda seen: (
+        {row['user_id']: row for row in conn.execute(
+            '''SELECT user_id, MAX(display_name) AS display_name, SUM(total_points) AS total_points,
+                      SUM(games_played) AS games_played, SUM(wins) AS wins
+               FROM daily_scores WHERE game_type = ? AND day >= ?
+               GROUP BY user_id''', (game_type, since))},
+        score_buffer.pending_daily(game_type, since, seen)
+    ))
+    return merge_pending_rows(rows, pending, limit)
+
+# لوحة لكل (فترة، نوع لعبة) تُعاد قراءتها دورياً فقط
+period_leaderboards = GroupLeaderboards(
+    load_period_leaderboard,
+    size=Config.LEADERBOARD_SIZE,
+    refresh_interval=Config.PERIOD_LEADERBOARD_REFRESH_SECONDS,
+    max_groups=len(PERIODS) * 32
+)
+
+def load_rank_rows():
+    """كل اللاعبين ونقاطهم مع النقاط المعلقة - تُستدعى من RankIndex فقط"""
+    conn = get_db_connection()
+    rows, pending = score_buffer.consistent_read(conn, lambda seen: (
+        {row['user_id']: row for row in conn.execute(
+            'SELECT user_id, display_name, total_points, games_played, wins FROM users')},
+        score_buffer.pending_all(seen)
+    ))
+    return merge_pending_rows(rows, pending)
+
+rank_index = RankIndex(
+    load_rank_rows,
+    bucket_width=Config.RANK_BUCKET_WIDTH,
+    refresh_interval=Config.RANK_REFRESH_SECONDS
+)
+
+def check_rate_limit(user_id, max_messages=20, time_window=60):
+    """فحص حد المعدل - العداد في مخزن الجلسات فيشمل كل العمليات"""
+    if session_store.hit(user_id, time_window) > max_messages:
         logger.warning(f"تجاوز حد الرسائل: {user_id}")
         return False
-    
-    user_data['count'] += 1
     return True
 
-def cleanup_old_games():
-    """تنظيف الألعاب القديمة"""
-    while True:
-        try:
-            time.sleep(300)
-            now = datetime.now()
-            to_delete = []
-            
-            with games_lock:
-                for game_id, game_data in active_games.items():
-                    if now - game_data.get('created_at', now) > timedelta(minutes=10):
-                        to_delete.append(game_id)
-                
-                for game_id in to_delete:
-                    del active_games[game_id]
-                    logger.info(f"تم حذف لعبة قديمة: {game_id}")
-        except Exception as e:
-            logger.error(f"خطأ في التنظيف: {e}")
-
-cleanup_thread = threading.Thread(target=cleanup_old_games, daemon=True)
-cleanup_thread.start()
-
-def get_quick_reply():
-    """الأزرار الثابتة - ألعاب فقط"""
-    return QuickReply(items=[
-        QuickReplyButton(action=MessageAction(label="أسرع", text="أسرع")),
-        QuickReplyButton(action=MessageAction(label="ذكاء", text="ذكاء")),
-        QuickReplyButton(action=MessageAction(label="لون", text="كلمة ولون")),
-        QuickReplyButton(action=MessageAction(label="أغنية", text="أغنية")),
-        QuickReplyButton(action=MessageAction(label="سلسلة", text="سلسلة")),
-        QuickReplyButton(action=MessageAction(label="ترتيب", text="ترتيب الحروف")),
-        QuickReplyButton(action=MessageAction(label="تكوين", text="تكوين كلمات")),
-        QuickReplyButton(action=MessageAction(label="لعبة", text="لعبة")),
-        QuickReplyButton(action=MessageAction(label="خمن", text="خمن")),
-        QuickReplyButton(action=MessageAction(label="ضد", text="ضد")),
-        QuickReplyButton(action=MessageAction(label="ذاكرة", text="ذاكرة")),
-        QuickReplyButton(action=MessageAction(label="لغز", text="لغز")),
-        QuickReplyButton(action=MessageAction(label="رياضيات", text="رياضيات"))
-    ])
+# عمل مؤجل يُنفذ في عمال طابور الأحداث - key يرتبه مع أحداث نفس المجموعة
+BackgroundTask = namedtuple('BackgroundTask', ['key', 'run'])
+
+def run_in_background(key, task):
+    """إخراج عمل ثقيل (قراءات قاعدة البيانات) من thread المؤقتات الوحيد
+
+    مع الطابور غير المتزامن يُنفذ في عماله، وإلا (أو إذا امتلأ) يُنفذ هنا مباشرة
+    """
+    if Config.ASYNC_WEBHOOK and webhook_queue.submit_all([BackgroundTask(key, task)]):
+        return
+    task()
+
+def expire_game(game_id, game_data):
+    """تسجيل لعبة انتهت مهلتها دون نشاط - في عامل مجموعتها عبر run_in_background"""
+    record_game_session(game_id, game_data, 'expired')
+    logger.info(f"انتهت مهلة اللعبة: {game_id}")
+
+def arm_orphan_games():
+    """مهلة لألعاب المخزن المشترك التي ليس لها مؤقت هنا (أنشأتها عملية انتهت مثلاً)"""
+    try:
+        registry.arm_expiry()
+    except Exception as e:
+        logger.error(f"خطأ في ضبط مهل الألعاب: {e}")
+    finally:
+        timers.schedule(Config.CLEANUP_INTERVAL_SECONDS, run_in_background, 'maintenance', arm_orphan_games)
+
+def hibernate_idle_games():
+    """إخراج الألعاب الخاملة من الذاكرة - تعود مع أول رسالة في مجموعتها"""
+    try:
+        count = registry.hibernate_idle(Config.GAME_IDLE_SECONDS)
+        if count:
+            logger.info(f"نُقلت {count} لعبة خاملة إلى القرص")
+    except Exception as e:
+        logger.error(f"خطأ في نقل الألعاب الخاملة: {e}")
+    finally:
+        timers.schedule(max(1, Config.GAME_IDLE_SECONDS // 4), run_in_background, 'maintenance',
+                        hibernate_idle_games)
+
+def refresh_rank_index():
+    """إعادة بناء ترتيب اللاعبين من قاعدة البيانات خارج مسار الطلبات"""
+    try:
+        rank_index.refresh()
+    finally:
+        timers.schedule(rank_index.refresh_interval, run_in_background, 'rank_index', refresh_rank_index)
+
+# مهلة كل لعبة تبدأ من آخر نشاط فيها، وكل المؤقتات على thread جدولة واحد
+# يسلم الأعمال الثقيلة لعمال الطابور (run_in_background) - يبدأ بعد إنشاء الطابور
+timers = TimerWheel(tick=Config.TIMER_TICK_SECONDS)
+registry.use_timers(timers, Config.GAME_TIMEOUT_MINUTES * 60, expire_game)
+if registry.shared:
+    timers.schedule(Config.CLEANUP_INTERVAL_SECONDS, run_in_background, 'maintenance', arm_orphan_games)
+if Config.GAME_IDLE_SECONDS > 0:
+    timers.schedule(max(1, Config.GAME_IDLE_SECONDS // 4), run_in_background, 'maintenance',
+                    hibernate_idle_games)
+timers.schedule(0, run_in_background, 'rank_index', refresh_rank_index)
+
+def get_quick_reply(running_game=None):
+    """الأزرار الثابتة - ألعاب فقط، مع إخفاء زر اللعبة الجارية إن وُجدت"""
+    if running_game:
+        return quick_replies.MAIN.without(running_game)
+    return quick_replies.MAIN
 
 def get_more_quick_reply():
     """أزرار إضافية"""
-    return QuickReply(items=[
-        QuickReplyButton(action=MessageAction(label="إيموجي", text="إيموجي")),
-        QuickReplyButton(action=MessageAction(label="توافق", text="توافق")),
-        QuickReplyButton(action=MessageAction(label="مساعدة", text="مساعدة"))
-    ])
-
-def get_help_message():
-    """رسالة المساعدة - تصميم أنيق"""
-    return {
-        "type": "bubble",
-        "size": "mega",
-        "header": {
-            "type": "box",
-            "layout": "vertical",
-            "contents": [
-                {
-                    "type": "text",
-                    "text": "دليل الاستخدام",
-                    "weight": "bold",
-                    "size": "xxl",
-                    "color": "#1a1a1a",
-                    "align": "center"
-                }
-            ],
-            "backgroundColor": "#ffffff",
-            "paddingAll": "20px"
-        },
-        "body": {
-            "type": "box",
-            "layout": "vertical",
-            "contents": [
-                {
-                    "type": "box",
-                    "layout": "vertical",
-                    "contents": [
-                        {
-                            "type": "text",
-                            "text": "الأوامر الأساسية",
-                            "weight": "bold",
-                            "size": "lg",
-                            "color": "#2a2a2a",
-                            "margin": "none"
-                        },
-                        {
-                            "type": "separator",
-                            "margin": "md",
-                            "color": "#e8e8e8"
-                        }
-                    ],
-                    "margin": "none",
-                    "spacing": "sm"
-                },
-                {
-                    "type": "box",
-                    "layout": "vertical",
-                    "contents": [
-                        {
-                            "type": "box",
-                            "layout": "horizontal",
-                            "contents": [
-                                {
-                                    "type": "text",
-                                    "text": "انضم",
-                                    "size": "sm",
-                                    "color": "#1a1a1a",
-                                    "flex": 2,
-                                    "weight": "bold"
-                                },
-                                {
-                                    "type": "text",
-                                    "text": "التسجيل في البوت",
-                                    "size": "sm",
-                                    "color": "#6a6a6a",
-                                    "flex": 5,
-                                    "wrap": True
-                                }
-                            ],
-                            "spacing": "md"
-                        },
-                        {
-                            "type": "box",
-                            "layout": "horizontal",
-                            "contents": [
-                                {
-                                    "type": "text",
-                                    "text": "انسحب",
-                                    "size": "sm",
-                                    "color": "#1a1a1a",
-                                    "flex": 2,
-                                    "weight": "bold"
-                                },
-                                {
-                                    "type": "text",
-                                    "text": "إلغاء التسجيل",
-                                    "size": "sm",
-                                    "color": "#6a6a6a",
-                                    "flex": 5,
-                                    "wrap": True
-                                }
-                            ],
-                            "spacing": "md"
-                        },
-                        {
-                            "type": "box",
-                            "layout": "horizontal",
-                            "contents": [
-                                {
-                                    "type": "text",
-                                    "text": "نقاطي",
-                                    "size": "sm",
-                                    "color": "#1a1a1a",
-                                    "flex": 2,
-                                    "weight": "bold"
-                                },
-                                {
-                                    "type": "text",
-                                    "text": "عرض إحصائياتك",
-                                    "size": "sm",
-                                    "color": "#6a6a6a",
-                                    "flex": 5,
-                                    "wrap": True
-                                }
-                            ],
-                            "spacing": "md"
-                        },
-                        {
-                            "type": "box",
-                            "layout": "horizontal",
-                            "contents": [
-                                {
-                                    "type": "text",
-                                    "text": "الصدارة",
-                                    "size": "sm",
-                                    "color": "#1a1a1a",
-                                    "flex": 2,
-                                    "weight": "bold"
-                                },
-                                {
-                                    "type": "text",
-                                    "text": "أفضل اللاعبين",
-                                    "size": "sm",
-                                    "color": "#6a6a6a",
-                                    "flex": 5,
-                                    "wrap": True
-                                }
-                            ],
-                            "spacing": "md"
-                        },
-                        {
-                            "type": "box",
-                            "layout": "horizontal",
-                            "contents": [
-                                {
-                                    "type": "text",
-                                    "text": "إيقاف",
-                                    "size": "sm",
-                                    "color": "#1a1a1a",
-                                    "flex": 2,
-                                    "weight": "bold"
-                                },
-                                {
-                                    "type": "text",
-                                    "text": "إنهاء اللعبة الحالية",
-                                    "size": "sm",
-                                    "color": "#6a6a6a",
-                                    "flex": 5,
-                                    "wrap": True
-                                }
-                            ],
-                            "spacing": "md"
-                        }
-                    ],
-                    "spacing": "md",
-                    "margin": "md"
-                },
-                {
-                    "type": "box",
-                    "layout": "vertical",
-                    "contents": [
-                        {
-                            "type": "text",
-                            "text": "أثناء اللعب",
-                            "weight": "bold",
-                            "size": "lg",
-                            "color": "#2a2a2a",
-                            "margin": "none"
-                        },
-                        {
-                            "type": "separator",
-                            "margin": "md",
-                            "color": "#e8e8e8"
-                        }
-                    ],
-                    "margin": "xl",
-                    "spacing": "sm"
-                },
-                {
-                    "type": "box",
-                    "layout": "vertical",
-                    "contents": [
-                        {
-                            "type": "box",
-                            "layout": "horizontal",
-                            "contents": [
-                                {
-                                    "type": "text",
-                                    "text": "لمح",
-                                    "size": "sm",
-                                    "color": "#1a1a1a",
-                                    "flex": 2,
-                                    "weight": "bold"
-                                },
-                                {
-                                    "type": "text",
-                                    "text": "الحصول على تلميح",
-                                    "size": "sm",
-                                    "color": "#6a6a6a",
-                                    "flex": 5,
-                                    "wrap": True
-                                }
-                            ],
-                            "spacing": "md"
-                        },
-                        {
-                            "type": "box",
-                            "layout": "horizontal",
-                            "contents": [
-                                {
-                                    "type": "text",
-                                    "text": "جاوب",
-                                    "size": "sm",
-                                    "color": "#1a1a1a",
-                                    "flex": 2,
-                                    "weight": "bold"
-                                },
-                                {
-                                    "type": "text",
-                                    "text": "عرض الإجابة الصحيحة",
-                                    "size": "sm",
-                                    "color": "#6a6a6a",
-                                    "flex": 5,
-                                    "wrap": True
-                                }
-                            ],
-                            "spacing": "md"
-                        }
-                    ],
-                    "spacing": "md",
-                    "margin": "md"
-                }
-            ],
-            "spacing": "md",
-            "backgroundColor": "#ffffff",
-            "paddingAll": "20px"
-        },
-        "footer": {
-            "type": "box",
-            "layout": "vertical",
-            "contents": [
-                {
-                    "type": "separator",
-                    "color": "#e8e8e8"
-                },
-                {
-                    "type": "box",
-                    "layout": "horizontal",
-                    "contents": [
-                        {
-                            "type": "button",
-                            "action": {
-                                "type": "message",
-                                "label": "انضم",
-                                "text": "انضم"
-                            },
-                            "style": "primary",
-                            "color": "#2a2a2a",
-                            "height": "sm"
-                        },
-                        {
-                            "type": "button",
-                            "action": {
-                                "type": "message",
-                                "label": "نقاطي",
-                                "text": "نقاطي"
-                            },
-                            "style": "secondary",
-                            "height": "sm"
-                        },
-                        {
-                            "type": "button",
-                            "action": {
-                                "type": "message",
-                                "label": "الصدارة",
-                                "text": "الصدارة"
-                            },
-                            "style": "secondary",
-                            "height": "sm"
-                        }
-                    ],
-                    "spacing": "sm",
-                    "margin": "md"
-                },
-                {
-                    "type": "text",
-                    "text": "تم إنشاء هذا البوت بواسطة عبير الدوسري",
-                    "size": "xs",
-                    "color": "#9a9a9a",
-                    "align": "center",
-                    "wrap": True,
-                    "margin": "md"
-                }
-            ],
-            "backgroundColor": "#f8f8f8",
-            "paddingAll": "16px"
-        }
-    }
+    return quick_replies.MORE
 
-def get_user_profile_safe(user_id):
-    """الحصول على معلومات المستخدم"""
+def fetch_display_name(user_id):
+    """جلب اسم العرض من LINE مباشرة"""
+    return line_bot_api.get_profile(user_id).display_name
+
+def load_display_name(user_id):
+    """اسم العرض المحفوظ في قاعدة البيانات"""
     try:
-        profile = line_bot_api.get_profile(user_id)
-        return profile.display_name
+        conn = get_db_connection()
+        c = conn.cursor()
+        c.execute('SELECT display_name FROM users WHERE user_id = ?', (user_id,))
+        row = c.fetchone()
+        return row['display_name'] if row else None
     except Exception as e:
-        logger.error(f"خطأ في الحصول على الملف الشخصي: {e}")
-        return "مستخدم"
+        logger.error(f"خطأ في قراءة اسم المستخدم: {e}")
+        return None
+
+def save_display_name(user_id, display_name):
+    """تحديث اسم العرض للمستخدمين الموجودين فقط"""
+    writer.submit(partial(_update_display_name, user_id, display_name))
+
+def _update_display_name(user_id, display_name, conn):
+    conn.execute('UPDATE users SET display_name = ? WHERE user_id = ?', (display_name, user_id))
+
+profile_cache = ProfileCache(
+    fetch_display_name,
+    max_size=Config.PROFILE_CACHE_SIZE,
+    ttl=Config.PROFILE_CACHE_TTL,
+    stale_ttl=Config.PROFILE_CACHE_STALE_TTL,
+    negative_ttl=Config.PROFILE_CACHE_NEGATIVE_TTL,
+    load_persisted=load_display_name if Config.PROFILE_CACHE_PERSIST else None,
+    persist=save_display_name if Config.PROFILE_CACHE_PERSIST else None
+)
+profile_cache.start()
 
-def start_game(game_id, game_class, game_type, user_id, event):
+def get_user_profile_safe(user_id):
+    """الحصول على اسم المستخدم من الذاكرة المؤقتة"""
+    return profile_cache.get(user_id)
+
+def get_game_id(source):
+    """معرف اللعبة: المجموعة إن وجدت وإلا المستخدم"""
+    return source.group_id if hasattr(source, 'group_id') else source.user_id
+
+def get_push_target(source):
+    """وجهة push البديلة لمصدر الحدث"""
+    return getattr(source, 'group_id', None) or getattr(source, 'room_id', None) or source.user_id
+
+
+def start_game(ctx, game_class, game_type):
     """دالة موحدة لبدء الألعاب"""
+    game_id = ctx.game_id
     try:
-        with games_lock:
-            if game_class in [IQGame, WordColorGame, LettersWordsGame, HumanAnimalPlantGame]:
-                game = game_class(line_bot_api, use_ai=USE_AI, 
-                                get_api_key=get_gemini_api_key, 
-                                switch_key=switch_gemini_key)
-            else:
-                game = game_class(line_bot_api)
-            
-            with players_lock:
-                participants = registered_players.copy()
-                participants.add(user_id)
-            
-            active_games[game_id] = {
-                'game': game,
-                'type': game_type,
-                'created_at': datetime.now(),
-                'participants': participants
-            }
+        # إنشاء اللعبة (خلط بنك الأسئلة) خارج أي قفل
+        if game_class in [IQGame, WordColorGame, LettersWordsGame, HumanAnimalPlantGame]:
+            game = game_class(line_bot_api, use_ai=USE_AI, 
+                            get_api_key=get_gemini_api_key, 
+                            switch_key=switch_gemini_key)
+        else:
+            game = game_class(line_bot_api)
         
+        # السؤال الأول يُجهز قبل الحفظ حتى تُحفظ اللعبة بحالتها بعد البدء
         response = game.start_game()
-        line_bot_api.reply_message(event.reply_token, response)
+        previous = registry.put(game_id, game, game_type, registry.participants_for(ctx.user_id))
+        if previous:
+            record_game_session(game_id, previous, 'stopped')
+        
+        ctx.replies.add(response)
         logger.info(f"بدأت لعبة {game_type} في {game_id}")
         return True
     except Exception as e:
         logger.error(f"خطأ في بدء اللعبة {game_type}: {e}")
-        line_bot_api.reply_message(
-            event.reply_token,
+        ctx.replies.add(
             TextSendMessage(
                 text=f"❌ حدث خطأ في بدء لعبة {game_type}. حاول مرة أخرى.",
                 quick_reply=get_quick_reply()
@@ -659,8 +709,8 @@ def home():
                 <h2>✅ الخادم يعمل بنجاح</h2>
                 <p>البوت جاهز لاستقبال الرسائل</p>
                 <p><strong>الألعاب المتاحة:</strong> 15 لعبة</p>
-                <p><strong>اللاعبون المسجلون:</strong> {len(registered_players)}</p>
-                <p><strong>الألعاب النشطة:</strong> {len(active_games)}</p>
+                <p><strong>اللاعبون المسجلون:</strong> {registry.players_count()}</p>
+                <p><strong>الألعاب النشطة:</strong> {registry.games_count()}</p>
             </div>
         </body>
     </html>
@@ -672,828 +722,355 @@ def callback():
     signature = request.headers.get('X-Line-Signature', '')
     body = request.get_data(as_text=True)
     
+    if not Config.ASYNC_WEBHOOK:
+        try:
+            handler.handle(body, signature)
+        except InvalidSignatureError:
+            logger.error("توقيع غير صالح")
+            abort(400)
+        except Exception as e:
+            logger.error(f"خطأ في معالجة webhook: {e}")
+        return 'OK'
+    
+    # التحقق من التوقيع ثم وضع الأحداث في الطابور والرد فوراً
+    started = time.perf_counter()
     try:
-        handler.handle(body, signature)
+        events = handler.parser.parse(body, signature)
     except InvalidSignatureError:
         logger.error("توقيع غير صالح")
         abort(400)
     except Exception as e:
-        logger.error(f"خطأ في معالجة webhook: {e}")
+        logger.error(f"خطأ في قراءة webhook: {e}")
+        return 'OK'
+    webhook_queue.timers['verify'].add(time.perf_counter() - started)
+    
+    if not webhook_queue.submit_all(events):
+        # رفض الدفعة كاملة حتى يعيد LINE إرسالها بدل كسر ترتيب المجموعة
+        logger.warning("طابور الأحداث ممتلئ - تم رفض الدفعة")
+        return 'Busy', 503
     
     return 'OK'
 
+@app.route("/stats", methods=['GET'])
+def stats():
+    """إحصائيات الأداء"""
+    return jsonify({
+        'active_games': registry.games_count(),
+        'registered_players': registry.players_count(),
+        'sessions': registry.stats(),
+        'checkpoint': checkpointer.stats() if checkpointer else None,
+        'timers': timers.stats(),
+        'webhook': webhook_queue.stats(),
+        'profile_cache': profile_cache.stats(),
+        'outbound': outbound.stats(),
+        'leaderboard': leaderboard.stats(),
+        'group_leaderboards': group_leaderboards.stats(),
+        'period_leaderboards': period_leaderboards.stats(),
+        'rank_index': rank_index.stats(),
+        'db': db.stats(),
+        'db_writer': writer.stats(),
+        'score_buffer': score_buffer.stats(),
+        'compaction': compactor.stats() if compactor else None,
+        'snapshots': snapshots.stats()
+    })
+
+@app.route("/admin/snapshot", methods=['POST'])
+def admin_snapshot():
+    """بدء نسخة احتياطية في الخلفية - يتطلب ADMIN_TOKEN في الترويسة X-Admin-Token"""
+    # رد مباشر بدل abort: معالج الأخطاء العام يحول كل استثناء إلى 500
+    if not Config.ADMIN_TOKEN:
+        return jsonify({'error': 'غير مفعل'}), 404
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode(), Config.ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'غير مصرح'}), 403
+    
+    compress = request.args.get('compress')
+    if compress is not None:
+        compress = compress.lower() in ('1', 'true')
+    if not snapshots.trigger(compress):
+        return jsonify({'started': False, 'reason': 'نسخة أخرى جارية'}), 409
+    return jsonify({'started': True, 'last': snapshots.stats()['last']}), 202
+
+class MessageContext:
+    """بيانات الرسالة الحالية التي تحتاجها معالجات الأوامر"""
+    __slots__ = ('event', 'user_id', 'game_id', 'display_name', 'text', 'replies')
+    
+    def __init__(self, event, user_id, game_id, display_name, text, replies):
+        self.event = event
+        self.user_id = user_id
+        self.game_id = game_id
+        self.display_name = display_name
+        self.text = text
+        self.replies = replies
+
+def cmd_menu(ctx):
+    """قائمة البداية"""
+    ctx.replies.add(flex_templates.render_menu(ctx.display_name, quick_reply=get_quick_reply()))
+
+def cmd_more(ctx):
+    """الألعاب الإضافية"""
+    ctx.replies.add(flex_templates.MORE.render(quick_reply=get_more_quick_reply()))
+
+def cmd_help(ctx):
+    """رسالة المساعدة"""
+    ctx.replies.add(flex_templates.HELP.render(quick_reply=get_quick_reply()))
+
+def cmd_stats(ctx):
+    """إحصائيات اللاعب"""
+    user_id = ctx.user_id
+    
+    stats = get_user_stats(user_id)
+    if stats:
+        ctx.replies.add(flex_templates.render_stats(
+            ctx.display_name, stats, registry.is_registered(user_id),
+            rank_info=rank_index.rank(user_id), quick_reply=get_quick_reply()
+        ))
+    else:
+        ctx.replies.add(
+            TextSendMessage(text="لم تلعب أي لعبة بعد\n\nاكتب 'انضم' للتسجيل والبدء", quick_reply=get_quick_reply())
+        )
+
+def cmd_leaderboard(ctx):
+    """لوحة الصدارة - داخل المجموعة حسب آخر اختيار (المجموعة افتراضياً)"""
+    in_group = ctx.game_id != ctx.user_id
+    if in_group and not uses_global_leaderboard(ctx.game_id):
+        show_leaderboard(ctx, group_leaderboards.get(ctx.game_id), flex_templates.GROUP_LEADERBOARD)
+    else:
+        show_leaderboard(ctx, leaderboard,
+                         flex_templates.GLOBAL_LEADERBOARD if in_group else flex_templates.LEADERBOARD)
+
+def cmd_global_leaderboard(ctx):
+    """الصدارة العامة وجعلها الافتراضية في هذه المجموعة"""
+    if ctx.game_id == ctx.user_id:
+        show_leaderboard(ctx, leaderboard, flex_templates.LEADERBOARD)
+        return
+    set_global_leaderboard(ctx.game_id, True)
+    show_leaderboard(ctx, leaderboard, flex_templates.GLOBAL_LEADERBOARD)
+
+def cmd_group_leaderboard(ctx):
+    """صدارة المجموعة وجعلها الافتراضية من جديد"""
+    if ctx.game_id == ctx.user_id:
+        ctx.replies.add(
+            TextSendMessage(text="صدارة المجموعة متاحة داخل المجموعات فقط", quick_reply=get_quick_reply())
+        )
+        return
+    set_global_leaderboard(ctx.game_id, False)
+    show_leaderboard(ctx, group_leaderboards.get(ctx.game_id), flex_templates.GROUP_LEADERBOARD)
+
+def cmd_period_leaderboard(ctx, period, game_type=ALL_GAMES):
+    """الصدارة خلال اليوم أو الأسبوع أو الشهر - لكل الألعاب أو لنوع واحد"""
+    title = f"صدارة {period}" if game_type == ALL_GAMES else f"صدارة {period} - {game_type}"
+    show_leaderboard(ctx, period_leaderboards.get((period, game_type)),
+                     flex_templates.PERIOD_LEADERBOARD, subtitle=title)
+
+def show_leaderboard(ctx, board, template, **values):
+    """عرض لوحة صدارة (عامة أو لمجموعة أو لفترة) بالقالب المناسب"""
+    if board.top():
+        # الصفوف تُرسم مرة واحدة لكل تغيير في القائمة
+        rows = board.rendered(flex_templates.render_leaderboard_rows)
+        ctx.replies.add(template.render(quick_reply=get_quick_reply(), rows=rows, **values))
+    else:
+        ctx.replies.add(
+            TextSendMessage(text="لا توجد بيانات بعد", quick_reply=get_quick_reply())
+        )
+
+def cmd_stop(ctx):
+    """إيقاف اللعبة الحالية"""
+    game_id = ctx.game_id
+    
+    game_data = registry.remove(game_id)
+    if game_data:
+        record_game_session(game_id, game_data, 'stopped')
+        ctx.replies.add(
+            TextSendMessage(text=f"تم إيقاف لعبة {game_data['type']}", quick_reply=get_quick_reply())
+        )
+    else:
+        ctx.replies.add(
+            TextSendMessage(text="لا توجد لعبة نشطة", quick_reply=get_quick_reply())
+        )
+
+def cmd_join(ctx):
+    """تسجيل اللاعب"""
+    user_id = ctx.user_id
+    display_name = ctx.display_name
+    
+    if not registry.register(user_id):
+        ctx.replies.add(
+            TextSendMessage(text=f"أنت مسجل بالفعل يا {display_name}\n\nيمكنك اللعب في جميع الألعاب", quick_reply=get_quick_reply())
+        )
+    else:
+        ctx.replies.add(flex_templates.render_join(display_name, quick_reply=get_quick_reply()))
+        logger.info(f"انضم لاعب جديد: {display_name}")
+
+def cmd_leave(ctx):
+    """انسحاب اللاعب"""
+    user_id = ctx.user_id
+    display_name = ctx.display_name
+    
+    if registry.unregister(user_id):
+        ctx.replies.add(
+            TextSendMessage(text=f"تم انسحابك يا {display_name}\n\nيمكنك الانضمام مرة أخرى بكتابة 'انضم'", quick_reply=get_quick_reply())
+        )
+        logger.info(f"انسحب لاعب: {display_name}")
+    else:
+        ctx.replies.add(
+            TextSendMessage(text="أنت غير مسجل\n\nاكتب 'انضم' للتسجيل", quick_reply=get_quick_reply())
+        )
+
+def cmd_start_game(ctx, game_class, game_type):
+    """بدء لعبة"""
+    start_game(ctx, game_class, game_type)
+
+def cmd_compatibility(ctx):
+    """بدء لعبة التوافق"""
+    game = CompatibilityGame(line_bot_api)
+    previous = registry.put(ctx.game_id, game, 'توافق', registry.participants_for(ctx.user_id))
+    if previous:
+        record_game_session(ctx.game_id, previous, 'stopped')
+    
+    ctx.replies.add(
+        TextSendMessage(text="💖 لعبة التوافق!\n\nاكتب اسمين مفصولين بمسافة\nمثال: أحمد فاطمة", quick_reply=get_quick_reply())
+    )
+
+def build_command_router():
+    """بناء جدول الأوامر مرة واحدة عند التشغيل"""
+    router = CommandRouter()
+    router.add(['البداية', 'ابدأ', 'start', 'قائمة', 'البوت'], cmd_menu)
+    router.add(['أكثر', 'المزيد', 'more'], cmd_more)
+    router.add(['مساعدة'], cmd_help)
+    router.add(['نقاطي'], cmd_stats)
+    router.add(['الصدارة'], cmd_leaderboard)
+    router.add(['الصدارة العامة'], cmd_global_leaderboard)
+    router.add(['صدارة المجموعة'], cmd_group_leaderboard)
+    router.add(['إيقاف', 'ايقاف', 'stop'], cmd_stop)
+    router.add(['انضم', 'تسجيل', 'join'], cmd_join)
+    router.add(['انسحب', 'خروج', 'leave'], cmd_leave)
+    
+    # بدء الألعاب
+    games_map = [
+        (['ذكاء'], IQGame, 'ذكاء'),
+        (['كلمة ولون', 'لون'], WordColorGame, 'كلمة ولون'),
+        (['سلسلة'], ChainWordsGame, 'سلسلة'),
+        (['ترتيب الحروف', 'ترتيب'], ScrambleWordGame, 'ترتيب'),
+        (['تكوين كلمات', 'تكوين'], LettersWordsGame, 'تكوين'),
+        (['أسرع'], FastTypingGame, 'أسرع'),
+        (['لعبة'], HumanAnimalPlantGame, 'لعبة'),
+        (['خمن'], GuessGame, 'خمن'),
+        (['رياضيات'], MathGame, 'رياضيات'),
+        (['ذاكرة'], MemoryGame, 'ذاكرة'),
+        (['لغز'], RiddleGame, 'لغز'),
+        (['ضد'], OppositeGame, 'ضد'),
+        (['إيموجي'], EmojiGame, 'إيموجي'),
+        (['أغنية'], SongGame, 'أغنية')
+    ]
+    for names, game_class, game_type in games_map:
+        router.add(names, partial(cmd_start_game, game_class=game_class, game_type=game_type))
+    router.add(['توافق'], cmd_compatibility)
+    
+    # صدارة اليوم/الأسبوع/الشهر، ومع اسم اللعبة لنوع واحد: "صدارة الأسبوع ذكاء"
+    game_types = [game_type for _, _, game_type in games_map] + ['توافق']
+    for period in PERIODS:
+        router.add([f"صدارة {period}"], partial(cmd_period_leaderboard, period=period))
+        for game_type in game_types:
+            router.add([f"صدارة {period} {game_type}"],
+                       partial(cmd_period_leaderboard, period=period, game_type=game_type))
+    return router
+
+command_router = build_command_router()
+
 @handler.add(MessageEvent, message=TextMessage)
 def handle_message(event):
     """معالج الرسائل الرئيسي - محسّن للسرعة"""
+    # كل الردود على الحدث تُجمع وتُرسل في طلب reply_message واحد
+    replies = ReplyBuffer(outbound, event.reply_token, to=get_push_target(event.source))
+    try:
+        handle_text_message(event, replies)
+    finally:
+        replies.flush()
+
+def apply_answer(game_id, game_data, text, user_id, display_name):
+    """تطبيق الرسالة على اللعبة وحفظها - يعيد (result, finished)
+
+    مع مخزن جلسات مشترك قد تعدل عملية أخرى نفس اللعبة في الأثناء، فتُحمّل من
+    جديد وتُطبق الرسالة عليها مرة أخرى
+    """
+    for _ in range(3):
+        game = game_data['game']
+        result = game.check_answer(text, user_id, display_name)
+        try:
+            registry.save(game_id, game_data)
+        except VersionConflict:
+            game_data = registry.get(game_id)
+            if game_data is None:
+                return None, None
+            continue
+        finished = None
+        if result and result.get('game_over', False):
+            finished = registry.remove(game_id, game)
+        return result, finished
+    raise VersionConflict(game_id)
+
+def handle_text_message(event, replies):
+    """معالجة نص الرسالة وإضافة الردود إلى replies"""
     try:
         user_id = event.source.user_id
         text = event.message.text.strip()
         
         if not check_rate_limit(user_id):
-            line_bot_api.reply_message(
-                event.reply_token,
+            replies.add(
                 TextSendMessage(text="⚠️ عدد كبير من الرسائل! انتظر دقيقة.")
             )
             return
         
-        display_name = get_user_profile_safe(user_id)
-        game_id = event.source.group_id if hasattr(event.source, 'group_id') else user_id
-        
-        logger.info(f"رسالة من {display_name}: {text}")
-        
-        # الأوامر الأساسية
-        if text in ['البداية', 'ابدأ', 'start', 'قائمة', 'البوت']:
-            flex_message = {
-                "type": "bubble",
-                "size": "mega",
-                "header": {
-                    "type": "box",
-                    "layout": "vertical",
-                    "contents": [
-                        {
-                            "type": "text",
-                            "text": "منصة الألعاب",
-                            "weight": "bold",
-                            "size": "xxl",
-                            "color": "#1a1a1a",
-                            "align": "center"
-                        },
-                        {
-                            "type": "text",
-                            "text": f"مرحباً {display_name}",
-                            "size": "md",
-                            "color": "#6a6a6a",
-                            "align": "center",
-                            "margin": "sm"
-                        }
-                    ],
-                    "backgroundColor": "#ffffff",
-                    "paddingAll": "24px"
-                },
-                "body": {
-                    "type": "box",
-                    "layout": "vertical",
-                    "contents": [
-                        {
-                            "type": "box",
-                            "layout": "vertical",
-                            "contents": [
-                                {
-                                    "type": "text",
-                                    "text": "خطوات البدء",
-                                    "weight": "bold",
-                                    "size": "md",
-                                    "color": "#2a2a2a"
-                                },
-                                {
-                                    "type": "separator",
-                                    "margin": "md",
-                                    "color": "#e8e8e8"
-                                }
-                            ],
-                            "spacing": "sm"
-                        },
-                        {
-                            "type": "box",
-                            "layout": "vertical",
-                            "contents": [
-                                {
-                                    "type": "box",
-                                    "layout": "horizontal",
-                                    "contents": [
-                                        {
-                                            "type": "text",
-                                            "text": "1",
-                                            "size": "sm",
-                                            "color": "#ffffff",
-                                            "align": "center",
-                                            "weight": "bold",
-                                            "flex": 0
-                                        },
-                                        {
-                                            "type": "text",
-                                            "text": "اضغط على زر انضم للتسجيل",
-                                            "size": "sm",
-                                            "color": "#4a4a4a",
-                                            "flex": 1,
-                                            "margin": "md",
-                                            "wrap": True
-                                        }
-                                    ],
-                                    "backgroundColor": "#2a2a2a",
-                                    "cornerRadius": "md",
-                                    "paddingAll": "12px",
-                                    "spacing": "md"
-                                },
-                                {
-                                    "type": "box",
-                                    "layout": "horizontal",
-                                    "contents": [
-                                        {
-                                            "type": "text",
-                                            "text": "2",
-                                            "size": "sm",
-                                            "color": "#2a2a2a",
-                                            "align": "center",
-                                            "weight": "bold",
-                                            "flex": 0
-                                        },
-                                        {
-                                            "type": "text",
-                                            "text": "اختر لعبة من الأزرار أدناه",
-                                            "size": "sm",
-                                            "color": "#4a4a4a",
-                                            "flex": 1,
-                                            "margin": "md",
-                                            "wrap": True
-                                        }
-                                    ],
-                                    "backgroundColor": "#f5f5f5",
-                                    "cornerRadius": "md",
-                                    "paddingAll": "12px",
-                                    "spacing": "md",
-                                    "margin": "sm"
-                                },
-                                {
-                                    "type": "box",
-                                    "layout": "horizontal",
-                                    "contents": [
-                                        {
-                                            "type": "text",
-                                            "text": "3",
-                                            "size": "sm",
-                                            "color": "#2a2a2a",
-                                            "align": "center",
-                                            "weight": "bold",
-                                            "flex": 0
-                                        },
-                                        {
-                                            "type": "text",
-                                            "text": "ابدأ اللعب واجمع النقاط",
-                                            "size": "sm",
-                                            "color": "#4a4a4a",
-                                            "flex": 1,
-                                            "margin": "md",
-                                            "wrap": True
-                                        }
-                                    ],
-                                    "backgroundColor": "#f5f5f5",
-                                    "cornerRadius": "md",
-                                    "paddingAll": "12px",
-                                    "spacing": "md",
-                                    "margin": "sm"
-                                }
-                            ],
-                            "margin": "md"
-                        },
-                        {
-                            "type": "box",
-                            "layout": "vertical",
-                            "contents": [
-                                {
-                                    "type": "text",
-                                    "text": "15 لعبة متاحة",
-                                    "size": "xs",
-                                    "color": "#9a9a9a",
-                                    "align": "center"
-                                },
-                                {
-                                    "type": "text",
-                                    "text": "إجاباتك تُحسب تلقائياً بعد التسجيل",
-                                    "size": "xs",
-                                    "color": "#9a9a9a",
-                                    "align": "center",
-                                    "margin": "xs"
-                                }
-                            ],
-                            "margin": "lg"
-                        }
-                    ],
-                    "backgroundColor": "#ffffff",
-                    "paddingAll": "20px"
-                },
-                "footer": {
-                    "type": "box",
-                    "layout": "vertical",
-                    "contents": [
-                        {
-                            "type": "separator",
-                            "color": "#e8e8e8"
-                        },
-                        {
-                            "type": "box",
-                            "layout": "horizontal",
-                            "contents": [
-                                {
-                                    "type": "button",
-                                    "action": {
-                                        "type": "message",
-                                        "label": "انضم",
-                                        "text": "انضم"
-                                    },
-                                    "style": "primary",
-                                    "color": "#2a2a2a",
-                                    "height": "sm"
-                                },
-                                {
-                                    "type": "button",
-                                    "action": {
-                                        "type": "message",
-                                        "label": "مساعدة",
-                                        "text": "مساعدة"
-                                    },
-                                    "style": "secondary",
-                                    "height": "sm"
-                                }
-                            ],
-                            "spacing": "sm",
-                            "margin": "md"
-                        }
-                    ],
-                    "backgroundColor": "#f8f8f8",
-                    "paddingAll": "16px"
-                }
-            }
-            
-            line_bot_api.reply_message(
-                event.reply_token,
-                FlexSendMessage(alt_text="مرحباً", contents=flex_message, quick_reply=get_quick_reply())
-            )
-            return
-        
-        elif text in ['أكثر', 'المزيد', 'more']:
-            more_message = {
-                "type": "bubble",
-                "body": {
-                    "type": "box",
-                    "layout": "vertical",
-                    "contents": [
-                        {
-                            "type": "text",
-                            "text": "ألعاب إضافية",
-                            "weight": "bold",
-                            "size": "xl",
-                            "color": "#1a1a1a",
-                            "align": "center"
-                        },
-                        {
-                            "type": "separator",
-                            "margin": "lg",
-                            "color": "#e8e8e8"
-                        },
-                        {
-                            "type": "box",
-                            "layout": "vertical",
-                            "contents": [
-                                {
-                                    "type": "text",
-                                    "text": "اختر من الأزرار أدناه",
-                                    "size": "sm",
-                                    "color": "#6a6a6a",
-                                    "align": "center"
-                                }
-                            ],
-                            "margin": "lg"
-                        }
-                    ],
-                    "backgroundColor": "#ffffff",
-                    "paddingAll": "24px"
-                }
-            }
-            
-            line_bot_api.reply_message(
-                event.reply_token,
-                FlexSendMessage(alt_text="ألعاب إضافية", contents=more_message, quick_reply=get_more_quick_reply())
-            )
-            return
-        
-        elif text == 'مساعدة':
-            line_bot_api.reply_message(
-                event.reply_token,
-                FlexSendMessage(alt_text="مساعدة", contents=get_help_message(), quick_reply=get_quick_reply())
-            )
-            return
-        
-        elif text == 'نقاطي':
-            stats = get_user_stats(user_id)
-            if stats:
-                status = "مسجل" if user_id in registered_players else "غير مسجل"
-                status_color = "#2a2a2a" if user_id in registered_players else "#9a9a9a"
-                win_rate = (stats['wins'] / stats['games_played'] * 100) if stats['games_played'] > 0 else 0
-                
-                flex_stats = {
-                    "type": "bubble",
-                    "size": "mega",
-                    "header": {
-                        "type": "box",
-                        "layout": "vertical",
-                        "contents": [
-                            {
-                                "type": "text",
-                                "text": "إحصائياتك",
-                                "weight": "bold",
-                                "size": "xl",
-                                "color": "#1a1a1a",
-                                "align": "center"
-                            },
-                            {
-                                "type": "text",
-                                "text": display_name,
-                                "size": "sm",
-                                "color": "#6a6a6a",
-                                "align": "center",
-                                "margin": "sm"
-                            }
-                        ],
-                        "backgroundColor": "#ffffff",
-                        "paddingAll": "20px"
-                    },
-                    "body": {
-                        "type": "box",
-                        "layout": "vertical",
-                        "contents": [
-                            {
-                                "type": "box",
-                                "layout": "horizontal",
-                                "contents": [
-                                    {
-                                        "type": "text",
-                                        "text": "الحالة",
-                                        "size": "sm",
-                                        "color": "#6a6a6a",
-                                        "flex": 2
-                                    },
-                                    {
-                                        "type": "text",
-                                        "text": status,
-                                        "size": "sm",
-                                        "color": status_color,
-                                        "flex": 3,
-                                        "align": "end",
-                                        "weight": "bold"
-                                    }
-                                ]
-                            },
-                            {
-                                "type": "separator",
-                                "margin": "md",
-                                "color": "#e8e8e8"
-                            },
-                            {
-                                "type": "box",
-                                "layout": "horizontal",
-                                "contents": [
-                                    {
-                                        "type": "text",
-                                        "text": "النقاط",
-                                        "size": "sm",
-                                        "color": "#6a6a6a",
-                                        "flex": 2
-                                    },
-                                    {
-                                        "type": "text",
-                                        "text": str(stats['total_points']),
-                                        "size": "xl",
-                                        "color": "#1a1a1a",
-                                        "flex": 3,
-                                        "align": "end",
-                                        "weight": "bold"
-                                    }
-                                ],
-                                "margin": "md"
-                            },
-                            {
-                                "type": "separator",
-                                "margin": "md",
-                                "color": "#e8e8e8"
-                            },
-                            {
-                                "type": "box",
-                                "layout": "horizontal",
-                                "contents": [
-                                    {
-                                        "type": "text",
-                                        "text": "الألعاب",
-                                        "size": "sm",
-                                        "color": "#6a6a6a",
-                                        "flex": 2
-                                    },
-                                    {
-                                        "type": "text",
-                                        "text": str(stats['games_played']),
-                                        "size": "sm",
-                                        "color": "#2a2a2a",
-                                        "flex": 3,
-                                        "align": "end",
-                                        "weight": "bold"
-                                    }
-                                ],
-                                "margin": "md"
-                            },
-                            {
-                                "type": "box",
-                                "layout": "horizontal",
-                                "contents": [
-                                    {
-                                        "type": "text",
-                                        "text": "الفوز",
-                                        "size": "sm",
-                                        "color": "#6a6a6a",
-                                        "flex": 2
-                                    },
-                                    {
-                                        "type": "text",
-                                        "text": str(stats['wins']),
-                                        "size": "sm",
-                                        "color": "#2a2a2a",
-                                        "flex": 3,
-                                        "align": "end",
-                                        "weight": "bold"
-                                    }
-                                ],
-                                "margin": "sm"
-                            },
-                            {
-                                "type": "box",
-                                "layout": "horizontal",
-                                "contents": [
-                                    {
-                                        "type": "text",
-                                        "text": "نسبة الفوز",
-                                        "size": "sm",
-                                        "color": "#6a6a6a",
-                                        "flex": 2
-                                    },
-                                    {
-                                        "type": "text",
-                                        "text": f"{win_rate:.1f}%",
-                                        "size": "sm",
-                                        "color": "#2a2a2a",
-                                        "flex": 3,
-                                        "align": "end",
-                                        "weight": "bold"
-                                    }
-                                ],
-                                "margin": "sm"
-                            }
-                        ],
-                        "backgroundColor": "#ffffff",
-                        "paddingAll": "20px"
-                    },
-                    "footer": {
-                        "type": "box",
-                        "layout": "vertical",
-                        "contents": [
-                            {
-                                "type": "separator",
-                                "color": "#e8e8e8"
-                            },
-                            {
-                                "type": "button",
-                                "action": {
-                                    "type": "message",
-                                    "label": "الصدارة",
-                                    "text": "الصدارة"
-                                },
-                                "style": "secondary",
-                                "height": "sm",
-                                "margin": "md"
-                            }
-                        ],
-                        "backgroundColor": "#f8f8f8",
-                        "paddingAll": "16px"
-                    }
-                }
-                
-                line_bot_api.reply_message(
-                    event.reply_token,
-                    FlexSendMessage(alt_text="إحصائياتك", contents=flex_stats, quick_reply=get_quick_reply())
-                )
-            else:
-                line_bot_api.reply_message(
-                    event.reply_token,
-                    TextSendMessage(text="لم تلعب أي لعبة بعد\n\nاكتب 'انضم' للتسجيل والبدء", quick_reply=get_quick_reply())
-                )
-            return
-        
-        elif text == 'الصدارة':
-            leaders = get_leaderboard()
-            if leaders:
-                players_list = []
-                for i, leader in enumerate(leaders, 1):
-                    if i <= 3:
-                        rank_bg = "#4a4a4a"
-                        rank_color = "#ffffff"
-                        name_color = "#ffffff"
-                    else:
-                        rank_bg = "#f5f5f5"
-                        rank_color = "#2a2a2a"
-                        name_color = "#4a4a4a"
-                    
-                    player_box = {
-                        "type": "box",
-                        "layout": "horizontal",
-                        "contents": [
-                            {
-                                "type": "text",
-                                "text": str(i),
-                                "size": "sm",
-                                "color": rank_color,
-                                "align": "center",
-                                "weight": "bold",
-                                "flex": 0
-                            },
-                            {
-                                "type": "text",
-                                "text": leader['display_name'],
-                                "size": "sm",
-                                "color": name_color,
-                                "flex": 3,
-                                "margin": "md",
-                                "weight": "bold" if i <= 3 else "regular"
-                            },
-                            {
-                                "type": "text",
-                                "text": str(leader['total_points']),
-                                "size": "sm",
-                                "color": name_color,
-                                "flex": 1,
-                                "align": "end",
-                                "weight": "bold" if i <= 3 else "regular"
-                            }
-                        ],
-                        "backgroundColor": rank_bg,
-                        "cornerRadius": "md",
-                        "paddingAll": "12px",
-                        "spacing": "md",
-                        "margin": "xs" if i > 1 else "none"
-                    }
-                    players_list.append(player_box)
-                
-                flex_leaderboard = {
-                    "type": "bubble",
-                    "size": "mega",
-                    "header": {
-                        "type": "box",
-                        "layout": "vertical",
-                        "contents": [
-                            {
-                                "type": "text",
-                                "text": "لوحة الصدارة",
-                                "weight": "bold",
-                                "size": "xl",
-                                "color": "#1a1a1a",
-                                "align": "center"
-                            },
-                            {
-                                "type": "text",
-                                "text": "أفضل اللاعبين",
-                                "size": "sm",
-                                "color": "#6a6a6a",
-                                "align": "center",
-                                "margin": "sm"
-                            }
-                        ],
-                        "backgroundColor": "#ffffff",
-                        "paddingAll": "20px"
-                    },
-                    "body": {
-                        "type": "box",
-                        "layout": "vertical",
-                        "contents": players_list,
-                        "backgroundColor": "#ffffff",
-                        "paddingAll": "20px"
-                    },
-                    "footer": {
-                        "type": "box",
-                        "layout": "vertical",
-                        "contents": [
-                            {
-                                "type": "separator",
-                                "color": "#e8e8e8"
-                            },
-                            {
-                                "type": "button",
-                                "action": {
-                                    "type": "message",
-                                    "label": "نقاطي",
-                                    "text": "نقاطي"
-                                },
-                                "style": "secondary",
-                                "height": "sm",
-                                "margin": "md"
-                            }
-                        ],
-                        "backgroundColor": "#f8f8f8",
-                        "paddingAll": "16px"
-                    }
-                }
-                
-                line_bot_api.reply_message(
-                    event.reply_token,
-                    FlexSendMessage(alt_text="لوحة الصدارة", contents=flex_leaderboard, quick_reply=get_quick_reply())
-                )
-            else:
-                line_bot_api.reply_message(
-                    event.reply_token,
-                    TextSendMessage(text="لا توجد بيانات بعد", quick_reply=get_quick_reply())
-                )
-            return
-        
-        elif text in ['إيقاف', 'ايقاف', 'stop']:
-            with games_lock:
-                if game_id in active_games:
-                    game_type = active_games[game_id]['type']
-                    del active_games[game_id]
-                    line_bot_api.reply_message(
-                        event.reply_token,
-                        TextSendMessage(text=f"تم إيقاف لعبة {game_type}", quick_reply=get_quick_reply())
-                    )
-                else:
-                    line_bot_api.reply_message(
-                        event.reply_token,
-                        TextSendMessage(text="لا توجد لعبة نشطة", quick_reply=get_quick_reply())
-                    )
-            return
-        
-        elif text in ['انضم', 'تسجيل', 'join']:
-            with players_lock:
-                if user_id in registered_players:
-                    line_bot_api.reply_message(
-                        event.reply_token,
-                        TextSendMessage(text=f"أنت مسجل بالفعل يا {display_name}\n\nيمكنك اللعب في جميع الألعاب", quick_reply=get_quick_reply())
-                    )
-                else:
-                    registered_players.add(user_id)
-                    
-                    with games_lock:
-                        for gid, game_data in active_games.items():
-                            if 'participants' not in game_data:
-                                game_data['participants'] = set()
-                            game_data['participants'].add(user_id)
-                    
-                    join_message = {
-                        "type": "bubble",
-                        "body": {
-                            "type": "box",
-                            "layout": "vertical",
-                            "contents": [
-                                {
-                                    "type": "text",
-                                    "text": "تم التسجيل بنجاح",
-                                    "weight": "bold",
-                                    "size": "xl",
-                                    "color": "#1a1a1a",
-                                    "align": "center"
-                                },
-                                {
-                                    "type": "text",
-                                    "text": f"مرحباً بك {display_name}",
-                                    "size": "md",
-                                    "color": "#6a6a6a",
-                                    "align": "center",
-                                    "margin": "md"
-                                },
-                                {
-                                    "type": "separator",
-                                    "margin": "xl",
-                                    "color": "#e8e8e8"
-                                },
-                                {
-                                    "type": "text",
-                                    "text": "يمكنك الآن اللعب في جميع الألعاب\n\nإجاباتك ستُحسب تلقائياً",
-                                    "size": "sm",
-                                    "color": "#4a4a4a",
-                                    "align": "center",
-                                    "wrap": True,
-                                    "margin": "xl"
-                                }
-                            ],
-                            "backgroundColor": "#ffffff",
-                            "paddingAll": "28px"
-                        }
-                    }
-                    
-                    line_bot_api.reply_message(
-                        event.reply_token,
-                        FlexSendMessage(alt_text="تم التسجيل", contents=join_message, quick_reply=get_quick_reply())
-                    )
-                    logger.info(f"انضم لاعب جديد: {display_name}")
-            return
-        
-        elif text in ['انسحب', 'خروج', 'leave']:
-            with players_lock:
-                if user_id in registered_players:
-                    registered_players.remove(user_id)
-                    
-                    with games_lock:
-                        for gid, game_data in active_games.items():
-                            if 'participants' in game_data and user_id in game_data['participants']:
-                                game_data['participants'].remove(user_id)
-                    
-                    line_bot_api.reply_message(
-                        event.reply_token,
-                        TextSendMessage(text=f"تم انسحابك يا {display_name}\n\nيمكنك الانضمام مرة أخرى بكتابة 'انضم'", quick_reply=get_quick_reply())
-                    )
-                    logger.info(f"انسحب لاعب: {display_name}")
-                else:
-                    line_bot_api.reply_message(
-                        event.reply_token,
-                        TextSendMessage(text="أنت غير مسجل\n\nاكتب 'انضم' للتسجيل", quick_reply=get_quick_reply())
-                    )
-            return
+        # الاسم يُجلب فقط إذا احتاجه الأمر أو اللعبة
+        display_name = DisplayName(partial(get_user_profile_safe, user_id))
+        game_id = get_game_id(event.source)
         
-        # بدء الألعاب
-        games_map = {
-            'ذكاء': (IQGame, 'ذكاء'),
-            'كلمة ولون': (WordColorGame, 'كلمة ولون'),
-            'لون': (WordColorGame, 'كلمة ولون'),
-            'سلسلة': (ChainWordsGame, 'سلسلة'),
-            'ترتيب الحروف': (ScrambleWordGame, 'ترتيب'),
-            'ترتيب': (ScrambleWordGame, 'ترتيب'),
-            'تكوين كلمات': (LettersWordsGame, 'تكوين'),
-            'تكوين': (LettersWordsGame, 'تكوين'),
-            'أسرع': (FastTypingGame, 'أسرع'),
-            'لعبة': (HumanAnimalPlantGame, 'لعبة'),
-            'خمن': (GuessGame, 'خمن'),
-            'توافق': (CompatibilityGame, 'توافق'),
-            'رياضيات': (MathGame, 'رياضيات'),
-            'ذاكرة': (MemoryGame, 'ذاكرة'),
-            'لغز': (RiddleGame, 'لغز'),
-            'ضد': (OppositeGame, 'ضد'),
-            'إيموجي': (EmojiGame, 'إيموجي'),
-            'أغنية': (SongGame, 'أغنية')
-        }
+        logger.info(f"رسالة من {user_id}: {text}")
         
-        if text in games_map:
-            game_class, game_type = games_map[text]
-            
-            if text == 'توافق':
-                with games_lock:
-                    with players_lock:
-                        participants = registered_players.copy()
-                        participants.add(user_id)
-                    
-                    game = CompatibilityGame(line_bot_api)
-                    active_games[game_id] = {
-                        'game': game,
-                        'type': 'توافق',
-                        'created_at': datetime.now(),
-                        'participants': participants
-                    }
-                
-                line_bot_api.reply_message(
-                    event.reply_token,
-                    TextSendMessage(text="💖 لعبة التوافق!\n\nاكتب اسمين مفصولين بمسافة\nمثال: أحمد فاطمة", quick_reply=get_quick_reply())
-                )
-                return
-            
-            start_game(game_id, game_class, game_type, user_id, event)
+        ctx = MessageContext(event, user_id, game_id, display_name, text, replies)
+        command = command_router.resolve(text)
+        if command:
+            command(ctx)
             return
         
         # معالجة إجابات الألعاب النشطة
-        if game_id in active_games:
-            game_data = active_games[game_id]
-            
-            with players_lock:
-                is_registered = user_id in registered_players
+        game_data = registry.get(game_id)
+        
+        if game_data:
+            is_registered = registry.is_registered(user_id)
             
             if not is_registered and 'participants' in game_data and user_id not in game_data['participants']:
                 return
             
-            game = game_data['game']
             game_type = game_data['type']
             
             try:
-                result = game.check_answer(text, user_id, display_name)
+                result, finished = apply_answer(game_id, game_data, text, user_id, display_name)
                 
                 if result:
-                    points = result.get('points', 0)
-                    if points > 0:
-                        update_user_points(user_id, display_name, points, 
-                                         result.get('won', False), game_type)
+                    # النقاط تُحسب داخل اللعبة وتُسجل مرة واحدة عند انتهاء الجلسة
+                    if finished:
+                        record_game_session(game_id, finished, 'completed')
                     
-                    if result.get('game_over', False):
-                        with games_lock:
-                            if game_id in active_games:
-                                del active_games[game_id]
-                        
-                        response = TextSendMessage(
-                            text=result.get('message', 'انتهت اللعبة'),
-                            quick_reply=get_quick_reply()
-                        )
+                    if result.get('responses'):
+                        # اللعبة أعادت عدة رسائل منفصلة (مثلاً النتيجة ثم السؤال التالي)
+                        responses = list(result['responses'])
+                    elif result.get('game_over', False):
+                        responses = [TextSendMessage(text=result.get('message', 'انتهت اللعبة'))]
                     else:
-                        response = result.get('response', TextSendMessage(text=result.get('message', '')))
-                        
-                        if isinstance(response, TextSendMessage):
-                            response.quick_reply = get_quick_reply()
+                        responses = [result.get('response', TextSendMessage(text=result.get('message', '')))]
+                    
+                    if isinstance(responses[-1], TextSendMessage):
+                        running_game = None if result.get('game_over', False) else game_type
+                        responses[-1].quick_reply = get_quick_reply(running_game)
                     
-                    line_bot_api.reply_message(event.reply_token, response)
+                    for response in responses:
+                        replies.add(response)
                 return
             except Exception as e:
                 logger.error(f"خطأ في معالجة إجابة اللعبة: {e}")
-                line_bot_api.reply_message(
-                    event.reply_token,
+                replies.add(
                     TextSendMessage(text="❌ حدث خطأ. حاول مرة أخرى.", quick_reply=get_quick_reply())
                 )
                 return
@@ -1501,6 +1078,29 @@ def handle_message(event):
     except Exception as e:
         logger.error(f"خطأ في معالجة الرسالة: {e}")
 
+def dispatch_event(event):
+    """توجيه حدث مأخوذ من الطابور إلى معالجه"""
+    if isinstance(event, BackgroundTask):
+        event.run()
+    elif isinstance(event, MessageEvent) and isinstance(event.message, TextMessage):
+        handle_message(event)
+
+def event_key(event):
+    """مفتاح ترتيب الحدث: أحداث اللعبة الواحدة تُعالج بالتسلسل"""
+    if isinstance(event, BackgroundTask):
+        return event.key
+    source = getattr(event, 'source', None)
+    return get_game_id(source) if source else None
+
+webhook_queue = WebhookQueue(dispatch_event, event_key, workers=Config.WEBHOOK_WORKERS,
+                             maxsize=Config.WEBHOOK_QUEUE_SIZE)
+if Config.ASYNC_WEBHOOK:
+    webhook_queue.start()
+    # atexit يعمل بعكس ترتيب التسجيل: يُفرغ الطابور قبل إيقاف الكاتب (writer.stop)
+    atexit.register(webhook_queue.stop)
+timers.start()
+atexit.register(timers.stop)
+
 @app.errorhandler(Exception)
 def handle_error(error):
     """معالج الأخطاء العام"""
@@ -1510,6 +1110,6 @@ def handle_error(error):
 if __name__ == "__main__":
     port = int(os.environ.get('PORT', 5000))
     logger.info(f"🚀 بدء الخادم على المنفذ {port}")
-    logger.info(f"📊 اللاعبون المسجلون: {len(registered_players)}")
-    logger.info(f"🎮 الألعاب النشطة: {len(active_games)}")
+    logger.info(f"📊 اللاعبون المسجلون: {registry.players_count()}")
+    logger.info(f"🎮 الألعاب النشطة: {registry.games_count()}")
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,404 @@
+"""
+قياسات أداء مكونات البوت
+"""
+import sys
+import os
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from games import MathGame
+from game_registry import GameRegistry
+
+
+class MockLineBotApi:
+    """محاكي لـ LINE Bot API"""
+    def reply_message(self, reply_token, message):
+        pass
+
+
+def _run_threads(threads_count, target):
+    """تشغيل target في عدة threads وإرجاع الزمن الكلي"""
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(threads_count)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+def bench_registry(shards, threads_count, ops_per_thread=2000, legacy=False):
+    """قياس بدء/إجابة/إيقاف الألعاب على السجل بعدد threads معين
+
+    legacy=True يحاكي السلوك القديم: إنشاء اللعبة داخل قفل عام واحد
+    """
+    registry = GameRegistry(shards=shards)
+    api = MockLineBotApi()
+    global_lock = threading.Lock()
+
+    def worker(n):
+        for i in range(ops_per_thread):
+            game_id = f"G{n}-{i % 50}"
+            if legacy:
+                with global_lock:
+                    game = MathGame(api)
+            else:
+                game = MathGame(api)
+            game.start_game()
+            registry.put(game_id, game, 'رياضيات', registry.participants_for(f"U{n}"))
+            game_data = registry.get(game_id)
+            game_data['game'].check_answer('0', f"U{n}", 'لاعب')
+            registry.remove(game_id)
+
+    elapsed = _run_threads(threads_count, worker)
+    total = threads_count * ops_per_thread
+    return total / elapsed
+
+
+def run_registry_benchmark():
+    print("\n" + "="*60)
+    print("🔒 سجل الألعاب: بدء + إجابة + إيقاف (عملية/ثانية)")
+    print("="*60)
+    for threads_count in (1, 8, 64):
+        ops = max(200, 4000 // threads_count)
+        legacy = bench_registry(1, threads_count, ops, legacy=True)
+        single = bench_registry(1, threads_count, ops)
+        sharded = bench_registry(16, threads_count, ops)
+        print(f"threads={threads_count:<3} قديم: {legacy:>9.0f}   جزء واحد: {single:>9.0f}   16 جزء: {sharded:>9.0f}")
+
+
+def _legacy_route(text):
+    """نسخة من سلسلة if/elif القديمة مع بناء games_map لكل رسالة"""
+    if text in ['البداية', 'ابدأ', 'start', 'قائمة', 'البوت']:
+        return 'menu'
+    elif text in ['أكثر', 'المزيد', 'more']:
+        return 'more'
+    elif text == 'مساعدة':
+        return 'help'
+    elif text == 'نقاطي':
+        return 'stats'
+    elif text == 'الصدارة':
+        return 'leaderboard'
+    elif text in ['إيقاف', 'ايقاف', 'stop']:
+        return 'stop'
+    elif text in ['انضم', 'تسجيل', 'join']:
+        return 'join'
+    elif text in ['انسحب', 'خروج', 'leave']:
+        return 'leave'
+    games_map = {
+        'ذكاء': (None, 'ذكاء'), 'كلمة ولون': (None, 'كلمة ولون'), 'لون': (None, 'كلمة ولون'),
+        'سلسلة': (None, 'سلسلة'), 'ترتيب الحروف': (None, 'ترتيب'), 'ترتيب': (None, 'ترتيب'),
+        'تكوين كلمات': (None, 'تكوين'), 'تكوين': (None, 'تكوين'), 'أسرع': (None, 'أسرع'),
+        'لعبة': (None, 'لعبة'), 'خمن': (None, 'خمن'), 'توافق': (None, 'توافق'),
+        'رياضيات': (None, 'رياضيات'), 'ذاكرة': (None, 'ذاكرة'), 'لغز': (None, 'لغز'),
+        'ضد': (None, 'ضد'), 'إيموجي': (None, 'إيموجي'), 'أغنية': (None, 'أغنية')
+    }
+    if text in games_map:
+        return games_map[text]
+    return None
+
+
+def run_router_benchmark(iterations=200000):
+    print("\n" + "="*60)
+    print("🧭 توجيه الأوامر: زمن الرسالة الواحدة (نانوثانية)")
+    print("="*60)
+    os.environ.setdefault('ASYNC_WEBHOOK', 'false')
+    from app import command_router
+
+    samples = [
+        ("دردشة عادية", "هههه صح كلامك"),
+        ("إجابة", "القلم"),
+        ("أمر أول", "البداية"),
+        ("أمر أخير", "انسحب"),
+        ("لعبة", "أغنية"),
+    ]
+    for label, text in samples:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            _legacy_route(text)
+        legacy = (time.perf_counter() - started) / iterations * 1e9
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            command_router.resolve(text)
+        routed = (time.perf_counter() - started) / iterations * 1e9
+        print(f"{label:<12} القديم: {legacy:>7.0f}   الموجه: {routed:>7.0f}")
+
+
+def run_flex_benchmark(iterations=2000):
+    """بناء البطاقة وترميزها في كل طلب مقابل القالب المُرمّز مسبقاً"""
+    import json
+    from linebot.models import FlexSendMessage
+    import flex_templates
+
+    print("\n" + "="*60)
+    print("🎨 رسائل Flex: زمن البناء والترميز (ميكروثانية)")
+    print("="*60)
+    stats = {'user_id': 'U3', 'total_points': 120, 'games_played': 14, 'wins': 5}
+    rank_info = {'rank': 3, 'total': 40, 'top_percent': 7.5, 'around': [
+        {'rank': r, 'user_id': f"U{r}", 'display_name': f"لاعب {r}", 'total_points': 150 - r * 10}
+        for r in range(1, 6)
+    ]}
+    leaders = [{'display_name': f"لاعب {i}", 'total_points': 500 - i * 10} for i in range(10)]
+    cases = [
+        ("القائمة",
+         lambda: FlexSendMessage(alt_text="مرحباً", contents=flex_templates.menu_bubble("مرحباً أحمد")),
+         lambda: flex_templates.render_menu("أحمد")),
+        ("المساعدة",
+         lambda: FlexSendMessage(alt_text="مساعدة", contents=flex_templates.help_bubble()),
+         lambda: flex_templates.HELP.render()),
+        ("الإحصائيات",
+         lambda: FlexSendMessage(alt_text="إحصائياتك", contents=flex_templates.stats_bubble(
+             "أحمد", "مسجل", "#2a2a2a", "120", "14", "5", "35.7%", "#3 من 40", "7.5%", [
+                 flex_templates.leaderboard_row(str(p['rank']), p['display_name'], str(p['total_points']),
+                                                "#f5f5f5", "#2a2a2a", "#4a4a4a", "regular", "xs")
+                 for p in rank_info['around']
+             ])),
+         lambda: flex_templates.render_stats("أحمد", stats, True, rank_info)),
+        ("الصدارة",
+         lambda: FlexSendMessage(alt_text="لوحة الصدارة", contents=flex_templates.leaderboard_bubble([
+             flex_templates.leaderboard_row(str(i), leader['display_name'], str(leader['total_points']),
+                                            "#f5f5f5", "#2a2a2a", "#4a4a4a", "regular", "xs")
+             for i, leader in enumerate(leaders, 1)
+         ])),
+         lambda: flex_templates.render_leaderboard(leaders)),
+    ]
+    for label, build, render in cases:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            json.dumps(build().as_json_dict(), ensure_ascii=False)
+        built = (time.perf_counter() - started) / iterations * 1e6
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            render().encoded()
+        templated = (time.perf_counter() - started) / iterations * 1e6
+        print(f"{label:<12} البناء: {built:>8.1f}   القالب: {templated:>6.1f}")
+
+
+def run_state_benchmark(iterations=2000):
+    """حجم حالة اللعبة وزمن ترميزها: pickle مقابل games.state"""
+    import pickle
+    import games
+    from games import state
+
+    print("\n" + "="*60)
+    print("📦 حالة الألعاب: الحجم (بايت) وزمن الترميز+الفك (ميكروثانية)")
+    print("="*60)
+    players = [(f"U{i:032x}", f"لاعب {i}") for i in range(3)]
+    for name in games.__all__:
+        game = getattr(games, name)(None)
+        game.start_game()
+        for user_id, display_name in players:
+            game.add_score(user_id, display_name)
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            pickled = pickle.loads(pickle.dumps(game))
+        pickled_us = (time.perf_counter() - started) / iterations * 1e6
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            state.decode(state.encode(game))
+        state_us = (time.perf_counter() - started) / iterations * 1e6
+        print(f"{name:<22} pickle: {len(pickle.dumps(game)):>5} / {pickled_us:>5.1f}   "
+              f"state: {len(state.encode(game)):>4} / {state_us:>5.1f}")
+
+
+_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS users
+       (user_id TEXT PRIMARY KEY, display_name TEXT, total_points INTEGER DEFAULT 0,
+        games_played INTEGER DEFAULT 0, wins INTEGER DEFAULT 0, last_played TEXT,
+        registered_at TEXT DEFAULT CURRENT_TIMESTAMP)''',
+    '''CREATE TABLE IF NOT EXISTS game_history
+       (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, game_type TEXT, points INTEGER,
+        won INTEGER, played_at TEXT DEFAULT CURRENT_TIMESTAMP)'''
+)
+
+
+def _score_write(conn, user_id):
+    """كتابة النقاط لكل إجابة كما كانت قبل التجميع: قراءة ثم تحديث/إدراج ثم سجل"""
+    c = conn.cursor()
+    c.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
+    user = c.fetchone()
+    if user:
+        c.execute('''UPDATE users SET total_points = total_points + 10, games_played = games_played + 1,
+                     last_played = CURRENT_TIMESTAMP WHERE user_id = ?''', (user_id,))
+    else:
+        c.execute('''INSERT INTO users (user_id, display_name, total_points, games_played, wins)
+                     VALUES (?, ?, 10, 1, 0)''', (user_id, user_id))
+    c.execute('''INSERT INTO game_history (user_id, game_type, points, won)
+                 VALUES (?, 'رياضيات', 10, 0)''', (user_id,))
+
+
+def _db_worker(path, pooled, duration, worker, results):
+    import sqlite3
+    from db_pool import ConnectionPool
+
+    pool = ConnectionPool(path) if pooled else None
+    writes = locked = 0
+    deadline = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < deadline:
+        user_id = f"U{worker}_{i % 50}"
+        i += 1
+        try:
+            if pooled:
+                with pool.write() as conn:
+                    _score_write(conn, user_id)
+            else:
+                conn = sqlite3.connect(path, check_same_thread=False)
+                conn.row_factory = sqlite3.Row
+                try:
+                    _score_write(conn, user_id)
+                    conn.commit()
+                finally:
+                    conn.close()
+            writes += 1
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+    results.put((writes, locked))
+
+
+def bench_db_writes(pooled, workers=3, duration=3.0):
+    """كتابة النقاط من عدة عمليات (مثل gunicorn workers) على نفس الملف"""
+    import sqlite3
+    import tempfile
+    import multiprocessing
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'game_scores.db')
+        conn = sqlite3.connect(path)
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+        conn.close()
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=_db_worker, args=(path, pooled, duration, i, results))
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    writes = sum(t[0] for t in totals)
+    locked = sum(t[1] for t in totals)
+    return writes / duration, locked
+
+
+def run_db_benchmark():
+    print("\n" + "="*60)
+    print("💾 كتابة النقاط: عمليات متزامنة على game_scores.db")
+    print("="*60)
+    for workers in [1, 3, 6]:
+        legacy_rate, legacy_locked = bench_db_writes(False, workers)
+        pooled_rate, pooled_locked = bench_db_writes(True, workers)
+        print(f"{workers} عمليات  اتصال لكل طلب: {legacy_rate:>7.0f}/ث (locked: {legacy_locked})   "
+              f"WAL دائم: {pooled_rate:>7.0f}/ث (locked: {pooled_locked})")
+
+
+
+_PERIOD_SCHEMA = (
+    '''CREATE TABLE game_history
+       (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, game_type TEXT, points INTEGER,
+        won INTEGER, played_at TEXT)''',
+    '''CREATE INDEX idx_game_history_user ON game_history(user_id, played_at)''',
+    '''CREATE TABLE daily_scores
+       (game_type TEXT, day TEXT, user_id TEXT, display_name TEXT, total_points INTEGER DEFAULT 0,
+        games_played INTEGER DEFAULT 0, wins INTEGER DEFAULT 0,
+        PRIMARY KEY (game_type, day, user_id)) WITHOUT ROWID'''
+)
+
+_LEGACY_PERIOD_QUERY = '''SELECT user_id, SUM(points) AS total_points FROM game_history
+                          WHERE played_at >= ? GROUP BY user_id ORDER BY total_points DESC LIMIT 10'''
+
+_PERIOD_QUERY = '''SELECT user_id, SUM(total_points) AS total_points FROM daily_scores
+                   WHERE game_type = '*' AND day >= ? GROUP BY user_id ORDER BY total_points DESC LIMIT 10'''
+
+
+def _add_history_days(conn, first_day, days, rows_per_day, players=500):
+    """إضافة أيام أقدم إلى السجل مع صفوفها في daily_scores - نفس النشاط اليومي دائماً
+
+    لاعبو كل يوم من نافذة متحركة، فيزيد عدد اللاعبين المختلفين مع طول السجل كما في الواقع
+    """
+    import random
+    from datetime import datetime, timedelta
+
+    rnd = random.Random(first_day)
+    game_types = ['ذكاء', 'رياضيات', 'لغز', 'ضد', 'ترتيب', 'أسرع', 'سلسلة']
+    today = datetime.now()
+    for offset in range(first_day, first_day + days):
+        day = (today - timedelta(days=offset)).strftime('%Y-%m-%d')
+        conn.executemany(
+            'INSERT INTO game_history (user_id, game_type, points, won, played_at) VALUES (?, ?, ?, ?, ?)',
+            ((f"U{offset * 5 + rnd.randrange(players)}", rnd.choice(game_types), rnd.randint(0, 50), 0, f"{day}T12:00:00")
+             for _ in range(rows_per_day))
+        )
+    since = (today - timedelta(days=first_day + days - 1)).strftime('%Y-%m-%d')
+    until = (today - timedelta(days=first_day)).strftime('%Y-%m-%d')
+    for game_type in ('game_type', "'*'"):
+        conn.execute(f'''INSERT INTO daily_scores
+                          SELECT {game_type}, substr(played_at, 1, 10), user_id, user_id,
+                                 SUM(points), COUNT(*), SUM(won)
+                          FROM game_history WHERE substr(played_at, 1, 10) BETWEEN ? AND ?
+                          GROUP BY 1, 2, 3''', (since, until))
+    conn.commit()
+
+
+def _time_query(conn, query, since, repeat=5):
+    """أفضل زمن من عدة تشغيلات بالمللي ثانية"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(query, (since,)).fetchall()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_period_benchmark(sizes=(100_000, 1_000_000, 3_000_000), rows_per_day=2000):
+    """صدارة الأسبوع والشهر: GROUP BY على game_history مقابل جمع صفوف daily_scores
+
+    السجل يكبر بإضافة أيام أقدم بنفس النشاط اليومي، فتبقى بيانات الفترة نفسها
+    """
+    import sqlite3
+    import tempfile
+    from datetime import datetime, timedelta
+
+    print("\n" + "="*60)
+    print("📅 صدارة الفترات: زمن الاستعلام مع نمو game_history (مللي ثانية)")
+    print("="*60)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'periods.db'))
+        for statement in _PERIOD_SCHEMA:
+            conn.execute(statement)
+        days = 0
+        for size in sizes:
+            new_days = size // rows_per_day - days
+            _add_history_days(conn, days, new_days, rows_per_day)
+            days += new_days
+            conn.execute('ANALYZE')
+            line = f"{days * rows_per_day:>10,} سطر"
+            for label, period_days in (('أسبوع', 7), ('شهر', 30)):
+                since = (datetime.now() - timedelta(days=period_days - 1)).strftime('%Y-%m-%d')
+                legacy = _time_query(conn, _LEGACY_PERIOD_QUERY, since)
+                bucketed = _time_query(conn, _PERIOD_QUERY, since)
+                line += f"   {label}: السجل {legacy:>8.1f}  اليومي {bucketed:>6.2f}"
+            print(line)
+        conn.close()
+
+
+if __name__ == "__main__":
+    run_registry_benchmark()
+    run_router_benchmark()
+    run_flex_benchmark()
+    run_state_benchmark()
+    run_db_benchmark()
+    run_period_benchmark()
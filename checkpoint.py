@@ -0,0 +1,276 @@
+"""
+نقاط حفظ دورية للألعاب النشطة واللاعبين المسجلين
+
+مع مخزن الجلسات المحلي (memory) تضيع كل الألعاب الجارية والتسجيلات عند إعادة
+التشغيل أو النشر. Checkpointer يحفظها في ملف SQLite محلي:
+- كل interval ثانية تُكتب الألعاب واللاعبون المتغيرون فقط (GameRegistry.take_changes)
+  في معاملة واحدة؛ اللعبة المحذوفة من السجل تُحذف من الملف
+- عند الإقلاع restore() تعيد كل شيء إلى السجل قبل بدء استقبال الأحداث
+- عند الإيقاف تُكتب آخر التغييرات
+- الألعاب تُرمّز في GameRegistry عند حفظها، فالحفظ هنا يكتب bytes فقط
+
+كل عملية gunicorn لها ملفها (slot): الأول path ثم checkpoint.1.db ... يُحجز بقفل
+flock على ملف .lock طوال عمر العملية، فلا تكتب عمليتان في نفس الملف ولا تُستعاد
+لعبة في أكثر من عملية. ملفات عمليات سابقة لم يحجزها أحد (عدد عمليات أقل بعد
+إعادة التشغيل) تتبناها أول عملية تستعيد: تُنقل ألعابها إلى ملفها ثم تُحذف.
+الـ slot نفسه (claim_slot) يحدد ملفات العملية المحلية الأخرى عبر slot_path، كملف
+الألعاب النائمة: ألعاب ملف متبنى موجودة في نقطة حفظه فيُحذف معه (companions).
+
+المخازن المشتركة (sqlite/redis) تبقى بعد إعادة التشغيل أصلاً فلا تحتاج هذا.
+"""
+import os
+import glob
+import time
+import fcntl
+import logging
+
+from db_pool import ConnectionPool
+from db_writer import real_lock, start_real_thread
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS checkpoint_games (game_id TEXT PRIMARY KEY, data BLOB)''',
+    '''CREATE TABLE IF NOT EXISTS checkpoint_players (user_id TEXT PRIMARY KEY)'''
+)
+
+
+def slot_path(path, slot):
+    """مسار ملف الـ slot: path للأول ثم name.1.db ..."""
+    if slot == 0:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{slot}{ext}"
+
+
+def lock_slot(path, slot):
+    """قفل ملف الـ slot دون انتظار - يعيد الملف المفتوح أو None إن كان محجوزاً"""
+    lock_file = open(slot_path(path, slot) + '.lock', 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def claim_slot(path):
+    """حجز أول slot حر على path لهذه العملية - يعيد (slot, ملف القفل)
+
+    الحجز يبقى حتى إغلاق ملف القفل أو انتهاء العملية
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    slot = 0
+    while True:
+        lock_file = lock_slot(path, slot)
+        if lock_file is not None:
+            return slot, lock_file
+        slot += 1
+
+
+class Checkpointer:
+    """حفظ تدريجي للألعاب المتغيرة واستعادتها عند الإقلاع"""
+
+    def __init__(self, registry, path, interval=5, claim=None, companions=()):
+        """claim: (slot, ملف القفل) من claim_slot(path) إن حُجز مسبقاً
+
+        companions: مسارات ملفات أخرى بنفس الـ slots تُحذف مع ملف slot متبنى
+        """
+        self.registry = registry
+        self.base_path = path
+        self.interval = interval
+        self.companions = tuple(companions)
+        self.slot, self._slot_lock = claim or claim_slot(path)
+        self.path = self._slot_path(self.slot)
+        self.pool = self._open(self.path)
+        self._lock = real_lock()
+        self._running = real_lock()
+        self._stop = real_lock()
+        self._stop.acquire()
+        self.counters = {
+            'checkpoints': 0,
+            'games_written': 0,
+            'games_deleted': 0,
+            'players_written': 0,
+            'failures': 0
+        }
+        self.last = None
+        self.restored = None
+        registry.track_changes()
+
+    @staticmethod
+    def _open(path):
+        pool = ConnectionPool(path, cache_size_kb=2048, mmap_size_mb=0)
+        with pool.write() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+        return pool
+
+    def _slot_path(self, slot):
+        return slot_path(self.base_path, slot)
+
+    def _orphan_slots(self):
+        """ملفات slots أخرى موجودة على القرص"""
+        root, ext = os.path.splitext(self.base_path)
+        slots = [] if self.slot == 0 else [0]
+        for path in glob.glob(f"{glob.escape(root)}.*{ext}"):
+            number = path[len(root) + 1:len(path) - len(ext)]
+            if number.isdigit() and int(number) != self.slot:
+                slots.append(int(number))
+        return [slot for slot in slots if os.path.exists(self._slot_path(slot))]
+
+    def _load(self, conn):
+        """استعادة محتوى ملف إلى السجل - يعيد ({game_id: bytes}, user_ids, failed)"""
+        games, failed = {}, 0
+        for game_id, data in conn.execute('SELECT game_id, data FROM checkpoint_games'):
+            try:
+                if self.registry.restore(game_id, bytes(data)):
+                    games[game_id] = bytes(data)
+            except Exception as e:
+                failed += 1
+                logger.error(f"تعذرت استعادة اللعبة {game_id}: {e}")
+        user_ids = [user_id for (user_id,) in conn.execute('SELECT user_id FROM checkpoint_players')]
+        for user_id in user_ids:
+            self.registry.restore_player(user_id)
+        return games, user_ids, failed
+
+    def _adopt(self, slot):
+        """نقل ألعاب slot لا تملكه عملية حية إلى ملف هذه العملية - يعيد ما نُقل أو None"""
+        lock_file = lock_slot(self.base_path, slot)
+        if lock_file is None:
+            return None
+        try:
+            path = self._slot_path(slot)
+            if not os.path.exists(path):
+                return None
+            pool = ConnectionPool(path, cache_size_kb=2048, mmap_size_mb=0)
+            try:
+                games, user_ids, failed = self._load(pool.connection())
+            finally:
+                pool.close()
+            # تُكتب في ملف هذه العملية قبل حذف الملف القديم
+            self.registry.requeue_changes(games, user_ids)
+            if games or user_ids:
+                self.checkpoint()
+            for stale in (path,) + tuple(slot_path(companion, slot) for companion in self.companions):
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(stale + suffix):
+                        os.remove(stale + suffix)
+            return games, user_ids, failed
+        finally:
+            # ملف القفل يبقى: حذفه قد يمنح نفس الـ slot لعمليتين
+            lock_file.close()
+
+    def restore(self):
+        """إعادة الألعاب واللاعبين المحفوظين إلى السجل - يعيد وصف الاستعادة"""
+        started = time.perf_counter()
+        restored, user_ids, failed = self._load(self.pool.connection())
+        games, players = len(restored), len(user_ids)
+        adopted = 0
+        for slot in self._orphan_slots():
+            try:
+                result = self._adopt(slot)
+            except Exception as e:
+                logger.error(f"تعذر نقل نقطة الحفظ {self._slot_path(slot)}: {e}")
+                continue
+            if result is not None:
+                adopted += 1
+                games += len(result[0])
+                players += len(result[1])
+                failed += result[2]
+
+        self.restored = {
+            'slot': self.slot,
+            'adopted': adopted,
+            'games': games,
+            'players': players,
+            'failed': failed,
+            'bytes': self._size(),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+        logger.info(f"استعادة نقطة الحفظ: {games} لعبة و{players} لاعب "
+                    f"({self.restored['bytes']} بايت) في {self.restored['duration_ms']} مللي ثانية")
+        return self.restored
+
+    def start(self):
+        if self.interval > 0:
+            start_real_thread(self._schedule)
+
+    def _schedule(self):
+        while not self._stop.acquire(timeout=self.interval):
+            self.checkpoint()
+
+    def stop(self):
+        """إيقاف الحفظ الدوري مع كتابة آخر التغييرات ثم تحرير الـ slot"""
+        try:
+            self._stop.release()
+        except RuntimeError:
+            pass
+        self.checkpoint()
+        with self._running:
+            self._slot_lock.close()
+
+    def checkpoint(self):
+        """كتابة التغييرات منذ آخر نقطة حفظ - يعيد وصفها أو None"""
+        with self._running:
+            if self._slot_lock.closed:
+                # بعد stop() قد تحجز عملية أخرى هذا الملف
+                return None
+            games, user_ids = self.registry.take_changes()
+            if not games and not user_ids:
+                return None
+            try:
+                return self._write(games, user_ids)
+            except Exception as e:
+                logger.error(f"خطأ في نقطة الحفظ: {e}")
+                # تعاد للمحاولة في الدورة التالية
+                self.registry.requeue_changes(games, user_ids)
+                with self._lock:
+                    self.counters['failures'] += 1
+                return None
+
+    def _write(self, games, user_ids):
+        started = time.perf_counter()
+        upserts = [(game_id, blob) for game_id, blob in games.items() if blob is not None]
+        deletes = [(game_id,) for game_id, blob in games.items() if blob is None]
+        registered, left = [], []
+        for user_id in user_ids:
+            (registered if self.registry.is_registered(user_id) else left).append((user_id,))
+
+        with self.pool.write() as conn:
+            conn.executemany('''INSERT INTO checkpoint_games (game_id, data) VALUES (?, ?)
+                                ON CONFLICT(game_id) DO UPDATE SET data = excluded.data''', upserts)
+            conn.executemany('DELETE FROM checkpoint_games WHERE game_id = ?', deletes)
+            conn.executemany('INSERT OR IGNORE INTO checkpoint_players (user_id) VALUES (?)', registered)
+            conn.executemany('DELETE FROM checkpoint_players WHERE user_id = ?', left)
+
+        info = {
+            'games': len(upserts),
+            'deleted': len(deletes),
+            'players': len(user_ids),
+            'bytes_written': sum(len(data) for _, data in upserts),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+        with self._lock:
+            self.counters['checkpoints'] += 1
+            self.counters['games_written'] += len(upserts)
+            self.counters['games_deleted'] += len(deletes)
+            self.counters['players_written'] += len(user_ids)
+            self.last = info
+        return info
+
+    def _size(self):
+        return sum(
+            os.path.getsize(self.path + suffix)
+            for suffix in ('', '-wal') if os.path.exists(self.path + suffix)
+        )
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['last'] = self.last
+        stats['restored'] = self.restored
+        stats['bytes'] = self._size()
+        return stats
@@ -0,0 +1,139 @@
+"""
+ضغط سجل اللعب القديم
+
+- سطور game_history ملخصة أصلاً في daily_scores (لكل لاعب ويوم ونوع لعبة) لأنها
+  تُكتب في نفس المعاملة، فالسطور الأقدم من مدة الاحتفاظ تُحذف فقط
+- الحذف على دفعات صغيرة، كل دفعة معاملة مستقلة في دورة من دورات الكاتب، فتمر
+  كتابات النقاط بين الدفعات
+- بعد الحذف تُعاد الصفحات الفارغة للنظام عبر incremental_vacuum على خطوات
+  (يتطلب auto_vacuum=INCREMENTAL، وإلا تبقى الصفحات الفارغة لإعادة الاستخدام)
+"""
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+
+from db_writer import real_lock
+
+logger = logging.getLogger(__name__)
+
+# الجداول المضغوطة وعمود الوقت في كل منها - المعرف يزداد مع الوقت
+TABLES = (
+    ('game_history', 'played_at'),
+    ('game_sessions', 'ended_at')
+)
+
+
+class HistoryCompactor:
+    """مهمة دورية على thread الكاتب: دفعة حذف أو خطوة vacuum واحدة في كل دورة"""
+
+    def __init__(self, pool, retention_days=90, batch_size=5000, vacuum_pages=1000, interval=3600):
+        # pool: اتصال الكتابة - يُستخدم من thread الكاتب فقط
+        self.pool = pool
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.interval = interval
+        self._next_run = time.monotonic()
+        self._run = None
+        self._lock = real_lock()
+        self.counters = {
+            'runs': 0,
+            'rows_compacted': 0,
+            'sessions_compacted': 0,
+            'batches': 0,
+            'bytes_reclaimed': 0
+        }
+        self.last_run = None
+
+    def __call__(self):
+        """تُستدعى من DBWriter في كل دورة - تعيد عدد الصفوف المحذوفة أو الصفحات المستعادة"""
+        if self._run is None:
+            if time.monotonic() < self._next_run:
+                return 0
+            self._start()
+        try:
+            if self._run['tables']:
+                return self._delete_batch()
+            return self._vacuum_step()
+        except Exception as e:
+            logger.error(f"خطأ في ضغط السجل: {e}")
+            self._finish()
+            return 0
+
+    def _start(self):
+        # played_at و ended_at بتوقيت UTC
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+        self._run = {
+            'cutoff': cutoff,
+            'tables': list(TABLES),
+            'last_id': 0,
+            'started': time.perf_counter(),
+            'rows': 0,
+            'pages_before': self._pragma('page_count')
+        }
+
+    def _pragma(self, name):
+        return self.pool.connection().execute(f'PRAGMA {name}').fetchone()[0]
+
+    def _delete_batch(self):
+        run = self._run
+        table, column = run['tables'][0]
+        with self.pool.write() as conn:
+            rows = conn.execute(
+                f'SELECT id, {column} FROM {table} WHERE id > ? ORDER BY id LIMIT ?',
+                (run['last_id'], self.batch_size)
+            ).fetchall()
+            # التاريخ يبدأ بـ YYYY-MM-DD فالمقارنة النصية تكفي؛ الصفوف بلا تاريخ تبقى
+            old = [(row[0],) for row in rows if row[1] is not None and row[1] < run['cutoff']]
+            conn.executemany(f'DELETE FROM {table} WHERE id = ?', old)
+
+        run['rows'] += len(old)
+        with self._lock:
+            self.counters['batches'] += 1
+            if table == 'game_history':
+                self.counters['rows_compacted'] += len(old)
+            else:
+                self.counters['sessions_compacted'] += len(old)
+        # وصلنا لسطور أحدث من مدة الاحتفاظ (أو نهاية الجدول): الانتقال للجدول التالي
+        if len(rows) < self.batch_size or len(old) < len(rows):
+            run['tables'].pop(0)
+            run['last_id'] = 0
+        else:
+            run['last_id'] = rows[-1][0]
+        return len(old)
+
+    def _vacuum_step(self):
+        conn = self.pool.connection()
+        free_pages = self._pragma('freelist_count')
+        if free_pages == 0 or self._pragma('auto_vacuum') != 2:
+            self._finish()
+            return 0
+        conn.execute(f'PRAGMA incremental_vacuum({self.vacuum_pages})')
+        return free_pages - self._pragma('freelist_count')
+
+    def _finish(self):
+        run = self._run
+        self._run = None
+        self._next_run = time.monotonic() + self.interval
+        reclaimed = max(0, run['pages_before'] - self._pragma('page_count')) * self._pragma('page_size')
+        last_run = {
+            'cutoff': run['cutoff'],
+            'rows': run['rows'],
+            'bytes_reclaimed': reclaimed,
+            'free_pages': self._pragma('freelist_count'),
+            'duration_ms': round((time.perf_counter() - run['started']) * 1000, 1),
+            'finished_at': datetime.now().isoformat()
+        }
+        with self._lock:
+            self.counters['runs'] += 1
+            self.counters['bytes_reclaimed'] += reclaimed
+            self.last_run = last_run
+        if run['rows'] or reclaimed:
+            logger.info(f"ضغط السجل: حُذف {run['rows']} صفاً أقدم من {run['cutoff']} واستُعيد {reclaimed} بايت")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['last_run'] = self.last_run
+        stats['running'] = self._run is not None
+        return stats
@@ -32,6 +32,65 @@ class Config:
     POINTS_PER_CORRECT_ANSWER = int(os.getenv('POINTS_PER_CORRECT_ANSWER', 10))
     POINTS_WIN_BONUS = int(os.getenv('POINTS_WIN_BONUS', 50))
     
+    ASYNC_WEBHOOK = os.getenv('ASYNC_WEBHOOK', 'True').lower() == 'true'
+    WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 4))
+    WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000))
+    GAME_REGISTRY_SHARDS = int(os.getenv('GAME_REGISTRY_SHARDS', 16))
+    # memory لعملية واحدة، sqlite أو redis حتى تتشارك عمليات gunicorn نفس الألعاب
+    SESSION_STORE = os.getenv('SESSION_STORE', 'memory').lower()
+    SESSION_STORE_PATH = os.getenv('SESSION_STORE_PATH', 'data/sessions.db')
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    # حفظ دوري للألعاب والتسجيلات مع مخزن memory واستعادتها عند الإقلاع (0 = معطل)
+    CHECKPOINT_PATH = os.getenv('CHECKPOINT_PATH', 'data/checkpoint.db')
+    CHECKPOINT_INTERVAL_SECONDS = int(os.getenv('CHECKPOINT_INTERVAL_SECONDS', 5))
+    # الألعاب بلا رسائل لهذه المدة تُنقل من الذاكرة إلى القرص حتى رسالتها التالية (0 = معطل)
+    GAME_IDLE_SECONDS = int(os.getenv('GAME_IDLE_SECONDS', 120))
+    # لكل عملية ملفها بنفس slot نقطة الحفظ: hibernated.db ثم hibernated.1.db ...
+    HIBERNATE_PATH = os.getenv('HIBERNATE_PATH', 'data/hibernated.db')
+    # دقة مؤقتات الألعاب (مهلة الخمول GAME_TIMEOUT_MINUTES ومهل الأسئلة)
+    TIMER_TICK_SECONDS = float(os.getenv('TIMER_TICK_SECONDS', 1))
+    
+    PROFILE_CACHE_SIZE = int(os.getenv('PROFILE_CACHE_SIZE', 5000))
+    PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', 3600))
+    PROFILE_CACHE_STALE_TTL = int(os.getenv('PROFILE_CACHE_STALE_TTL', 86400))
+    # فشل جلب الاسم (404، حظر البوت) يُحفظ لهذه المدة قبل إعادة المحاولة (0 = معطل)
+    PROFILE_CACHE_NEGATIVE_TTL = int(os.getenv('PROFILE_CACHE_NEGATIVE_TTL', 60))
+    PROFILE_CACHE_PERSIST = os.getenv('PROFILE_CACHE_PERSIST', 'True').lower() == 'true'
+    
+    LINE_API_BASE_URL = os.getenv('LINE_API_BASE_URL', 'https://api.line.me')
+    OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', 3))
+    OUTBOUND_BACKOFF_SECONDS = float(os.getenv('OUTBOUND_BACKOFF_SECONDS', 0.5))
+    OUTBOUND_TIMEOUT_SECONDS = float(os.getenv('OUTBOUND_TIMEOUT_SECONDS', 10))
+    DEAD_LETTER_PATH = os.getenv('DEAD_LETTER_PATH', 'data/dead_letters.jsonl')
+    
+    LEADERBOARD_SIZE = int(os.getenv('LEADERBOARD_SIZE', 10))
+    LEADERBOARD_REFRESH_SECONDS = int(os.getenv('LEADERBOARD_REFRESH_SECONDS', 30))
+    GROUP_LEADERBOARDS_MAX = int(os.getenv('GROUP_LEADERBOARDS_MAX', 1000))
+    PERIOD_LEADERBOARD_REFRESH_SECONDS = int(os.getenv('PERIOD_LEADERBOARD_REFRESH_SECONDS', 60))
+    RANK_BUCKET_WIDTH = int(os.getenv('RANK_BUCKET_WIDTH', 10))
+    RANK_REFRESH_SECONDS = int(os.getenv('RANK_REFRESH_SECONDS', 300))
+    
+    DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000))
+    DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', 8192))
+    DB_MMAP_SIZE_MB = int(os.getenv('DB_MMAP_SIZE_MB', 64))
+    SCORE_FLUSH_INTERVAL_MS = int(os.getenv('SCORE_FLUSH_INTERVAL_MS', 200))
+    SCORE_FLUSH_MAX_ROWS = int(os.getenv('SCORE_FLUSH_MAX_ROWS', 100))
+    DB_WRITER_BATCH_SIZE = int(os.getenv('DB_WRITER_BATCH_SIZE', 100))
+    
+    # 0 يعطل حذف السجل القديم (الافتراضي)؛ حذفه نهائي فيُفعّل صراحة
+    HISTORY_RETENTION_DAYS = int(os.getenv('HISTORY_RETENTION_DAYS', 0))
+    COMPACTION_BATCH_SIZE = int(os.getenv('COMPACTION_BATCH_SIZE', 5000))
+    COMPACTION_VACUUM_PAGES = int(os.getenv('COMPACTION_VACUUM_PAGES', 1000))
+    COMPACTION_INTERVAL_SECONDS = int(os.getenv('COMPACTION_INTERVAL_SECONDS', 3600))
+    
+    SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'data/snapshots')
+    SNAPSHOT_KEEP = int(os.getenv('SNAPSHOT_KEEP', 7))
+    SNAPSHOT_INTERVAL_SECONDS = int(os.getenv('SNAPSHOT_INTERVAL_SECONDS', 0))
+    SNAPSHOT_PAGES_PER_STEP = int(os.getenv('SNAPSHOT_PAGES_PER_STEP', 256))
+    SNAPSHOT_STEP_SLEEP_MS = int(os.getenv('SNAPSHOT_STEP_SLEEP_MS', 10))
+    SNAPSHOT_COMPRESS = os.getenv('SNAPSHOT_COMPRESS', 'False').lower() == 'true'
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+    
     @classmethod
     def validate(cls):
         """التحقق من صحة الإعدادات"""
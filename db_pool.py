@@ -0,0 +1,108 @@
+"""
+اتصالات SQLite دائمة لكل thread
+
+- اتصال واحد لكل thread يُفتح عند أول استخدام ويبقى مفتوحاً
+  (تحت gevent يصبح لكل greenlet اتصاله ويُغلق بانتهائه)
+- وضع WAL: القراءة لا تنتظر الكتابة، وكتابة واحدة في كل لحظة عبر كل العمليات
+- الجمل المُحضّرة تُعاد من ذاكرة sqlite3 الخاصة بكل اتصال (cached_statements)
+- الكتابة عبر write() تبدأ بـ BEGIN IMMEDIATE فتنتظر القفل بدل أن تفشل
+  عند ترقية قراءة إلى كتابة
+- readonly=True يفتح اتصالات للقراءة فقط (query_only) بجانب كاتب وحيد
+- auto_vacuum='INCREMENTAL' يُطبق على الملفات الجديدة فقط (قبل إنشاء أي جدول)
+"""
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """اتصالات دائمة لكل thread بقاعدة بيانات SQLite واحدة"""
+
+    def __init__(self, path, busy_timeout_ms=5000, cache_size_kb=8192,
+                 mmap_size_mb=64, cached_statements=128, readonly=False, auto_vacuum=None):
+        self.path = path
+        self.cached_statements = cached_statements
+        self.busy_timeout_ms = busy_timeout_ms
+        self.readonly = readonly
+        pragmas = [
+            # NORMAL آمن مع WAL: قد تضيع آخر معاملة عند انقطاع الكهرباء فقط
+            ('synchronous', 'NORMAL'),
+            ('cache_size', -cache_size_kb),
+            ('mmap_size', mmap_size_mb * 1024 * 1024),
+            ('busy_timeout', busy_timeout_ms),
+            ('temp_store', 'MEMORY')
+        ]
+        if readonly:
+            # وضع WAL دائم في الملف ويضبطه الكاتب
+            pragmas.append(('query_only', 'ON'))
+        else:
+            pragmas.insert(0, ('journal_mode', 'WAL'))
+            if auto_vacuum:
+                pragmas.insert(0, ('auto_vacuum', auto_vacuum))
+        self.pragmas = tuple(pragmas)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counters = {
+            'opened': 0,
+            'transactions': 0,
+            'rollbacks': 0
+        }
+
+    def connection(self):
+        """اتصال الـ thread الحالي - يُفتح عند أول طلب"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+        return conn
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f'PRAGMA {name} = {value}')
+        with self._lock:
+            self.counters['opened'] += 1
+        return conn
+
+    @contextmanager
+    def write(self, on_commit=None):
+        """معاملة كتابة: BEGIN IMMEDIATE ثم COMMIT أو ROLLBACK عند الخطأ
+
+        on_commit() تُستدعى بعد COMMIT مباشرة وقبل احتساب المعاملة
+        """
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+            if on_commit:
+                on_commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            with self._lock:
+                self.counters['rollbacks'] += 1
+            raise
+        with self._lock:
+            self.counters['transactions'] += 1
+
+    def close(self):
+        """إغلاق اتصال الـ thread الحالي"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
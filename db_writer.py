@@ -0,0 +1,218 @@
+"""
+كاتب قاعدة البيانات الوحيد
+
+كل الكتابات تمر عبر thread واحد يملك اتصال الكتابة:
+- معالجات الطلبات تضيف أوامر الكتابة إلى طابور وتعود فوراً دون انتظار COMMIT
+- الكاتب يجمع الأوامر المتراكمة في معاملة واحدة (SAVEPOINT لكل أمر حتى لا
+  يُلغي أمر فاشل بقية الدفعة)، ثم يشغّل المهام الدورية مثل كتابة النقاط المجمّعة
+- القراءة تستمر بالتوازي عبر اتصالات للقراءة فقط (WAL)
+- فشل المعاملة كلها (SQLITE_BUSY، امتلاء القرص) يعيد الدفعة لأول الطابور
+  وتُعاد المحاولة بمهلة متزايدة؛ لا يُهمل إلا الأمر الذي يفشل وحده داخل SAVEPOINT
+
+تحت gevent يُشغّل الكاتب على thread حقيقي من النظام بأقفال حقيقية، حتى لا
+يوقف انتظار قفل الملف أو fsync بقية الـ greenlets.
+"""
+import importlib
+import time
+import logging
+from collections import deque
+
+from db_pool import ConnectionPool
+from webhook_queue import StageTimer
+
+logger = logging.getLogger(__name__)
+
+# أقصى انتظار بين محاولات دفعة فشلت معاملتها (ثوانٍ)
+MAX_RETRY_DELAY = 5.0
+
+
+def _original(module, name):
+    """الدالة الأصلية من مكتبة بايثون حتى لو استبدلها gevent"""
+    try:
+        from gevent import monkey
+        if monkey.is_module_patched(module):
+            return monkey.get_original(module, name)
+    except ImportError:
+        pass
+    return getattr(importlib.import_module(module), name)
+
+
+def real_lock():
+    """قفل نظام حقيقي - آمن بين thread الكاتب والـ greenlets"""
+    return _original('_thread', 'allocate_lock')()
+
+
+def start_real_thread(function, args=()):
+    """تشغيل function على thread حقيقي من النظام حتى لو استبدل gevent الـ threads"""
+    _original('_thread', 'start_new_thread')(function, args)
+
+
+class DBWriter:
+    """thread كتابة وحيد مع طابور أوامر ومهام دورية"""
+
+    def __init__(self, path, batch_size=100, interval_ms=200, **pool_options):
+        self.pool = ConnectionPool(path, **pool_options)
+        self.batch_size = batch_size
+        self.interval = interval_ms / 1000
+        self._commands = deque()
+        self._calls = deque()
+        self._periodic = []
+        self._lock = real_lock()
+        # مقفل افتراضياً - يُحرر لإيقاظ الكاتب قبل انتهاء المهلة
+        self._wake = real_lock()
+        self._wake.acquire()
+        self._done = real_lock()
+        self._running = False
+        self._stopping = False
+        # محاولات متتالية فاشلة للدفعة الحالية وموعد المحاولة التالية (monotonic)
+        self._attempts = 0
+        self._retry_at = 0.0
+        self.commit_latency = StageTimer(lock=real_lock())
+        self.counters = {
+            'submitted': 0,
+            'executed': 0,
+            'failed': 0,
+            'transactions': 0,
+            'retries': 0
+        }
+
+    def start(self):
+        self._running = True
+        self._done.acquire()
+        start_real_thread(self._run)
+
+    def submit(self, command):
+        """إضافة أمر كتابة command(conn) - يُنفذ لاحقاً داخل معاملة"""
+        self._commands.append(command)
+        with self._lock:
+            self.counters['submitted'] += 1
+        if len(self._commands) >= self.batch_size:
+            self.wake()
+
+    def call(self, command):
+        """تنفيذ أمر كتابة وانتظار نتيجته - للإعداد عند بدء التشغيل فقط"""
+        if not self._running:
+            with self.pool.write() as conn:
+                return command(conn)
+        call = {'command': command, 'finished': real_lock()}
+        call['finished'].acquire()
+        self._calls.append(call)
+        self.wake()
+        # يُحرر بعد COMMIT حتى يرى المستدعي نتيجة الكتابة
+        call['finished'].acquire()
+        if 'error' in call:
+            raise call['error']
+        return call.get('value')
+
+    def add_periodic(self, task):
+        """مهمة task() تُشغّل على thread الكاتب في كل دورة وتدير معاملتها بنفسها
+
+        تعيد task عدد الصفوف المكتوبة (أو قيمة صحيحة) ليُحسب زمنها في commit_latency
+        """
+        self._periodic.append(task)
+
+    def wake(self):
+        try:
+            self._wake.release()
+        except RuntimeError:
+            pass  # مستيقظ بالفعل
+
+    def _run(self):
+        try:
+            while True:
+                self._wake.acquire(timeout=max(self.interval, self._retry_at - time.monotonic()))
+                stopping = self._stopping
+                while self._calls:
+                    self._run_call(self._calls.popleft())
+                if time.monotonic() >= self._retry_at:
+                    while self._commands and self._write_batch():
+                        pass
+                for task in self._periodic:
+                    self._run_periodic(task)
+                if stopping and not self._commands:
+                    break
+        finally:
+            self.pool.close()
+            self._done.release()
+
+    def _run_periodic(self, task):
+        started = time.perf_counter()
+        try:
+            # المهمة تعيد قيمة غير صفرية إذا كتبت شيئاً
+            if task():
+                self.commit_latency.add(time.perf_counter() - started)
+        except Exception as e:
+            logger.error(f"خطأ في مهمة الكتابة الدورية: {e}")
+
+    def _run_call(self, call):
+        try:
+            with self.pool.write() as conn:
+                call['value'] = call['command'](conn)
+        except Exception as e:
+            call['error'] = e
+        finally:
+            call['finished'].release()
+
+    def _write_batch(self):
+        """كتابة دفعة في معاملة واحدة - يعيد False إذا فشلت المعاملة وأُعيدت الدفعة"""
+        batch = []
+        while self._commands and len(batch) < self.batch_size:
+            batch.append(self._commands.popleft())
+
+        started = time.perf_counter()
+        executed = failed = 0
+        try:
+            with self.pool.write() as conn:
+                for command in batch:
+                    conn.execute('SAVEPOINT command')
+                    try:
+                        command(conn)
+                        executed += 1
+                    except Exception as e:
+                        conn.execute('ROLLBACK TO command')
+                        failed += 1
+                        logger.error(f"خطأ في أمر الكتابة: {e}")
+                    conn.execute('RELEASE command')
+        except Exception as e:
+            # لم يُكتب شيء: الدفعة تعود لأول الطابور بترتيبها
+            self._commands.extendleft(reversed(batch))
+            self._attempts += 1
+            delay = min(self.interval * 2 ** self._attempts, MAX_RETRY_DELAY)
+            self._retry_at = time.monotonic() + delay
+            logger.error(f"خطأ في معاملة الكتابة - إعادة المحاولة بعد {delay:.2f} ثانية: {e}")
+            with self._lock:
+                self.counters['retries'] += 1
+            return False
+        self._attempts = 0
+        self._retry_at = 0.0
+        self.commit_latency.add(time.perf_counter() - started)
+        with self._lock:
+            self.counters['executed'] += executed
+            self.counters['failed'] += failed
+            self.counters['transactions'] += 1
+        return True
+
+    def stop(self, timeout=10):
+        """تنفيذ كل الأوامر المتبقية والمهام الدورية ثم إيقاف الكاتب"""
+        if not self._running:
+            while self._commands and self._write_batch():
+                pass
+            if self._commands:
+                logger.error(f"تعذرت كتابة {len(self._commands)} أمر عند الإيقاف")
+            for task in self._periodic:
+                task()
+            return
+        self._stopping = True
+        self.wake()
+        if self._done.acquire(timeout=timeout):
+            self._done.release()
+        else:
+            logger.error("انتهت مهلة إيقاف كاتب قاعدة البيانات")
+        self._running = False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['queue_depth'] = len(self._commands)
+        stats['commit_latency'] = self.commit_latency.snapshot()
+        return stats
@@ -0,0 +1,1148 @@
+"""
+قوالب Flex الجاهزة
+
+الهياكل الثابتة تُبنى وتُحول إلى JSON مرة واحدة عند الاستيراد، ولا يُستبدل
+عند كل طلب إلا الحقول المتغيرة (الاسم، النقاط، نسبة الفوز، صفوف الصدارة).
+دوال *_bubble تبني الهيكل الكامل كـ dict، وتُستدعى هنا مرة واحدة فقط بعلامات
+الحقول المتغيرة.
+"""
+import json
+import re
+
+from outbound import RawMessage
+
+SLOT_PATTERN = re.compile(r'"\{\{(\w+)\}\}"')
+
+
+def slot(name):
+    """علامة حقل متغير داخل القالب"""
+    return '{{' + name + '}}'
+
+
+def dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+class RawJSON(str):
+    """جزء JSON جاهز يُدرج في القالب كما هو دون ترميز"""
+
+
+class JSONTemplate:
+    """JSON مُرمّز مسبقاً مع حقول تُستبدل عند الطلب"""
+
+    def __init__(self, obj):
+        self.json = dumps(obj)
+        # أجزاء ثابتة وأسماء حقول بالتناوب: [نص، حقل، نص، حقل، ...، نص]
+        self._parts = SLOT_PATTERN.split(self.json)
+
+    def render(self, **values):
+        parts = self._parts
+        if len(parts) == 1:
+            return parts[0]
+        out = []
+        for i, part in enumerate(parts):
+            if i % 2 == 0:
+                out.append(part)
+            else:
+                value = values[part]
+                out.append(value if isinstance(value, RawJSON) else dumps(value))
+        return ''.join(out)
+
+
+class FlexTemplate(JSONTemplate):
+    """قالب رسالة Flex كاملة"""
+
+    def __init__(self, alt_text, contents):
+        super().__init__({"type": "flex", "altText": alt_text, "contents": contents})
+
+    def render(self, quick_reply=None, **values):
+        return RawMessage(super().render(**values), quick_reply=quick_reply)
+
+
+# ---------------- هياكل البطاقات ----------------
+
+def menu_bubble(greeting):
+    """بطاقة البداية"""
+    return {
+        "type": "bubble",
+        "size": "mega",
+        "header": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "text",
+                    "text": "منصة الألعاب",
+                    "weight": "bold",
+                    "size": "xxl",
+                    "color": "#1a1a1a",
+                    "align": "center"
+                },
+                {
+                    "type": "text",
+                    "text": greeting,
+                    "size": "md",
+                    "color": "#6a6a6a",
+                    "align": "center",
+                    "margin": "sm"
+                }
+            ],
+            "backgroundColor": "#ffffff",
+            "paddingAll": "24px"
+        },
+        "body": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "box",
+                    "layout": "vertical",
+                    "contents": [
+                        {
+                            "type": "text",
+                            "text": "خطوات البدء",
+                            "weight": "bold",
+                            "size": "md",
+                            "color": "#2a2a2a"
+                        },
+                        {
+                            "type": "separator",
+                            "margin": "md",
+                            "color": "#e8e8e8"
+                        }
+                    ],
+                    "spacing": "sm"
+                },
+                {
+                    "type": "box",
+                    "layout": "vertical",
+                    "contents": [
+                        {
+                            "type": "box",
+                            "layout": "horizontal",
+                            "contents": [
+                                {
+                                    "type": "text",
+                                    "text": "1",
+                                    "size": "sm",
+                                    "color": "#ffffff",
+                                    "align": "center",
+                                    "weight": "bold",
+                                    "flex": 0
+                                },
+                                {
+                                    "type": "text",
+                                    "text": "اضغط على زر انضم للتسجيل",
+                                    "size": "sm",
+                                    "color": "#4a4a4a",
+                                    "flex": 1,
+                                    "margin": "md",
+                                    "wrap": True
+                                }
+                            ],
+                            "backgroundColor": "#2a2a2a",
+                            "cornerRadius": "md",
+                            "paddingAll": "12px",
+                            "spacing": "md"
+                        },
+                        {
+                            "type": "box",
+                            "layout": "horizontal",
+                            "contents": [
+                                {
+                                    "type": "text",
+                                    "text": "2",
+                                    "size": "sm",
+                                    "color": "#2a2a2a",
+                                    "align": "center",
+                                    "weight": "bold",
+                                    "flex": 0
+                                },
+                                {
+                                    "type": "text",
+                                    "text": "اختر لعبة من الأزرار أدناه",
+                                    "size": "sm",
+                                    "color": "#4a4a4a",
+                                    "flex": 1,
+                                    "margin": "md",
+                                    "wrap": True
+                                }
+                            ],
+                            "backgroundColor": "#f5f5f5",
+                            "cornerRadius": "md",
+                            "paddingAll": "12px",
+                            "spacing": "md",
+                            "margin": "sm"
+                        },
+                        {
+                            "type": "box",
+                            "layout": "horizontal",
+                            "contents": [
+                                {
+                                    "type": "text",
+                                    "text": "3",
+                                    "size": "sm",
+                                    "color": "#2a2a2a",
+                                    "align": "center",
+                                    "weight": "bold",
+                                    "flex": 0
+                                },
+                                {
+                                    "type": "text",
+                                    "text": "ابدأ اللعب واجمع النقاط",
+                                    "size": "sm",
+                                    "color": "#4a4a4a",
+                                    "flex": 1,
+                                    "margin": "md",
+                                    "wrap": True
+                                }
+                            ],
+                            "backgroundColor": "#f5f5f5",
+                            "cornerRadius": "md",
+                            "paddingAll": "12px",
+                            "spacing": "md",
+                            "margin": "sm"
+                        }
+                    ],
+                    "margin": "md"
+                },
+                {
+                    "type": "box",
+                    "layout": "vertical",
+                    "contents": [
+                        {
+                            "type": "text",
+                            "text": "15 لعبة متاحة",
+                            "size": "xs",
+                            "color": "#9a9a9a",
+                            "align": "center"
+                        },
+                        {
+                            "type": "text",
+                            "text": "إجاباتك تُحسب تلقائياً بعد التسجيل",
+                            "size": "xs",
+                            "color": "#9a9a9a",
+                            "align": "center",
+                            "margin": "xs"
+                        }
+                    ],
+                    "margin": "lg"
+                }
+            ],
+            "backgroundColor": "#ffffff",
+            "paddingAll": "20px"
+        },
+        "footer": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "separator",
+                    "color": "#e8e8e8"
+                },
+                {
+                    "type": "box",
+                    "layout": "horizontal",
+                    "contents": [
+                        {
+                            "type": "button",
+                            "action": {
+                                "type": "message",
+                                "label": "انضم",
+                                "text": "انضم"
+                            },
+                            "style": "primary",
+                            "color": "#2a2a2a",
+                            "height": "sm"
+                        },
+                        {
+                            "type": "button",
+                            "action": {
+                                "type": "message",
+                                "label": "مساعدة",
+                                "text": "مساعدة"
+                            },
+                            "style": "secondary",
+                            "height": "sm"
+                        }
+                    ],
+                    "spacing": "sm",
+                    "margin": "md"
+                }
+            ],
+            "backgroundColor": "#f8f8f8",
+            "paddingAll": "16px"
+        }
+    }
+
+
+def more_bubble():
+    """بطاقة الألعاب الإضافية"""
+    return {
+        "type": "bubble",
+        "body": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "text",
+                    "text": "ألعاب إضافية",
+                    "weight": "bold",
+                    "size": "xl",
+                    "color": "#1a1a1a",
+                    "align": "center"
+                },
+                {
+                    "type": "separator",
+                    "margin": "lg",
+                    "color": "#e8e8e8"
+                },
+                {
+                    "type": "box",
+                    "layout": "vertical",
+                    "contents": [
+                        {
+                            "type": "text",
+                            "text": "اختر من الأزرار أدناه",
+                            "size": "sm",
+                            "color": "#6a6a6a",
+                            "align": "center"
+                        }
+                    ],
+                    "margin": "lg"
+                }
+            ],
+            "backgroundColor": "#ffffff",
+            "paddingAll": "24px"
+        }
+    }
+
+
+def help_bubble():
+    """رسالة المساعدة - تصميم أنيق"""
+    return {
+        "type": "bubble",
+        "size": "mega",
+        "header": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "text",
+                    "text": "دليل الاستخدام",
+                    "weight": "bold",
+                    "size": "xxl",
+                    "color": "#1a1a1a",
+                    "align": "center"
+                }
+            ],
+            "backgroundColor": "#ffffff",
+            "paddingAll": "20px"
+        },
+        "body": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "box",
+                    "layout": "vertical",
+                    "contents": [
+                        {
+                            "type": "text",
+                            "text": "الأوامر الأساسية",
+                            "weight": "bold",
+                            "size": "lg",
+                            "color": "#2a2a2a",
+                            "margin": "none"
+                        },
+                        {
+                            "type": "separator",
+                            "margin": "md",
+                            "color": "#e8e8e8"
+                        }
+                    ],
+                    "margin": "none",
+                    "spacing": "sm"
+                },
+                {
+                    "type": "box",
+                    "layout": "vertical",
+                    "contents": [
+                        {
+                            "type": "box",
+                            "layout": "horizontal",
+                            "contents": [
+                                {
+                                    "type": "text",
+                                    "text": "انضم",
+                                    "size": "sm",
+                                    "color": "#1a1a1a",
+                                    "flex": 2,
+                                    "weight": "bold"
+                                },
+                                {
+                                    "type": "text",
+                                    "text": "التسجيل في البوت",
+                                    "size": "sm",
+                                    "color": "#6a6a6a",
+                                    "flex": 5,
+                                    "wrap": True
+                                }
+                            ],
+                            "spacing": "md"
+                        },
+                        {
+                            "type": "box",
+                            "layout": "horizontal",
+                            "contents": [
+                                {
+                                    "type": "text",
+                                    "text": "انسحب",
+                                    "size": "sm",
+                                    "color": "#1a1a1a",
+                                    "flex": 2,
+                                    "weight": "bold"
+                                },
+                                {
+                                    "type": "text",
+                                    "text": "إلغاء التسجيل",
+                                    "size": "sm",
+                                    "color": "#6a6a6a",
+                                    "flex": 5,
+                                    "wrap": True
+                                }
+                            ],
+                            "spacing": "md"
+                        },
+                        {
+                            "type": "box",
+                            "layout": "horizontal",
+                            "contents": [
+                                {
+                                    "type": "text",
+                                    "text": "نقاطي",
+                                    "size": "sm",
+                                    "color": "#1a1a1a",
+                                    "flex": 2,
+                                    "weight": "bold"
+                                },
+                                {
+                                    "type": "text",
+                                    "text": "عرض إحصائياتك",
+                                    "size": "sm",
+                                    "color": "#6a6a6a",
+                                    "flex": 5,
+                                    "wrap": True
+                                }
+                            ],
+                            "spacing": "md"
+                        },
+                        {
+                            "type": "box",
+                            "layout": "horizontal",
+                            "contents": [
+                                {
+                                    "type": "text",
+                                    "text": "الصدارة",
+                                    "size": "sm",
+                                    "color": "#1a1a1a",
+                                    "flex": 2,
+                                    "weight": "bold"
+                                },
+                                {
+                                    "type": "text",
+                                    "text": "أفضل اللاعبين - في المجموعة تظهر صدارتها و'الصدارة العامة' للكل",
+                                    "size": "sm",
+                                    "color": "#6a6a6a",
+                                    "flex": 5,
+                                    "wrap": True
+                                }
+                            ],
+                            "spacing": "md"
+                        },
+                        {
+                            "type": "box",
+                            "layout": "horizontal",
+                            "contents": [
+                                {
+                                    "type": "text",
+                                    "text": "إيقاف",
+                                    "size": "sm",
+                                    "color": "#1a1a1a",
+                                    "flex": 2,
+                                    "weight": "bold"
+                                },
+                                {
+                                    "type": "text",
+                                    "text": "إنهاء اللعبة الحالية",
+                                    "size": "sm",
+                                    "color": "#6a6a6a",
+                                    "flex": 5,
+                                    "wrap": True
+                                }
+                            ],
+                            "spacing": "md"
+                        }
+                    ],
+                    "spacing": "md",
+                    "margin": "md"
+                },
+                {
+                    "type": "box",
+                    "layout": "vertical",
+                    "contents": [
+                        {
+                            "type": "text",
+                            "text": "أثناء اللعب",
+                            "weight": "bold",
+                            "size": "lg",
+                            "color": "#2a2a2a",
+                            "margin": "none"
+                        },
+                        {
+                            "type": "separator",
+                            "margin": "md",
+                            "color": "#e8e8e8"
+                        }
+                    ],
+                    "margin": "xl",
+                    "spacing": "sm"
+                },
+                {
+                    "type": "box",
+                    "layout": "vertical",
+                    "contents": [
+                        {
+                            "type": "box",
+                            "layout": "horizontal",
+                            "contents": [
+                                {
+                                    "type": "text",
+                                    "text": "لمح",
+                                    "size": "sm",
+                                    "color": "#1a1a1a",
+                                    "flex": 2,
+                                    "weight": "bold"
+                                },
+                                {
+                                    "type": "text",
+                                    "text": "الحصول على تلميح",
+                                    "size": "sm",
+                                    "color": "#6a6a6a",
+                                    "flex": 5,
+                                    "wrap": True
+                                }
+                            ],
+                            "spacing": "md"
+                        },
+                        {
+                            "type": "box",
+                            "layout": "horizontal",
+                            "contents": [
+                                {
+                                    "type": "text",
+                                    "text": "جاوب",
+                                    "size": "sm",
+                                    "color": "#1a1a1a",
+                                    "flex": 2,
+                                    "weight": "bold"
+                                },
+                                {
+                                    "type": "text",
+                                    "text": "عرض الإجابة الصحيحة",
+                                    "size": "sm",
+                                    "color": "#6a6a6a",
+                                    "flex": 5,
+                                    "wrap": True
+                                }
+                            ],
+                            "spacing": "md"
+                        }
+                    ],
+                    "spacing": "md",
+                    "margin": "md"
+                }
+            ],
+            "spacing": "md",
+            "backgroundColor": "#ffffff",
+            "paddingAll": "20px"
+        },
+        "footer": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "separator",
+                    "color": "#e8e8e8"
+                },
+                {
+                    "type": "box",
+                    "layout": "horizontal",
+                    "contents": [
+                        {
+                            "type": "button",
+                            "action": {
+                                "type": "message",
+                                "label": "انضم",
+                                "text": "انضم"
+                            },
+                            "style": "primary",
+                            "color": "#2a2a2a",
+                            "height": "sm"
+                        },
+                        {
+                            "type": "button",
+                            "action": {
+                                "type": "message",
+                                "label": "نقاطي",
+                                "text": "نقاطي"
+                            },
+                            "style": "secondary",
+                            "height": "sm"
+                        },
+                        {
+                            "type": "button",
+                            "action": {
+                                "type": "message",
+                                "label": "الصدارة",
+                                "text": "الصدارة"
+                            },
+                            "style": "secondary",
+                            "height": "sm"
+                        }
+                    ],
+                    "spacing": "sm",
+                    "margin": "md"
+                },
+                {
+                    "type": "text",
+                    "text": "تم إنشاء هذا البوت بواسطة عبير الدوسري",
+                    "size": "xs",
+                    "color": "#9a9a9a",
+                    "align": "center",
+                    "wrap": True,
+                    "margin": "md"
+                }
+            ],
+            "backgroundColor": "#f8f8f8",
+            "paddingAll": "16px"
+        }
+    }
+
+
+def join_bubble(welcome):
+    """بطاقة التسجيل"""
+    return {
+        "type": "bubble",
+        "body": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "text",
+                    "text": "تم التسجيل بنجاح",
+                    "weight": "bold",
+                    "size": "xl",
+                    "color": "#1a1a1a",
+                    "align": "center"
+                },
+                {
+                    "type": "text",
+                    "text": welcome,
+                    "size": "md",
+                    "color": "#6a6a6a",
+                    "align": "center",
+                    "margin": "md"
+                },
+                {
+                    "type": "separator",
+                    "margin": "xl",
+                    "color": "#e8e8e8"
+                },
+                {
+                    "type": "text",
+                    "text": "يمكنك الآن اللعب في جميع الألعاب\n\nإجاباتك ستُحسب تلقائياً",
+                    "size": "sm",
+                    "color": "#4a4a4a",
+                    "align": "center",
+                    "wrap": True,
+                    "margin": "xl"
+                }
+            ],
+            "backgroundColor": "#ffffff",
+            "paddingAll": "28px"
+        }
+    }
+
+
+def stats_bubble(name, status, status_color, points, games, wins, win_rate, rank, top_percent, around):
+    """بطاقة إحصائيات اللاعب مع ترتيبه واللاعبين حوله"""
+    return {
+        "type": "bubble",
+        "size": "mega",
+        "header": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "text",
+                    "text": "إحصائياتك",
+                    "weight": "bold",
+                    "size": "xl",
+                    "color": "#1a1a1a",
+                    "align": "center"
+                },
+                {
+                    "type": "text",
+                    "text": name,
+                    "size": "sm",
+                    "color": "#6a6a6a",
+                    "align": "center",
+                    "margin": "sm"
+                }
+            ],
+            "backgroundColor": "#ffffff",
+            "paddingAll": "20px"
+        },
+        "body": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "box",
+                    "layout": "horizontal",
+                    "contents": [
+                        {
+                            "type": "text",
+                            "text": "الحالة",
+                            "size": "sm",
+                            "color": "#6a6a6a",
+                            "flex": 2
+                        },
+                        {
+                            "type": "text",
+                            "text": status,
+                            "size": "sm",
+                            "color": status_color,
+                            "flex": 3,
+                            "align": "end",
+                            "weight": "bold"
+                        }
+                    ]
+                },
+                {
+                    "type": "separator",
+                    "margin": "md",
+                    "color": "#e8e8e8"
+                },
+                {
+                    "type": "box",
+                    "layout": "horizontal",
+                    "contents": [
+                        {
+                            "type": "text",
+                            "text": "النقاط",
+                            "size": "sm",
+                            "color": "#6a6a6a",
+                            "flex": 2
+                        },
+                        {
+                            "type": "text",
+                            "text": points,
+                            "size": "xl",
+                            "color": "#1a1a1a",
+                            "flex": 3,
+                            "align": "end",
+                            "weight": "bold"
+                        }
+                    ],
+                    "margin": "md"
+                },
+                {
+                    "type": "separator",
+                    "margin": "md",
+                    "color": "#e8e8e8"
+                },
+                {
+                    "type": "box",
+                    "layout": "horizontal",
+                    "contents": [
+                        {
+                            "type": "text",
+                            "text": "الألعاب",
+                            "size": "sm",
+                            "color": "#6a6a6a",
+                            "flex": 2
+                        },
+                        {
+                            "type": "text",
+                            "text": games,
+                            "size": "sm",
+                            "color": "#2a2a2a",
+                            "flex": 3,
+                            "align": "end",
+                            "weight": "bold"
+                        }
+                    ],
+                    "margin": "md"
+                },
+                {
+                    "type": "box",
+                    "layout": "horizontal",
+                    "contents": [
+                        {
+                            "type": "text",
+                            "text": "الفوز",
+                            "size": "sm",
+                            "color": "#6a6a6a",
+                            "flex": 2
+                        },
+                        {
+                            "type": "text",
+                            "text": wins,
+                            "size": "sm",
+                            "color": "#2a2a2a",
+                            "flex": 3,
+                            "align": "end",
+                            "weight": "bold"
+                        }
+                    ],
+                    "margin": "sm"
+                },
+                {
+                    "type": "box",
+                    "layout": "horizontal",
+                    "contents": [
+                        {
+                            "type": "text",
+                            "text": "نسبة الفوز",
+                            "size": "sm",
+                            "color": "#6a6a6a",
+                            "flex": 2
+                        },
+                        {
+                            "type": "text",
+                            "text": win_rate,
+                            "size": "sm",
+                            "color": "#2a2a2a",
+                            "flex": 3,
+                            "align": "end",
+                            "weight": "bold"
+                        }
+                    ],
+                    "margin": "sm"
+                },
+                {
+                    "type": "separator",
+                    "margin": "md",
+                    "color": "#e8e8e8"
+                },
+                {
+                    "type": "box",
+                    "layout": "horizontal",
+                    "contents": [
+                        {
+                            "type": "text",
+                            "text": "الترتيب",
+                            "size": "sm",
+                            "color": "#6a6a6a",
+                            "flex": 2
+                        },
+                        {
+                            "type": "text",
+                            "text": rank,
+                            "size": "sm",
+                            "color": "#1a1a1a",
+                            "flex": 3,
+                            "align": "end",
+                            "weight": "bold"
+                        }
+                    ],
+                    "margin": "md"
+                },
+                {
+                    "type": "box",
+                    "layout": "horizontal",
+                    "contents": [
+                        {
+                            "type": "text",
+                            "text": "ضمن أفضل",
+                            "size": "sm",
+                            "color": "#6a6a6a",
+                            "flex": 2
+                        },
+                        {
+                            "type": "text",
+                            "text": top_percent,
+                            "size": "sm",
+                            "color": "#2a2a2a",
+                            "flex": 3,
+                            "align": "end",
+                            "weight": "bold"
+                        }
+                    ],
+                    "margin": "sm"
+                },
+                {
+                    "type": "text",
+                    "text": "اللاعبون حولك",
+                    "size": "xs",
+                    "color": "#9a9a9a",
+                    "margin": "md"
+                },
+                {
+                    "type": "box",
+                    "layout": "vertical",
+                    "contents": around,
+                    "margin": "sm"
+                }
+            ],
+            "backgroundColor": "#ffffff",
+            "paddingAll": "20px"
+        },
+        "footer": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "separator",
+                    "color": "#e8e8e8"
+                },
+                {
+                    "type": "button",
+                    "action": {
+                        "type": "message",
+                        "label": "الصدارة",
+                        "text": "الصدارة"
+                    },
+                    "style": "secondary",
+                    "height": "sm",
+                    "margin": "md"
+                }
+            ],
+            "backgroundColor": "#f8f8f8",
+            "paddingAll": "16px"
+        }
+    }
+
+
+def leaderboard_row(rank, name, points, rank_bg, rank_color, name_color, weight, margin):
+    """صف لاعب في لوحة الصدارة"""
+    return {
+        "type": "box",
+        "layout": "horizontal",
+        "contents": [
+            {
+                "type": "text",
+                "text": rank,
+                "size": "sm",
+                "color": rank_color,
+                "align": "center",
+                "weight": "bold",
+                "flex": 0
+            },
+            {
+                "type": "text",
+                "text": name,
+                "size": "sm",
+                "color": name_color,
+                "flex": 3,
+                "margin": "md",
+                "weight": weight
+            },
+            {
+                "type": "text",
+                "text": points,
+                "size": "sm",
+                "color": name_color,
+                "flex": 1,
+                "align": "end",
+                "weight": weight
+            }
+        ],
+        "backgroundColor": rank_bg,
+        "cornerRadius": "md",
+        "paddingAll": "12px",
+        "spacing": "md",
+        "margin": margin
+    }
+
+
+def leaderboard_bubble(rows, subtitle="أفضل اللاعبين", switch=None):
+    """بطاقة لوحة الصدارة - switch زر التبديل بين الصدارة العامة وصدارة المجموعة"""
+    footer = [
+        {
+            "type": "separator",
+            "color": "#e8e8e8"
+        },
+        {
+            "type": "button",
+            "action": {
+                "type": "message",
+                "label": "نقاطي",
+                "text": "نقاطي"
+            },
+            "style": "secondary",
+            "height": "sm",
+            "margin": "md"
+        }
+    ]
+    if switch:
+        footer.append({
+            "type": "button",
+            "action": {
+                "type": "message",
+                "label": switch,
+                "text": switch
+            },
+            "style": "secondary",
+            "height": "sm",
+            "margin": "sm"
+        })
+    return {
+        "type": "bubble",
+        "size": "mega",
+        "header": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": [
+                {
+                    "type": "text",
+                    "text": "لوحة الصدارة",
+                    "weight": "bold",
+                    "size": "xl",
+                    "color": "#1a1a1a",
+                    "align": "center"
+                },
+                {
+                    "type": "text",
+                    "text": subtitle,
+                    "size": "sm",
+                    "color": "#6a6a6a",
+                    "align": "center",
+                    "margin": "sm"
+                }
+            ],
+            "backgroundColor": "#ffffff",
+            "paddingAll": "20px"
+        },
+        "body": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": rows,
+            "backgroundColor": "#ffffff",
+            "paddingAll": "20px"
+        },
+        "footer": {
+            "type": "box",
+            "layout": "vertical",
+            "contents": footer,
+            "backgroundColor": "#f8f8f8",
+            "paddingAll": "16px"
+        }
+    }
+
+
+# ---------------- القوالب الجاهزة ----------------
+
+MENU = FlexTemplate("مرحباً", menu_bubble(slot('greeting')))
+MORE = FlexTemplate("ألعاب إضافية", more_bubble())
+HELP = FlexTemplate("مساعدة", help_bubble())
+JOIN = FlexTemplate("تم التسجيل", join_bubble(slot('welcome')))
+STATS = FlexTemplate("إحصائياتك", stats_bubble(
+    slot('name'), slot('status'), slot('status_color'),
+    slot('points'), slot('games'), slot('wins'), slot('win_rate'),
+    slot('rank'), slot('top_percent'), slot('around')
+))
+LEADERBOARD = FlexTemplate("لوحة الصدارة", leaderboard_bubble(slot('rows')))
+# داخل المجموعات: زر للتبديل إلى اللوحة الأخرى
+GLOBAL_LEADERBOARD = FlexTemplate("الصدارة العامة", leaderboard_bubble(
+    slot('rows'), "أفضل اللاعبين في كل المجموعات", switch="صدارة المجموعة"
+))
+GROUP_LEADERBOARD = FlexTemplate("صدارة المجموعة", leaderboard_bubble(
+    slot('rows'), "أفضل لاعبي هذه المجموعة", switch="الصدارة العامة"
+))
+PERIOD_LEADERBOARD = FlexTemplate("لوحة الصدارة", leaderboard_bubble(slot('rows'), slot('subtitle')))
+
+# أول ثلاثة مراكز بخلفية داكنة وخط عريض
+TOP_ROW = JSONTemplate(leaderboard_row(
+    slot('rank'), slot('name'), slot('points'),
+    "#4a4a4a", "#ffffff", "#ffffff", "bold", slot('margin')
+))
+ROW = JSONTemplate(leaderboard_row(
+    slot('rank'), slot('name'), slot('points'),
+    "#f5f5f5", "#2a2a2a", "#4a4a4a", "regular", "xs"
+))
+
+# صفوف "اللاعبون حولك" في بطاقة الإحصائيات - صف اللاعب نفسه مميز
+AROUND_ROW = JSONTemplate(leaderboard_row(
+    slot('rank'), slot('name'), slot('points'),
+    "#f5f5f5", "#2a2a2a", "#4a4a4a", "regular", slot('margin')
+))
+AROUND_ME_ROW = JSONTemplate(leaderboard_row(
+    slot('rank'), slot('name'), slot('points'),
+    "#4a4a4a", "#ffffff", "#ffffff", "bold", slot('margin')
+))
+
+
+def render_menu(display_name, quick_reply=None):
+    return MENU.render(quick_reply=quick_reply, greeting=f"مرحباً {display_name}")
+
+
+def render_join(display_name, quick_reply=None):
+    return JOIN.render(quick_reply=quick_reply, welcome=f"مرحباً بك {display_name}")
+
+
+def render_stats(display_name, stats, is_registered, rank_info=None, quick_reply=None):
+    """rank_info من RankIndex.rank() - None إذا لم يُرتب اللاعب بعد"""
+    win_rate = (stats['wins'] / stats['games_played'] * 100) if stats['games_played'] > 0 else 0
+    if rank_info is None:
+        rank = top_percent = "-"
+        around = [{'rank': None, 'user_id': stats.get('user_id'), 'display_name': display_name,
+                   'total_points': stats['total_points']}]
+    else:
+        rank = f"#{rank_info['rank']} من {rank_info['total']}"
+        top_percent = f"{rank_info['top_percent']:.1f}%"
+        around = rank_info['around']
+
+    rows = []
+    for i, player in enumerate(around):
+        template = AROUND_ME_ROW if player['user_id'] == stats.get('user_id') else AROUND_ROW
+        rows.append(template.render(
+            rank=str(player['rank']) if player['rank'] else "-",
+            name=str(player['display_name']),
+            points=str(player['total_points']),
+            margin="xs" if i > 0 else "none"
+        ))
+
+    return STATS.render(
+        quick_reply=quick_reply,
+        name=str(display_name),
+        status="مسجل" if is_registered else "غير مسجل",
+        status_color="#2a2a2a" if is_registered else "#9a9a9a",
+        points=str(stats['total_points']),
+        games=str(stats['games_played']),
+        wins=str(stats['wins']),
+        win_rate=f"{win_rate:.1f}%",
+        rank=rank,
+        top_percent=top_percent,
+        around=RawJSON('[' + ','.join(rows) + ']')
+    )
+
+
+def render_leaderboard_rows(leaders):
+    """صفوف الصدارة كجزء JSON جاهز"""
+    rows = []
+    for i, leader in enumerate(leaders, 1):
+        template = TOP_ROW if i <= 3 else ROW
+        rows.append(template.render(
+            rank=str(i),
+            name=leader['display_name'],
+            points=str(leader['total_points']),
+            margin="xs" if i > 1 else "none"
+        ))
+    return RawJSON('[' + ','.join(rows) + ']')
+
+
+def render_leaderboard(leaders, quick_reply=None):
+    return LEADERBOARD.render(quick_reply=quick_reply, rows=render_leaderboard_rows(leaders))
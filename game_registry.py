@@ -0,0 +1,490 @@
+"""
+سجل الألعاب النشطة واللاعبين المسجلين
+
+التخزين الفعلي في مخزن جلسات (session_store):
+- MemorySessionStore (الافتراضي): داخل العملية، مقسم على أجزاء (shards) لكل
+  منها قفل مستقل، وبيانات اللعبة هي نفس الكائن المحفوظ فلا حاجة لحفظ بعد كل إجابة
+- المخازن المشتركة (SQLite/Redis): كل عمليات gunicorn ترى نفس الألعاب. اللعبة
+  تُرمّز عند الحفظ وتُفك عند التحميل، ويُحتفظ بآخر نسخة مفكوكة محلياً فلا تُفك
+  مرة أخرى ما دام رقم نسختها لم يتغير. بعد تعديل اللعبة يجب استدعاء save()
+  التي ترفع VersionConflict إذا عدلتها عملية أخرى في الأثناء
+
+الألعاب الخاملة (hibernate_idle): مع المخزن المحلي تُنقل إلى مخزن على القرص (cold)
+وتُحذف من الذاكرة، ثم تعود تلقائياً عند أول get() لها. معرفات النائمة في مجموعة
+بالذاكرة (تُملأ من القرص عند الإنشاء) فلا يُسأل القرص ولا يؤخذ قفل الإيقاظ لرسائل
+المحادثات التي لا لعبة فيها. مع المخزن المشترك تُحذف نسختها المفكوكة المحلية فقط.
+
+المهلات (use_timers): كل لعبة لها مؤقت في TimerWheel يُعاد ضبطه مع كل نشاط
+(get/put)، وعند انطلاقه تُحذف اللعبة إن لم يحدث نشاط. مع المخزن المشترك قد يكون
+النشاط في عملية أخرى، فتُقارن نسخة اللعبة بنسختها عند ضبط المؤقت. thread المؤقتات
+لا يفعل سوى تسليم المهلة لـ run (عامل اللعبة في التطبيق)، والحذف وقراءة القرص هناك.
+
+ترتيب الأقفال (في MemorySessionStore ثم قفل النسخ المفكوكة هنا):
+    1. قفل اللاعبين
+    2. أقفال الأجزاء بترتيب تصاعدي لرقم الجزء
+لا يجوز أخذ قفل بعكس هذا الترتيب. عملياً لا تمسك أي دالة هنا أكثر من
+قفل واحد في نفس الوقت، لذلك لا يمكن حدوث deadlock.
+"""
+import pickle
+import threading
+import time
+from datetime import datetime
+from functools import partial
+
+from session_store import MemorySessionStore, VersionConflict
+
+
+class GameRegistry:
+    """سجل ألعاب فوق مخزن جلسات قابل للاستبدال"""
+
+    def __init__(self, shards=16, store=None, attach=None, codec=pickle, cold_store=None, run=None):
+        self.store = store if store is not None else MemorySessionStore(shards)
+        self.shared = self.store.shared
+        # مخزن الألعاب النائمة على القرص (SQLiteSessionStore) - للمخزن المحلي فقط
+        self.cold = None if self.shared else cold_store
+        # يعيد ربط اللعبة المفكوكة بخدمات العملية (line_bot_api ...)
+        self._attach = attach
+        # أي كائن فيه dumps/loads - التطبيق يمرر games.state
+        self._codec = codec
+        # run(game_id, task): تنفيذ task() في عامل اللعبة (بالترتيب مع رسائلها) - افتراضياً مباشرة
+        self._run = run or (lambda game_id, task: task())
+        # {game_id: game_data} آخر نسخة مفكوكة، و{game_id: bytes} ترميزها؛ مع المخزن
+        # المحلي _blobs آخر ترميز سُجل للحفظ الدوري
+        self._cache = {}
+        self._blobs = {}
+        self._cache_lock = threading.Lock()
+        # {game_id: آخر نشاط (monotonic)} للألعاب في الذاكرة
+        self._touched = {}
+        # نقل لعبة بين الذاكرة والقرص: لا تُنوَّم لعبة وتُوقَظ في نفس الوقت
+        self._wake_lock = threading.Lock()
+        # معرفات الألعاب النائمة في cold - تتغير تحت _wake_lock وتُقرأ دون قفل
+        self._hibernated = set(self.cold.game_ids()) if self.cold is not None else set()
+        # الألعاب المتغيرة منذ آخر take_changes() {game_id: bytes أو None للمحذوفة}
+        # ومعرفات اللاعبين المتغيرين - None حتى track_changes()
+        self._dirty_games = None
+        self._dirty_players = None
+        # TimerWheel ومهلة الخمول بالثواني - None حتى use_timers()
+        self._timers = None
+        self._timeout = None
+        self._on_expire = None
+        self.counters = {
+            'decodes': 0,
+            'cache_hits': 0,
+            'saves': 0,
+            'conflicts': 0,
+            'hibernations': 0,
+            'wakes': 0
+        }
+
+    def _count(self, name):
+        with self._cache_lock:
+            self.counters[name] += 1
+
+    def _encode(self, game_data):
+        return self._codec.dumps({key: value for key, value in game_data.items() if key != 'version'})
+
+    def _decode(self, version, blob):
+        game_data = self._codec.loads(blob)
+        game_data['version'] = version
+        if self._attach:
+            self._attach(game_data['game'])
+        return game_data
+
+    def _remember(self, game_id, game_data, blob):
+        with self._cache_lock:
+            self._cache[game_id] = game_data
+            self._blobs[game_id] = blob
+
+    def track_changes(self):
+        """بدء تتبع الألعاب واللاعبين المتغيرين (للحفظ الدوري على القرص)"""
+        with self._cache_lock:
+            if self._dirty_games is None:
+                self._dirty_games = {}
+                self._dirty_players = set()
+
+    def take_changes(self):
+        """المتغير منذ آخر استدعاء: ({game_id: bytes أو None}, user_ids)
+
+        الترميز تم عند الحفظ فلا تُلمس كائنات الألعاب هنا. لعبة حُفظت ثم حُذفت قبل
+        تسجيل حذفها تُعاد كمحذوفة؛ أي حذف لاحق يُسجل من جديد للاستدعاء التالي
+        """
+        with self._cache_lock:
+            games, players = self._dirty_games, self._dirty_players
+            if games is not None:
+                self._dirty_games, self._dirty_players = {}, set()
+        games = games or {}
+        for game_id, blob in games.items():
+            if blob is not None and not self._exists(game_id):
+                games[game_id] = None
+        return games, players or set()
+
+    def requeue_changes(self, games, user_ids):
+        """إعادة تغييرات لم تُحفظ لتؤخذ في take_changes() التالية - التغييرات الأحدث تبقى"""
+        with self._cache_lock:
+            if self._dirty_games is not None:
+                for game_id, blob in games.items():
+                    self._dirty_games.setdefault(game_id, blob)
+                self._dirty_players.update(user_ids)
+
+    def _changed(self, game_id=None, user_id=None, game_data=None, blob=None):
+        """تسجيل تغيير للحفظ الدوري - اللعبة تُرمّز هنا في thread صاحب التعديل"""
+        if self._dirty_games is None:
+            return
+        compare = game_data is not None and blob is None
+        if compare:
+            blob = self._encode(game_data)
+        with self._cache_lock:
+            if self._dirty_games is None:
+                return
+            if compare:
+                # رسائل لا تغير اللعبة (دردشة، إجابات مرفوضة) لا تُسجل
+                if self._blobs.get(game_id) == blob:
+                    return
+                self._blobs[game_id] = blob
+            if game_id is not None:
+                self._dirty_games[game_id] = blob
+            if user_id is not None:
+                self._dirty_players.add(user_id)
+
+    def _exists(self, game_id):
+        return game_id in self._hibernated or self.store.load(game_id) is not None
+
+    def _touch(self, game_id, version=None):
+        with self._cache_lock:
+            self._touched[game_id] = time.monotonic()
+        if self._timeout:
+            self._arm_expire(game_id, version)
+
+    def _disarm(self, game_id):
+        if self._timers is not None:
+            self._timers.disarm(('expire', game_id))
+
+    def _forget(self, game_id):
+        with self._cache_lock:
+            self._cache.pop(game_id, None)
+            self._blobs.pop(game_id, None)
+            self._touched.pop(game_id, None)
+
+    # ---------------- الألعاب ----------------
+
+    def get(self, game_id, wake=True):
+        """بيانات اللعبة النشطة أو None
+
+        wake=False للقراءة دون اعتبارها نشاطاً: اللعبة النائمة تُقرأ من القرص وتبقى فيه
+        """
+        loaded = self.store.load(game_id)
+        if loaded is None:
+            if game_id in self._hibernated:
+                return self._wake(game_id, wake)
+            self._forget(game_id)
+            return None
+        version, record = loaded
+        if wake:
+            self._touch(game_id, version)
+        if not self.shared:
+            return record
+
+        with self._cache_lock:
+            cached = self._cache.get(game_id)
+            if cached is not None and cached['version'] == version:
+                self.counters['cache_hits'] += 1
+                return cached
+        game_data = self._decode(version, record)
+        self._remember(game_id, game_data, record)
+        self._count('decodes')
+        return game_data
+
+    def _wake(self, game_id, wake):
+        with self._wake_lock:
+            # قد تكون أُوقظت للتو في thread آخر
+            loaded = self.store.load(game_id)
+            if loaded is not None:
+                return loaded[1]
+            for _ in range(3):
+                cold = self.cold.load(game_id)
+                if cold is None:
+                    # أيقظتها أو حذفتها عملية أخرى تشارك ملف القرص
+                    self._hibernated.discard(game_id)
+                    return None
+                game_data = self._decode(*cold)
+                if not wake:
+                    return game_data
+                # تُنقل فقط إن لم تتغير نسختها على القرص منذ قراءتها
+                if self.cold.delete(game_id, expected=cold[0]):
+                    break
+            else:
+                return None
+            game_data['version'] = self.store.save(game_id, game_data, game_data['created_at'].timestamp())
+            self._hibernated.discard(game_id)
+        with self._cache_lock:
+            self._blobs[game_id] = cold[1]
+        self._touch(game_id, game_data['version'])
+        self._count('wakes')
+        return game_data
+
+    def hibernate_idle(self, idle_seconds):
+        """إخراج الألعاب التي لم تُستخدم منذ idle_seconds من الذاكرة - يعيد عددها"""
+        if not self.shared and self.cold is None:
+            return 0
+        cutoff = time.monotonic() - idle_seconds
+        with self._cache_lock:
+            idle = [game_id for game_id, touched in self._touched.items() if touched < cutoff]
+
+        count = 0
+        for game_id in idle:
+            if self.shared:
+                self._forget(game_id)
+                count += 1
+                continue
+            with self._wake_lock:
+                with self._cache_lock:
+                    touched = self._touched.get(game_id)
+                if touched is None or touched >= cutoff:
+                    continue
+                loaded = self.store.load(game_id)
+                if loaded is not None:
+                    game_data = loaded[1]
+                    self.cold.save(game_id, self._encode(game_data), game_data['created_at'].timestamp())
+                    self._hibernated.add(game_id)
+                    self.store.delete(game_id)
+                    count += 1
+                self._forget(game_id)
+        with self._cache_lock:
+            self.counters['hibernations'] += count
+        return count
+
+    def put(self, game_id, game, game_type, participants):
+        """تسجيل لعبة جديدة وإرجاع بيانات اللعبة التي حلت محلها (أو None)
+
+        يجب إنشاء كائن اللعبة قبل الاستدعاء خارج أي قفل
+        """
+        game_data = {
+            'game': game,
+            'type': game_type,
+            'created_at': datetime.now(),
+            'participants': participants
+        }
+        previous = self.get(game_id)
+        record = self._encode(game_data) if self.shared else game_data
+        game_data['version'] = self.store.save(game_id, record, game_data['created_at'].timestamp())
+        if self.shared:
+            self._remember(game_id, game_data, record)
+        self._touch(game_id, game_data['version'])
+        self._changed(game_id, game_data=game_data, blob=record if self.shared else None)
+        return previous
+
+    def save(self, game_id, game_data):
+        """حفظ تعديلات اللعبة في المخزن المشترك
+
+        يرفع VersionConflict إذا تغيرت اللعبة منذ تحميلها؛ على المستدعي إعادة
+        التحميل عبر get() وإعادة تطبيق التعديل. مع المخزن المحلي تُسجل اللعبة كمتغيرة فقط.
+        """
+        if not self.shared:
+            if self.cold is not None and self.store.load(game_id) is None:
+                # نُوّمت أثناء معالجة الرسالة: التعديل يُحفظ في نسختها على القرص
+                self._save_cold(game_id, game_data)
+            self._changed(game_id, game_data=game_data)
+            return
+        record = self._encode(game_data)
+        with self._cache_lock:
+            # رسائل لا تغير اللعبة (دردشة، إجابات مرفوضة) لا تُكتب
+            if self._cache.get(game_id) is game_data and self._blobs.get(game_id) == record:
+                return
+        try:
+            version = self.store.save(game_id, record, game_data['created_at'].timestamp(),
+                                      expected=game_data['version'])
+        except VersionConflict:
+            self._forget(game_id)
+            self._count('conflicts')
+            raise
+        game_data['version'] = version
+        self._remember(game_id, game_data, record)
+        self._count('saves')
+        self._changed(game_id, blob=record)
+
+    def _save_cold(self, game_id, game_data):
+        with self._wake_lock:
+            if game_id in self._hibernated and self.store.load(game_id) is None:
+                self.cold.save(game_id, self._encode(game_data), game_data['created_at'].timestamp())
+
+    def remove(self, game_id, game=None):
+        """حذف اللعبة وإرجاع بياناتها - إذا مُررت game تُحذف فقط إن كانت هي نفسها"""
+        game_data = self.get(game_id)
+        if game_data is None:
+            return None
+        if game is not None and game_data['game'] is not game:
+            return None
+        removed = self.store.delete(game_id, expected=game_data['version'])
+        self._forget(game_id)
+        if not removed:
+            return None
+        self._disarm(game_id)
+        self._changed(game_id)
+        return game_data
+
+    def _remove_cold(self, game_id):
+        with self._wake_lock:
+            loaded = self.cold.load(game_id)
+            if loaded is None:
+                self._hibernated.discard(game_id)
+                return None
+            if not self.cold.delete(game_id, expected=loaded[0]):
+                return None
+            self._hibernated.discard(game_id)
+        self._disarm(game_id)
+        self._changed(game_id)
+        return self._decode(*loaded)
+
+    def restore(self, game_id, blob):
+        """إعادة لعبة محفوظة (من نقطة حفظ) بترميزها دون تسجيلها كمتغيرة - يعيد False إن تُجوهلت"""
+        if game_id in self._hibernated:
+            # النسخة النائمة على القرص أحدث أو مساوية
+            return False
+        game_data = self._decode(None, blob)
+        record = blob if self.shared else game_data
+        game_data['version'] = self.store.save(game_id, record, game_data['created_at'].timestamp())
+        if self.shared:
+            self._remember(game_id, game_data, record)
+        else:
+            with self._cache_lock:
+                self._blobs[game_id] = blob
+        self._touch(game_id, game_data['version'])
+        return True
+
+    def games_count(self):
+        count = self.store.games_count()
+        if self.cold is not None:
+            count += self.cold.games_count()
+        return count
+
+    def _update_all(self, change):
+        """تطبيق change(game_data) على كل الألعاب النشطة، كل لعبة في عاملها (run)
+
+        التعديل والترميز لا يحدثان أبداً في thread آخر بالتوازي مع رسائل اللعبة
+        """
+        for game_id in list(self.store.game_ids()) + list(self._hibernated):
+            self._run(game_id, partial(self._update_game, game_id, change))
+
+    def _update_game(self, game_id, change):
+        if game_id in self._hibernated:
+            # اللعبة النائمة تُعدل على القرص دون إيقاظها
+            with self._wake_lock:
+                loaded = self.cold.load(game_id) if game_id in self._hibernated else None
+                if loaded is not None:
+                    game_data = self._decode(*loaded)
+                    change(game_data)
+                    blob = self._encode(game_data)
+                    self.cold.save(game_id, blob, game_data['created_at'].timestamp())
+            if loaded is not None:
+                self._changed(game_id, blob=blob)
+                return
+        # مع إعادة المحاولة عند التعارض
+        for _ in range(3):
+            game_data = self.get(game_id, wake=False)
+            if game_data is None:
+                return
+            change(game_data)
+            try:
+                self.save(game_id, game_data)
+                return
+            except VersionConflict:
+                continue
+
+    # ---------------- المهلات ----------------
+
+    def use_timers(self, timers, timeout=None, on_expire=None):
+        """ربط السجل بـ TimerWheel
+
+        timeout: ثواني الخمول قبل حذف اللعبة، ثم on_expire(game_id, game_data) عبر run.
+        الألعاب الموجودة (المستعادة أو النائمة) تُضبط مهلتها من الآن
+        """
+        self._timers = timers
+        self._timeout = timeout
+        self._on_expire = on_expire
+        if timeout:
+            self.arm_expiry()
+
+    def arm_expiry(self):
+        """ضبط مهلة للألعاب التي ليس لها مؤقت في هذه العملية - يعيد عددها
+
+        مع المخزن المشترك تُستدعى دورياً لألعاب أنشأتها عملية أخرى انتهت قبل حذفها
+        """
+        game_ids = list(self.store.game_ids())
+        game_ids += self._hibernated
+        count = 0
+        for game_id in game_ids:
+            if self._timers.armed(('expire', game_id)):
+                continue
+            loaded = self.store.load(game_id)
+            version = loaded[0] if loaded is not None else None
+            self._arm_expire(game_id, version)
+            count += 1
+        return count
+
+    def _arm_expire(self, game_id, version):
+        self._timers.arm(('expire', game_id), self._timeout, self._expired, game_id, version)
+
+    def _expired(self, game_id, version):
+        # على thread المؤقتات: التسليم فقط دون قراءة أو كتابة
+        self._run(game_id, partial(self._expire, game_id, version))
+
+    def _expire(self, game_id, version):
+        if self._timers.armed(('expire', game_id)):
+            # نشاط بعد انطلاق المؤقت أعاد ضبطه
+            return
+        game_data = self.get(game_id, wake=False)
+        if game_data is None:
+            return
+        if self.shared and game_data['version'] != version:
+            # تغيرت في عملية أخرى: المهلة تبدأ من نسختها الحالية
+            self._arm_expire(game_id, game_data['version'])
+            return
+        if self.cold is not None and self.store.load(game_id) is None:
+            removed = self._remove_cold(game_id)
+        else:
+            removed = self.remove(game_id, game_data['game'])
+        if removed is not None and self._on_expire:
+            self._on_expire(game_id, removed)
+
+    # ---------------- اللاعبون ----------------
+
+    def is_registered(self, user_id):
+        return self.store.has_player(user_id)
+
+    def participants_for(self, user_id):
+        """نسخة من اللاعبين المسجلين مع صاحب الأمر"""
+        participants = self.store.players()
+        participants.add(user_id)
+        return participants
+
+    def register(self, user_id):
+        """تسجيل لاعب وإضافته لجميع الألعاب النشطة - يعيد False إن كان مسجلاً"""
+        if not self.store.add_player(user_id):
+            return False
+        self._changed(user_id=user_id)
+        self._update_all(lambda game_data: game_data.setdefault('participants', set()).add(user_id))
+        return True
+
+    def unregister(self, user_id):
+        """إلغاء تسجيل لاعب وإزالته من الألعاب النشطة - يعيد False إن لم يكن مسجلاً"""
+        if not self.store.remove_player(user_id):
+            return False
+        self._changed(user_id=user_id)
+        self._update_all(lambda game_data: game_data.get('participants', set()).discard(user_id))
+        return True
+
+    def restore_player(self, user_id):
+        self.store.add_player(user_id)
+
+    def players_count(self):
+        return self.store.players_count()
+
+    def stats(self):
+        with self._cache_lock:
+            stats = dict(self.counters)
+            stats['cached'] = len(self._cache)
+        stats['store'] = type(self.store).__name__
+        if self.cold is not None:
+            stats['resident'] = self.store.games_count()
+            stats['hibernated'] = self.cold.games_count()
+        return stats
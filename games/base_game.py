@@ -6,18 +6,69 @@ import re
 from collections import defaultdict
 
 
+class DisplayName:
+    """اسم عرض يُجلب عند أول استخدام فقط
+
+    يُمرر إلى check_answer بدلاً من النص حتى لا يُستدعى LINE API للرسائل
+    التي لا تحتاج اسماً (إجابات خاطئة ودردشة). استخدام الكائن داخل f-string
+    أو str() يجلب الاسم.
+    """
+    __slots__ = ('_resolve', '_value')
+    
+    def __init__(self, resolve):
+        self._resolve = resolve
+        self._value = None
+    
+    @property
+    def value(self):
+        if self._value is None:
+            self._value = self._resolve()
+        return self._value
+    
+    @property
+    def resolved(self):
+        return self._value is not None
+    
+    def __str__(self):
+        return self.value
+    
+    def __format__(self, format_spec):
+        return format(self.value, format_spec)
+    
+    def __repr__(self):
+        return f"DisplayName({self._value!r})"
+
+
 class BaseGame:
     """الفئة الأساسية لجميع الألعاب"""
     
+    # مراجع للخدمات لا تُحفظ مع حالة اللعبة، وتُعاد بعد التحميل من مخزن الجلسات
+    TRANSIENT = ('line_bot_api', 'get_api_key', 'switch_key')
+    # بنوك الأسئلة المشتركة على مستوى الوحدة {اسم الحقل: البنك}؛ الحالة المحفوظة
+    # (games/state.py) تحوي مواقع العناصر في البنك فقط
+    STATE_BANKS = {}
+    
     def __init__(self, line_bot_api, questions_count=10):
         self.line_bot_api = line_bot_api
         self.questions_count = questions_count
         self.current_question = 0
         self.scores = defaultdict(int)
+        # نتائج كل لاعب حسب user_id - تُسجل مرة واحدة عند انتهاء الجلسة
+        self.player_results = {}
         self.answered_users = set()
         self.current_answer = None
         self.game_active = True
-        
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self.TRANSIENT:
+            state.pop(name, None)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.line_bot_api = None
+    
     def normalize_text(self, text):
         """تطبيع النص للمقارنة"""
         if not text:
@@ -37,7 +88,11 @@ class BaseGame:
         return text
     
     def check_answer(self, user_answer, user_id, display_name):
-        """فحص الإجابة - يجب تنفيذها في الفئات الفرعية"""
+        """فحص الإجابة - يجب تنفيذها في الفئات الفرعية
+
+        display_name قد يكون نصاً أو DisplayName يُجلب عند الطلب، لذا يجب
+        استخدامه فقط في المسارات التي تعرض الاسم فعلاً (عند منح النقاط مثلاً).
+        """
         raise NotImplementedError("يجب تنفيذ check_answer في الفئة الفرعية")
     
     def start_game(self):
@@ -94,10 +149,32 @@ class BaseGame:
     
     def add_score(self, user_id, display_name, points=10):
         """إضافة نقاط للاعب"""
+        display_name = str(display_name)
         self.scores[display_name] += points
+        result = self.player_results.get(user_id)
+        if result is None:
+            result = self.player_results[user_id] = {'display_name': display_name, 'points': 0}
+        result['display_name'] = display_name
+        result['points'] += points
         self.answered_users.add(user_id)
         return points
     
+    def session_results(self):
+        """نتائج الجلسة لكل لاعب: [{user_id, display_name, points, won}]
+
+        الفائز صاحب أعلى نقاط (الأسبق عند التعادل) كما في end_game
+        """
+        ranked = sorted(self.player_results.items(), key=lambda item: item[1]['points'], reverse=True)
+        return [
+            {
+                'user_id': user_id,
+                'display_name': result['display_name'],
+                'points': result['points'],
+                'won': i == 0 and result['points'] > 0
+            }
+            for i, (user_id, result) in enumerate(ranked)
+        ]
+    
     def get_hint(self):
         """الحصول على تلميح"""
         if not self.current_answer:
@@ -6,18 +6,23 @@ from .base_game import BaseGame
 import random
 
 
+# قائمة كلمات للبداية
+STARTING_WORDS = [
+    "سيارة", "تفاح", "قلم", "نجم", "كتاب", "باب", "رمل", 
+    "لعبة", "حديقة", "ورد", "دفتر", "معلم", "منزل", "شمس",
+    "سفر", "رياضة", "علم", "مدرسة", "طائرة", "عصير"
+]
+
+
 class ChainWordsGame(BaseGame):
     """لعبة سلسلة الكلمات"""
     
+    STATE_BANKS = {'starting_words': STARTING_WORDS}
+    
     def __init__(self, line_bot_api):
         super().__init__(line_bot_api, questions_count=10)
         
-        # قائمة كلمات للبداية
-        self.starting_words = [
-            "سيارة", "تفاح", "قلم", "نجم", "كتاب", "باب", "رمل", 
-            "لعبة", "حديقة", "ورد", "دفتر", "معلم", "منزل", "شمس",
-            "سفر", "رياضة", "علم", "مدرسة", "طائرة", "عصير"
-        ]
+        self.starting_words = STARTING_WORDS
         
         # الكلمة الحالية
         self.last_word = None
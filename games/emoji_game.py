@@ -6,40 +6,45 @@ from .base_game import BaseGame
 import random
 
 
+# قائمة الإيموجي مع معانيها
+EMOJIS = [
+    {"emoji": "🚗", "answer": "سيارة"},
+    {"emoji": "✈️", "answer": "طائرة"},
+    {"emoji": "🏠", "answer": "بيت"},
+    {"emoji": "📱", "answer": "هاتف"},
+    {"emoji": "💻", "answer": "حاسوب"},
+    {"emoji": "📚", "answer": "كتاب"},
+    {"emoji": "⚽", "answer": "كرة"},
+    {"emoji": "🍎", "answer": "تفاحة"},
+    {"emoji": "🌙", "answer": "قمر"},
+    {"emoji": "☀️", "answer": "شمس"},
+    {"emoji": "⭐", "answer": "نجم"},
+    {"emoji": "🌸", "answer": "زهرة"},
+    {"emoji": "🌳", "answer": "شجرة"},
+    {"emoji": "🐱", "answer": "قطة"},
+    {"emoji": "🐶", "answer": "كلب"},
+    {"emoji": "🦁", "answer": "أسد"},
+    {"emoji": "🐘", "answer": "فيل"},
+    {"emoji": "🦅", "answer": "نسر"},
+    {"emoji": "🐠", "answer": "سمكة"},
+    {"emoji": "🎂", "answer": "كعكة"},
+    {"emoji": "🍕", "answer": "بيتزا"},
+    {"emoji": "☕", "answer": "قهوة"},
+    {"emoji": "🎵", "answer": "موسيقى"},
+    {"emoji": "⚽", "answer": "كرة قدم"},
+    {"emoji": "🏆", "answer": "كأس"}
+]
+
+
 class EmojiGame(BaseGame):
     """لعبة تخمين معنى الإيموجي"""
     
+    STATE_BANKS = {'emojis': EMOJIS}
+    
     def __init__(self, line_bot_api):
         super().__init__(line_bot_api, questions_count=10)
         
-        # قائمة الإيموجي مع معانيها
-        self.emojis = [
-            {"emoji": "🚗", "answer": "سيارة"},
-            {"emoji": "✈️", "answer": "طائرة"},
-            {"emoji": "🏠", "answer": "بيت"},
-            {"emoji": "📱", "answer": "هاتف"},
-            {"emoji": "💻", "answer": "حاسوب"},
-            {"emoji": "📚", "answer": "كتاب"},
-            {"emoji": "⚽", "answer": "كرة"},
-            {"emoji": "🍎", "answer": "تفاحة"},
-            {"emoji": "🌙", "answer": "قمر"},
-            {"emoji": "☀️", "answer": "شمس"},
-            {"emoji": "⭐", "answer": "نجم"},
-            {"emoji": "🌸", "answer": "زهرة"},
-            {"emoji": "🌳", "answer": "شجرة"},
-            {"emoji": "🐱", "answer": "قطة"},
-            {"emoji": "🐶", "answer": "كلب"},
-            {"emoji": "🦁", "answer": "أسد"},
-            {"emoji": "🐘", "answer": "فيل"},
-            {"emoji": "🦅", "answer": "نسر"},
-            {"emoji": "🐠", "answer": "سمكة"},
-            {"emoji": "🎂", "answer": "كعكة"},
-            {"emoji": "🍕", "answer": "بيتزا"},
-            {"emoji": "☕", "answer": "قهوة"},
-            {"emoji": "🎵", "answer": "موسيقى"},
-            {"emoji": "⚽", "answer": "كرة قدم"},
-            {"emoji": "🏆", "answer": "كأس"}
-        ]
+        self.emojis = EMOJIS.copy()
         
         random.shuffle(self.emojis)
     
@@ -7,35 +7,40 @@ import random
 from datetime import datetime
 
 
+# جمل للكتابة السريعة
+SENTENCES = [
+    "السرعة والدقة مفتاح النجاح",
+    "العلم نور والجهل ظلام",
+    "الصبر مفتاح الفرج",
+    "من جد وجد ومن زرع حصد",
+    "الوقت كالسيف إن لم تقطعه قطعك",
+    "اطلبوا العلم من المهد إلى اللحد",
+    "الصديق وقت الضيق",
+    "درهم وقاية خير من قنطار علاج",
+    "العقل السليم في الجسم السليم",
+    "خير الكلام ما قل ودل",
+    "لا تؤجل عمل اليوم إلى الغد",
+    "الحكمة ضالة المؤمن",
+    "القراءة غذاء العقل",
+    "النظافة من الإيمان",
+    "التعاون أساس النجاح",
+    "الأمانة من صفات المؤمنين",
+    "الصدق منجاة والكذب مهلكة",
+    "احترم تُحترم",
+    "المرء على دين خليله",
+    "كل إناء بما فيه ينضح"
+]
+
+
 class FastTypingGame(BaseGame):
     """لعبة الكتابة السريعة"""
     
+    STATE_BANKS = {'sentences': SENTENCES}
+    
     def __init__(self, line_bot_api):
         super().__init__(line_bot_api, questions_count=10)
         
-        # جمل للكتابة السريعة
-        self.sentences = [
-            "السرعة والدقة مفتاح النجاح",
-            "العلم نور والجهل ظلام",
-            "الصبر مفتاح الفرج",
-            "من جد وجد ومن زرع حصد",
-            "الوقت كالسيف إن لم تقطعه قطعك",
-            "اطلبوا العلم من المهد إلى اللحد",
-            "الصديق وقت الضيق",
-            "درهم وقاية خير من قنطار علاج",
-            "العقل السليم في الجسم السليم",
-            "خير الكلام ما قل ودل",
-            "لا تؤجل عمل اليوم إلى الغد",
-            "الحكمة ضالة المؤمن",
-            "القراءة غذاء العقل",
-            "النظافة من الإيمان",
-            "التعاون أساس النجاح",
-            "الأمانة من صفات المؤمنين",
-            "الصدق منجاة والكذب مهلكة",
-            "احترم تُحترم",
-            "المرء على دين خليله",
-            "كل إناء بما فيه ينضح"
-        ]
+        self.sentences = SENTENCES.copy()
         
         random.shuffle(self.sentences)
         self.start_time = None
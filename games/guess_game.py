@@ -6,92 +6,94 @@ from .base_game import BaseGame
 import random
 
 
+# قاعدة بيانات الكلمات مرتبة حسب الفئة والحرف
+ITEMS = {
+    "المطبخ": {
+        "ق": ["قدر", "قلاية"],
+        "م": ["ملعقة", "مغرفة"],
+        "س": ["سكين", "صحن"],
+        "ف": ["فرن", "فنجان"],
+        "ك": ["كوب", "كاسة"],
+        "ط": ["طبق", "طنجرة"],
+        "ش": ["شوكة"],
+        "ب": ["برادة"],
+        "غ": ["غلاية"]
+    },
+    "غرفة النوم": {
+        "س": ["سرير"],
+        "و": ["وسادة"],
+        "م": ["مرآة", "مخدة"],
+        "خ": ["خزانة"],
+        "د": ["دولاب"],
+        "ل": ["لحاف"],
+        "ش": ["شراشف"],
+        "ب": ["بطانية"]
+    },
+    "غرفة الجلوس": {
+        "ك": ["كرسي", "كنب"],
+        "ط": ["طاولة"],
+        "ت": ["تلفاز", "تلفزيون"],
+        "س": ["ستارة"],
+        "ر": ["رف"],
+        "م": ["مكتب"],
+        "ش": ["شاشة"]
+    },
+    "الحمام": {
+        "ص": ["صابون"],
+        "م": ["مرحاض", "مغسلة", "مرآة"],
+        "ش": ["شامبو", "شطاف"],
+        "ف": ["فرشاة"],
+        "م": ["منشفة"],
+        "ح": ["حوض"]
+    },
+    "المدرسة": {
+        "ق": ["قلم"],
+        "د": ["دفتر"],
+        "ك": ["كتاب"],
+        "م": ["مسطرة", "ممحاة", "محفظة"],
+        "س": ["سبورة"],
+        "ط": ["طاولة"],
+        "ح": ["حقيبة"]
+    },
+    "السيارة": {
+        "م": ["محرك", "مقود"],
+        "ع": ["عجلة"],
+        "ك": ["كرسي"],
+        "ش": ["شباك"],
+        "ب": ["باب", "بنزين"],
+        "ف": ["فرامل"],
+        "ر": ["رادار"]
+    },
+    "الحديقة": {
+        "ش": ["شجرة"],
+        "ز": ["زهرة"],
+        "ع": ["عشب"],
+        "ب": ["بركة"],
+        "م": ["مقعد"],
+        "ج": ["جذع"],
+        "و": ["ورقة"]
+    }
+}
+
+# قائمة الأسئلة: سؤال لكل فئة وحرف
+QUESTIONS = [
+    {"category": category, "letter": letter, "answers": words}
+    for category, letters_dict in ITEMS.items()
+    for letter, words in letters_dict.items()
+    if words
+]
+
+
 class GuessGame(BaseGame):
     """لعبة تخمين الكلمة من الفئة والحرف"""
     
+    STATE_BANKS = {'items': ITEMS, 'questions_list': QUESTIONS}
+    
     def __init__(self, line_bot_api):
         super().__init__(line_bot_api, questions_count=10)
         
-        # قاعدة بيانات الكلمات مرتبة حسب الفئة والحرف
-        self.items = {
-            "المطبخ": {
-                "ق": ["قدر", "قلاية"],
-                "م": ["ملعقة", "مغرفة"],
-                "س": ["سكين", "صحن"],
-                "ف": ["فرن", "فنجان"],
-                "ك": ["كوب", "كاسة"],
-                "ط": ["طبق", "طنجرة"],
-                "ش": ["شوكة"],
-                "ب": ["برادة"],
-                "غ": ["غلاية"]
-            },
-            "غرفة النوم": {
-                "س": ["سرير"],
-                "و": ["وسادة"],
-                "م": ["مرآة", "مخدة"],
-                "خ": ["خزانة"],
-                "د": ["دولاب"],
-                "ل": ["لحاف"],
-                "ش": ["شراشف"],
-                "ب": ["بطانية"]
-            },
-            "غرفة الجلوس": {
-                "ك": ["كرسي", "كنب"],
-                "ط": ["طاولة"],
-                "ت": ["تلفاز", "تلفزيون"],
-                "س": ["ستارة"],
-                "ر": ["رف"],
-                "م": ["مكتب"],
-                "ش": ["شاشة"]
-            },
-            "الحمام": {
-                "ص": ["صابون"],
-                "م": ["مرحاض", "مغسلة", "مرآة"],
-                "ش": ["شامبو", "شطاف"],
-                "ف": ["فرشاة"],
-                "م": ["منشفة"],
-                "ح": ["حوض"]
-            },
-            "المدرسة": {
-                "ق": ["قلم"],
-                "د": ["دفتر"],
-                "ك": ["كتاب"],
-                "م": ["مسطرة", "ممحاة", "محفظة"],
-                "س": ["سبورة"],
-                "ط": ["طاولة"],
-                "ح": ["حقيبة"]
-            },
-            "السيارة": {
-                "م": ["محرك", "مقود"],
-                "ع": ["عجلة"],
-                "ك": ["كرسي"],
-                "ش": ["شباك"],
-                "ب": ["باب", "بنزين"],
-                "ف": ["فرامل"],
-                "ر": ["رادار"]
-            },
-            "الحديقة": {
-                "ش": ["شجرة"],
-                "ز": ["زهرة"],
-                "ع": ["عشب"],
-                "ب": ["بركة"],
-                "م": ["مقعد"],
-                "ج": ["جذع"],
-                "و": ["ورقة"]
-            }
-        }
-        
-        # إنشاء قائمة الأسئلة
-        self.questions_list = []
-        for category, letters_dict in self.items.items():
-            for letter, words in letters_dict.items():
-                if words:
-                    self.questions_list.append({
-                        "category": category,
-                        "letter": letter,
-                        "answers": words
-                    })
-        
+        self.items = ITEMS
+        self.questions_list = QUESTIONS.copy()
         random.shuffle(self.questions_list)
     
     def start_game(self):
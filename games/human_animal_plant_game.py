@@ -6,81 +6,90 @@ from .base_game import BaseGame
 import random
 
 
+# الحروف المتاحة والفئات
+LETTERS = list("ابتثجحخدذرزسشصضطظعغفقكلمنهوي")
+CATEGORIES = ["إنسان", "حيوان", "نبات", "جماد", "بلاد"]
+
+# قاعدة بيانات للإجابات الصحيحة
+ANSWERS = {
+    "إنسان": {
+        "أ": ["أحمد", "أمل", "أسامة", "أمير"],
+        "ب": ["بدر", "بسمة", "باسل"],
+        "م": ["محمد", "مريم", "ماجد", "منى"],
+        "س": ["سارة", "سعيد", "سامي"],
+        "ع": ["علي", "عمر", "عائشة"],
+        "ف": ["فاطمة", "فهد", "فيصل"],
+        "ل": ["ليلى", "لطيفة", "لؤي"],
+        "ن": ["نور", "نادر", "نهى"],
+        "ه": ["هند", "هاني", "هدى"],
+        "ي": ["يوسف", "ياسر", "ياسمين"]
+    },
+    "حيوان": {
+        "أ": ["أسد", "أرنب", "أفعى"],
+        "ب": ["بقرة", "بطة", "ببغاء"],
+        "ج": ["جمل", "جاموس"],
+        "د": ["دجاجة", "ديك", "دب"],
+        "ذ": ["ذئب", "ذبابة"],
+        "ز": ["زرافة"],
+        "س": ["سمكة", "سلحفاة"],
+        "ف": ["فيل", "فأر", "فهد"],
+        "ق": ["قط", "قرد"],
+        "ك": ["كلب"],
+        "ن": ["نمر", "نسر", "نحلة"],
+        "ه": ["هدهد"]
+    },
+    "نبات": {
+        "ت": ["تفاح", "توت", "تين"],
+        "ر": ["رمان", "ريحان"],
+        "ز": ["زيتون", "زعتر"],
+        "ل": ["ليمون"],
+        "م": ["موز", "مانجو"],
+        "ن": ["نخل", "نعناع"],
+        "و": ["ورد", "ورق"]
+    },
+    "جماد": {
+        "ب": ["باب", "بيت"],
+        "ح": ["حجر"],
+        "س": ["سرير", "سيارة"],
+        "ك": ["كتاب", "كرسي"],
+        "م": ["مفتاح", "مكتب"],
+        "ن": ["نافذة"]
+    },
+    "بلاد": {
+        "أ": ["الأردن", "الإمارات"],
+        "ب": ["البحرين"],
+        "ت": ["تونس", "تركيا"],
+        "ج": ["الجزائر"],
+        "س": ["السعودية", "سوريا", "السودان"],
+        "ع": ["عمان"],
+        "ف": ["فلسطين"],
+        "ق": ["قطر"],
+        "ك": ["الكويت"],
+        "ل": ["لبنان", "ليبيا"],
+        "م": ["مصر", "المغرب"],
+        "ي": ["اليمن"]
+    }
+}
+
+
 class HumanAnimalPlantGame(BaseGame):
     """لعبة إنسان حيوان نبات جماد بلاد"""
     
+    STATE_BANKS = {'letters': LETTERS, 'categories': CATEGORIES, 'answers_db': ANSWERS}
+    
     def __init__(self, line_bot_api, use_ai=False, get_api_key=None, switch_key=None):
         super().__init__(line_bot_api, questions_count=10)
         
         # الحروف المتاحة
-        self.letters = list("ابتثجحخدذرزسشصضطظعغفقكلمنهوي")
+        self.letters = LETTERS.copy()
         random.shuffle(self.letters)
         
         # الفئات
-        self.categories = ["إنسان", "حيوان", "نبات", "جماد", "بلاد"]
+        self.categories = CATEGORIES
         self.current_category = None
         self.current_letter = None
         
-        # قاعدة بيانات للإجابات الصحيحة
-        self.answers_db = {
-            "إنسان": {
-                "أ": ["أحمد", "أمل", "أسامة", "أمير"],
-                "ب": ["بدر", "بسمة", "باسل"],
-                "م": ["محمد", "مريم", "ماجد", "منى"],
-                "س": ["سارة", "سعيد", "سامي"],
-                "ع": ["علي", "عمر", "عائشة"],
-                "ف": ["فاطمة", "فهد", "فيصل"],
-                "ل": ["ليلى", "لطيفة", "لؤي"],
-                "ن": ["نور", "نادر", "نهى"],
-                "ه": ["هند", "هاني", "هدى"],
-                "ي": ["يوسف", "ياسر", "ياسمين"]
-            },
-            "حيوان": {
-                "أ": ["أسد", "أرنب", "أفعى"],
-                "ب": ["بقرة", "بطة", "ببغاء"],
-                "ج": ["جمل", "جاموس"],
-                "د": ["دجاجة", "ديك", "دب"],
-                "ذ": ["ذئب", "ذبابة"],
-                "ز": ["زرافة"],
-                "س": ["سمكة", "سلحفاة"],
-                "ف": ["فيل", "فأر", "فهد"],
-                "ق": ["قط", "قرد"],
-                "ك": ["كلب"],
-                "ن": ["نمر", "نسر", "نحلة"],
-                "ه": ["هدهد"]
-            },
-            "نبات": {
-                "ت": ["تفاح", "توت", "تين"],
-                "ر": ["رمان", "ريحان"],
-                "ز": ["زيتون", "زعتر"],
-                "ل": ["ليمون"],
-                "م": ["موز", "مانجو"],
-                "ن": ["نخل", "نعناع"],
-                "و": ["ورد", "ورق"]
-            },
-            "جماد": {
-                "ب": ["باب", "بيت"],
-                "ح": ["حجر"],
-                "س": ["سرير", "سيارة"],
-                "ك": ["كتاب", "كرسي"],
-                "م": ["مفتاح", "مكتب"],
-                "ن": ["نافذة"]
-            },
-            "بلاد": {
-                "أ": ["الأردن", "الإمارات"],
-                "ب": ["البحرين"],
-                "ت": ["تونس", "تركيا"],
-                "ج": ["الجزائر"],
-                "س": ["السعودية", "سوريا", "السودان"],
-                "ع": ["عمان"],
-                "ف": ["فلسطين"],
-                "ق": ["قطر"],
-                "ك": ["الكويت"],
-                "ل": ["لبنان", "ليبيا"],
-                "م": ["مصر", "المغرب"],
-                "ي": ["اليمن"]
-            }
-        }
+        self.answers_db = ANSWERS
     
     def start_game(self):
         """بدء اللعبة"""
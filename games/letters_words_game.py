@@ -5,45 +5,50 @@ from linebot.models import TextSendMessage
 from .base_game import BaseGame
 import random
 
+# مجموعات أمثلة (يمكن توسيعها لاحقاً)
+LETTER_SETS = [
+    {"letters": "ق ل م ع ر ب", "words":[
+        {"word": "قلم", "hint": "أداة للكتابة"},
+        {"word": "عمل", "hint": "فعل شيء"},
+        {"word": "علم", "hint": "معرفة"},
+        {"word": "قلب", "hint": "عضو في الجسم"},
+        {"word": "رقم", "hint": "عدد"},
+        {"word": "مقر", "hint": "مكان رسمي"}]},
+    {"letters": "س ا ر ة ي", "words":[
+        {"word": "سيارة", "hint": "وسيلة نقل"},
+        {"word": "سارية", "hint": "عمود العلم"},
+        {"word": "رئيس", "hint": "قائد"},
+        {"word": "أسر", "hint": "جمع أسير"},
+        {"word": "سير", "hint": "تحرك"}]},
+    {"letters": "ك ت ا ب", "words":[
+        {"word": "كتاب", "hint": "شيء يُقرأ"},
+        {"word": "بت", "hint": "اسم شيء"},
+        {"word": "كتب", "hint": "جمع كتاب"},
+        {"word": "تاب", "hint": "رجع"}]},
+    {"letters": "م د ر س ة", "words":[
+        {"word": "مدرسة", "hint": "مكان للتعلم"},
+        {"word": "درس", "hint": "تعلم شيء"},
+        {"word": "سمر", "hint": "جمع الحديث"},
+        {"word": "رمس", "hint": "اسم شيء"},
+        {"word": "سرد", "hint": "قص حكاية"}]},
+    {"letters": "ح د ي ق ة", "words":[
+        {"word": "حديقة", "hint": "مكان للنباتات"},
+        {"word": "قيد", "hint": "وثيقة رسمية"},
+        {"word": "قدح", "hint": "أداة للشرب"},
+        {"word": "يحد", "hint": "يفصل شيئا"},
+        {"word": "حقي", "hint": "شخصية أو اسم"}]},
+]
+
+
 class LettersWordsGame(BaseGame):
     """لعبة تكوين كلمات من مجموعة حروف"""
+    
+    STATE_BANKS = {'letter_sets': LETTER_SETS}
 
     def __init__(self, line_bot_api, use_ai=False, get_api_key=None, switch_key=None):
         super().__init__(line_bot_api, questions_count=5)
 
-        # مجموعات أمثلة (يمكن توسيعها لاحقاً)
-        self.letter_sets = [
-            {"letters": "ق ل م ع ر ب", "words":[
-                {"word": "قلم", "hint": "أداة للكتابة"},
-                {"word": "عمل", "hint": "فعل شيء"},
-                {"word": "علم", "hint": "معرفة"},
-                {"word": "قلب", "hint": "عضو في الجسم"},
-                {"word": "رقم", "hint": "عدد"},
-                {"word": "مقر", "hint": "مكان رسمي"}]},
-            {"letters": "س ا ر ة ي", "words":[
-                {"word": "سيارة", "hint": "وسيلة نقل"},
-                {"word": "سارية", "hint": "عمود العلم"},
-                {"word": "رئيس", "hint": "قائد"},
-                {"word": "أسر", "hint": "جمع أسير"},
-                {"word": "سير", "hint": "تحرك"}]},
-            {"letters": "ك ت ا ب", "words":[
-                {"word": "كتاب", "hint": "شيء يُقرأ"},
-                {"word": "بت", "hint": "اسم شيء"},
-                {"word": "كتب", "hint": "جمع كتاب"},
-                {"word": "تاب", "hint": "رجع"}]},
-            {"letters": "م د ر س ة", "words":[
-                {"word": "مدرسة", "hint": "مكان للتعلم"},
-                {"word": "درس", "hint": "تعلم شيء"},
-                {"word": "سمر", "hint": "جمع الحديث"},
-                {"word": "رمس", "hint": "اسم شيء"},
-                {"word": "سرد", "hint": "قص حكاية"}]},
-            {"letters": "ح د ي ق ة", "words":[
-                {"word": "حديقة", "hint": "مكان للنباتات"},
-                {"word": "قيد", "hint": "وثيقة رسمية"},
-                {"word": "قدح", "hint": "أداة للشرب"},
-                {"word": "يحد", "hint": "يفصل شيئا"},
-                {"word": "حقي", "hint": "شخصية أو اسم"}]},
-        ]
+        self.letter_sets = LETTER_SETS.copy()
 
         random.shuffle(self.letter_sets)
         self.found_words = set()
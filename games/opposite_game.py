@@ -6,40 +6,45 @@ from .base_game import BaseGame
 import random
 
 
+# قائمة الكلمات المتضادة
+OPPOSITES = [
+    {"word": "كبير", "opposite": "صغير"},
+    {"word": "طويل", "opposite": "قصير"},
+    {"word": "سريع", "opposite": "بطيء"},
+    {"word": "ساخن", "opposite": "بارد"},
+    {"word": "جديد", "opposite": "قديم"},
+    {"word": "نظيف", "opposite": "وسخ"},
+    {"word": "سهل", "opposite": "صعب"},
+    {"word": "قوي", "opposite": "ضعيف"},
+    {"word": "ثقيل", "opposite": "خفيف"},
+    {"word": "غني", "opposite": "فقير"},
+    {"word": "جميل", "opposite": "قبيح"},
+    {"word": "سعيد", "opposite": "حزين"},
+    {"word": "ذكي", "opposite": "غبي"},
+    {"word": "شجاع", "opposite": "جبان"},
+    {"word": "كريم", "opposite": "بخيل"},
+    {"word": "صادق", "opposite": "كاذب"},
+    {"word": "مظلم", "opposite": "مضيء"},
+    {"word": "عالي", "opposite": "منخفض"},
+    {"word": "واسع", "opposite": "ضيق"},
+    {"word": "رطب", "opposite": "جاف"},
+    {"word": "ممتلئ", "opposite": "فارغ"},
+    {"word": "مفتوح", "opposite": "مغلق"},
+    {"word": "أول", "opposite": "آخر"},
+    {"word": "فوق", "opposite": "تحت"},
+    {"word": "داخل", "opposite": "خارج"}
+]
+
+
 class OppositeGame(BaseGame):
     """لعبة الأضداد"""
     
+    STATE_BANKS = {'opposites': OPPOSITES}
+    
     def __init__(self, line_bot_api):
         super().__init__(line_bot_api, questions_count=10)
         
-        # قائمة الكلمات المتضادة
-        self.opposites = [
-            {"word": "كبير", "opposite": "صغير"},
-            {"word": "طويل", "opposite": "قصير"},
-            {"word": "سريع", "opposite": "بطيء"},
-            {"word": "ساخن", "opposite": "بارد"},
-            {"word": "جديد", "opposite": "قديم"},
-            {"word": "نظيف", "opposite": "وسخ"},
-            {"word": "سهل", "opposite": "صعب"},
-            {"word": "قوي", "opposite": "ضعيف"},
-            {"word": "ثقيل", "opposite": "خفيف"},
-            {"word": "غني", "opposite": "فقير"},
-            {"word": "جميل", "opposite": "قبيح"},
-            {"word": "سعيد", "opposite": "حزين"},
-            {"word": "ذكي", "opposite": "غبي"},
-            {"word": "شجاع", "opposite": "جبان"},
-            {"word": "كريم", "opposite": "بخيل"},
-            {"word": "صادق", "opposite": "كاذب"},
-            {"word": "مظلم", "opposite": "مضيء"},
-            {"word": "عالي", "opposite": "منخفض"},
-            {"word": "واسع", "opposite": "ضيق"},
-            {"word": "رطب", "opposite": "جاف"},
-            {"word": "ممتلئ", "opposite": "فارغ"},
-            {"word": "مفتوح", "opposite": "مغلق"},
-            {"word": "أول", "opposite": "آخر"},
-            {"word": "فوق", "opposite": "تحت"},
-            {"word": "داخل", "opposite": "خارج"}
-        ]
+        self.opposites = OPPOSITES.copy()
         
         random.shuffle(self.opposites)
     
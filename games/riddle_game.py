@@ -6,35 +6,40 @@ from .base_game import BaseGame
 import random
 
 
+# مجموعة ألغاز
+RIDDLES = [
+    {"q": "ما هو الشيء الذي يخترق الزجاج ولا يكسره؟", "a": "الضوء"},
+    {"q": "له أوراق كثيرة ولكنه ليس شجرة؟", "a": "الكتاب"},
+    {"q": "يسير بلا أقدام ويدخل الأذن؟", "a": "الصوت"},
+    {"q": "ما هو الشيء الذي له أربع أرجل في الصباح، ورجلان في الظهر، وثلاث في المساء؟", "a": "الإنسان"},
+    {"q": "أخت خالك وليست خالتك؟", "a": "أمك"},
+    {"q": "ما هو الشيء الذي يزداد كلما أخذت منه؟", "a": "الحفرة"},
+    {"q": "أسود ولكنه ليس أسود، أحمر ولكنه ليس أحمر، ما هو؟", "a": "البحر الأحمر"},
+    {"q": "يمشي بلا أرجل ويبكي بلا أعين؟", "a": "السحاب"},
+    {"q": "ما هو البيت الذي بلا أبواب ولا نوافذ؟", "a": "بيت الشعر"},
+    {"q": "شيء موجود في القرن مرة وفي الدقيقة مرتين ولا يوجد في الساعة؟", "a": "حرف القاف"},
+    {"q": "ما هو الشيء الذي كلما كبر صغر؟", "a": "الشمعة"},
+    {"q": "له قلب ولا يخفق؟", "a": "قلب الموز"},
+    {"q": "ما هو الشيء الذي تذبحه وتبكي عليه؟", "a": "البصل"},
+    {"q": "أنا ابن الماء، وإن تركوني فيه أموت؟", "a": "الثلج"},
+    {"q": "يكون في أعلى الجبل ومع ذلك في أعماق الوادي؟", "a": "حرف الباء"},
+    {"q": "ما هو الشيء الذي له عيون ولا يرى؟", "a": "الإبرة"},
+    {"q": "في الشتاء خمسة وفي الصيف ثلاثة؟", "a": "النقاط"},
+    {"q": "ما هو الشيء الذي تملكه ويستخدمه الناس أكثر منك؟", "a": "اسمك"},
+    {"q": "له أسنان ولا يعض؟", "a": "المشط"},
+    {"q": "يجري ولا يمشي، ويصب ولا يشرب؟", "a": "النهر"}
+]
+
+
 class RiddleGame(BaseGame):
     """لعبة الألغاز والأحاجي"""
     
+    STATE_BANKS = {'riddles': RIDDLES}
+    
     def __init__(self, line_bot_api):
         super().__init__(line_bot_api, questions_count=10)
         
-        # مجموعة ألغاز
-        self.riddles = [
-            {"q": "ما هو الشيء الذي يخترق الزجاج ولا يكسره؟", "a": "الضوء"},
-            {"q": "له أوراق كثيرة ولكنه ليس شجرة؟", "a": "الكتاب"},
-            {"q": "يسير بلا أقدام ويدخل الأذن؟", "a": "الصوت"},
-            {"q": "ما هو الشيء الذي له أربع أرجل في الصباح، ورجلان في الظهر، وثلاث في المساء؟", "a": "الإنسان"},
-            {"q": "أخت خالك وليست خالتك؟", "a": "أمك"},
-            {"q": "ما هو الشيء الذي يزداد كلما أخذت منه؟", "a": "الحفرة"},
-            {"q": "أسود ولكنه ليس أسود، أحمر ولكنه ليس أحمر، ما هو؟", "a": "البحر الأحمر"},
-            {"q": "يمشي بلا أرجل ويبكي بلا أعين؟", "a": "السحاب"},
-            {"q": "ما هو البيت الذي بلا أبواب ولا نوافذ؟", "a": "بيت الشعر"},
-            {"q": "شيء موجود في القرن مرة وفي الدقيقة مرتين ولا يوجد في الساعة؟", "a": "حرف القاف"},
-            {"q": "ما هو الشيء الذي كلما كبر صغر؟", "a": "الشمعة"},
-            {"q": "له قلب ولا يخفق؟", "a": "قلب الموز"},
-            {"q": "ما هو الشيء الذي تذبحه وتبكي عليه؟", "a": "البصل"},
-            {"q": "أنا ابن الماء، وإن تركوني فيه أموت؟", "a": "الثلج"},
-            {"q": "يكون في أعلى الجبل ومع ذلك في أعماق الوادي؟", "a": "حرف الباء"},
-            {"q": "ما هو الشيء الذي له عيون ولا يرى؟", "a": "الإبرة"},
-            {"q": "في الشتاء خمسة وفي الصيف ثلاثة؟", "a": "النقاط"},
-            {"q": "ما هو الشيء الذي تملكه ويستخدمه الناس أكثر منك؟", "a": "اسمك"},
-            {"q": "له أسنان ولا يعض؟", "a": "المشط"},
-            {"q": "يجري ولا يمشي، ويصب ولا يشرب؟", "a": "النهر"}
-        ]
+        self.riddles = RIDDLES.copy()
         
         random.shuffle(self.riddles)
     
@@ -6,35 +6,40 @@ from .base_game import BaseGame
 import random
 
 
+# كلمات مع تلميحات
+WORDS = [
+    {"word": "مدرسة", "hint": "مكان للتعليم"},
+    {"word": "كتاب", "hint": "نقرأ فيه"},
+    {"word": "حاسوب", "hint": "جهاز إلكتروني"},
+    {"word": "هاتف", "hint": "نستخدمه للاتصال"},
+    {"word": "مطبخ", "hint": "نطبخ فيه"},
+    {"word": "سيارة", "hint": "وسيلة مواصلات"},
+    {"word": "طائرة", "hint": "تطير في السماء"},
+    {"word": "حديقة", "hint": "مكان فيه أشجار وزهور"},
+    {"word": "مستشفى", "hint": "نذهب إليه عند المرض"},
+    {"word": "مكتبة", "hint": "مكان للكتب"},
+    {"word": "قلم", "hint": "نكتب به"},
+    {"word": "دفتر", "hint": "نكتب عليه"},
+    {"word": "معلم", "hint": "يعلم الطلاب"},
+    {"word": "طالب", "hint": "يدرس في المدرسة"},
+    {"word": "طبيب", "hint": "يعالج المرضى"},
+    {"word": "شرطي", "hint": "يحمي الأمن"},
+    {"word": "مهندس", "hint": "يصمم المباني"},
+    {"word": "محامي", "hint": "يدافع عن الحقوق"},
+    {"word": "صحفي", "hint": "يكتب الأخبار"},
+    {"word": "رياضي", "hint": "يمارس الرياضة"}
+]
+
+
 class ScrambleWordGame(BaseGame):
     """لعبة ترتيب الحروف"""
     
+    STATE_BANKS = {'words': WORDS}
+    
     def __init__(self, line_bot_api):
         super().__init__(line_bot_api, questions_count=10)
         
-        # كلمات مع تلميحات
-        self.words = [
-            {"word": "مدرسة", "hint": "مكان للتعليم"},
-            {"word": "كتاب", "hint": "نقرأ فيه"},
-            {"word": "حاسوب", "hint": "جهاز إلكتروني"},
-            {"word": "هاتف", "hint": "نستخدمه للاتصال"},
-            {"word": "مطبخ", "hint": "نطبخ فيه"},
-            {"word": "سيارة", "hint": "وسيلة مواصلات"},
-            {"word": "طائرة", "hint": "تطير في السماء"},
-            {"word": "حديقة", "hint": "مكان فيه أشجار وزهور"},
-            {"word": "مستشفى", "hint": "نذهب إليه عند المرض"},
-            {"word": "مكتبة", "hint": "مكان للكتب"},
-            {"word": "قلم", "hint": "نكتب به"},
-            {"word": "دفتر", "hint": "نكتب عليه"},
-            {"word": "معلم", "hint": "يعلم الطلاب"},
-            {"word": "طالب", "hint": "يدرس في المدرسة"},
-            {"word": "طبيب", "hint": "يعالج المرضى"},
-            {"word": "شرطي", "hint": "يحمي الأمن"},
-            {"word": "مهندس", "hint": "يصمم المباني"},
-            {"word": "محامي", "hint": "يدافع عن الحقوق"},
-            {"word": "صحفي", "hint": "يكتب الأخبار"},
-            {"word": "رياضي", "hint": "يمارس الرياضة"}
-        ]
+        self.words = WORDS.copy()
         
         random.shuffle(self.words)
         self.current_hint = ""  # لحفظ التلميح الحالي
@@ -6,135 +6,140 @@ from .base_game import BaseGame
 import random
 
 
+# قائمة أغاني مع معلومات كاملة
+SONGS = [
+    {
+        "artist": "عبدالمجيد عبدالله",
+        "title": "أحبك ليه",
+        "lyrics": "أحبك ليه؟ أنا مدري ليه أهواك؟\nأنا مدري لو مرت علي ذكراك\nيفز النبض في صدري",
+        "nationality": "سعودي"
+    },
+    {
+        "artist": "راشد الماجد",
+        "title": "العيون السود",
+        "lyrics": "سود العيون كبار والشامه حلوه\nشايل جمال الكون وباليني بلوه",
+        "nationality": "سعودي"
+    },
+    {
+        "artist": "أصالة نصري",
+        "title": "لا تخاف",
+        "lyrics": "لا تخاف من الزمان\nالزمان ماله أمان\nخف من اللي كل آمالك\nفي يديه وتامنه",
+        "nationality": "سورية"
+    },
+    {
+        "artist": "رابح صقر",
+        "title": "وين إنت",
+        "lyrics": "وين إنت ماهي مثلي\nوين إنت دايم\nوين إنت هالمرة على الفين\nوين إنت",
+        "nationality": "سعودي"
+    },
+    {
+        "artist": "ماجد المهندس",
+        "title": "جننت قلبي",
+        "lyrics": "جنّنت قلبي بحبٍ يلوي ذراعي\nلاهو بتايب ولا عبّر تجاريبه\nأمر الله أقوى أحبك والعقل واعي",
+        "nationality": "عراقي"
+    },
+    {
+        "artist": "عبدالمجيد عبدالله",
+        "title": "ياطير",
+        "lyrics": "ياطير يا طاير طير\nوسلم على الحي وقول له\nأنا لولاك يا غالي\nما كنت بدنياي على خير",
+        "nationality": "سعودي"
+    },
+    {
+        "artist": "محمد عبده",
+        "title": "فوق هام السحب",
+        "lyrics": "فوق هام السحب فوق الريح\nطاير طاير أنا طاير\nمع الحلم الجميل",
+        "nationality": "سعودي"
+    },
+    {
+        "artist": "عبدالمجيد عبدالله",
+        "title": "ما يصير",
+        "lyrics": "ما يصير أحبك\nما يصير أعشقك\nحرام الحب حرام\nحتى لو مت من أجلك",
+        "nationality": "سعودي"
+    },
+    {
+        "artist": "راشد الماجد",
+        "title": "يا رايحين",
+        "lyrics": "يا رايحين لحبيبي\nسلموا على قلبي\nقولوا له جفاه النوم\nوالليل ما له صاحب",
+        "nationality": "سعودي"
+    },
+    {
+        "artist": "طلال مداح",
+        "title": "الله يا دار زايد",
+        "lyrics": "الله يا دار زايد\nوين أيامك يا دار\nزمان الخير والود\nزمان الطيب والدار",
+        "nationality": "سعودي"
+    },
+    {
+        "artist": "أصالة نصري",
+        "title": "بنت أكابر",
+        "lyrics": "بنت أكابر بنت أصول\nعمري ما بكيت لا احد يعرف\nبنت ستات ما تعرف الذل",
+        "nationality": "سورية"
+    },
+    {
+        "artist": "رابح صقر",
+        "title": "مشغول",
+        "lyrics": "مشغول مشغول\nقلبي مشغول بك\nمشغول مشغول\nفكري مشغول بك",
+        "nationality": "سعودي"
+    },
+    {
+        "artist": "ماجد المهندس",
+        "title": "بعثرتيني",
+        "lyrics": "بعثرتيني وخذيتي القلب مني\nوخليتيني أنا اللي دايم أقسى\nصرت أكابر وأخفي اللي فيني",
+        "nationality": "عراقي"
+    },
+    {
+        "artist": "عبدالمجيد عبدالله",
+        "title": "زي القمر",
+        "lyrics": "زي القمر وضياه\nزي الربيع وهواه\nجمالك يا أحلى الناس\nربي يبارك فيك",
+        "nationality": "سعودي"
+    },
+    {
+        "artist": "محمد عبده",
+        "title": "ليالي الأنس",
+        "lyrics": "ليالي الأنس في فيينا\nومعزوفات مجنونه\nوذكريات ما تبينا\nتروح وتخلينا",
+        "nationality": "سعودي"
+    },
+    {
+        "artist": "نوال الكويتية",
+        "title": "عسل",
+        "lyrics": "عسل عسل عسل\nيا عسل يا حلو يا سكر\nعيونك عسل",
+        "nationality": "كويتية"
+    },
+    {
+        "artist": "كاظم الساهر",
+        "title": "زدني عشقاً",
+        "lyrics": "زدني عشقاً وغراماً\nعلمني حب الزمان\nحبك صار لي إدمان",
+        "nationality": "عراقي"
+    },
+    {
+        "artist": "نانسي عجرم",
+        "title": "آه ونص",
+        "lyrics": "آه ونص ونص ونص\nقلبي بيموت عليك\nآه ونص ونص",
+        "nationality": "لبنانية"
+    },
+    {
+        "artist": "إليسا",
+        "title": "عكس اللي شايفينها",
+        "lyrics": "عكس اللي شايفينها أنا\nعكس اللي بيقولوا عليا\nمش زي ما بيتصوروا أبداً",
+        "nationality": "لبنانية"
+    },
+    {
+        "artist": "عمرو دياب",
+        "title": "تملي معاك",
+        "lyrics": "تملي معاك ليه ليه ليه\nقول لي ليه",
+        "nationality": "مصري"
+    }
+]
+
+
 class SongGame(BaseGame):
     """لعبة تخمين المغني"""
     
+    STATE_BANKS = {'songs': SONGS}
+    
     def __init__(self, line_bot_api):
         super().__init__(line_bot_api, questions_count=10)
         
-        # قائمة أغاني مع معلومات كاملة
-        self.songs = [
-            {
-                "artist": "عبدالمجيد عبدالله",
-                "title": "أحبك ليه",
-                "lyrics": "أحبك ليه؟ أنا مدري ليه أهواك؟\nأنا مدري لو مرت علي ذكراك\nيفز النبض في صدري",
-                "nationality": "سعودي"
-            },
-            {
-                "artist": "راشد الماجد",
-                "title": "العيون السود",
-                "lyrics": "سود العيون كبار والشامه حلوه\nشايل جمال الكون وباليني بلوه",
-                "nationality": "سعودي"
-            },
-            {
-                "artist": "أصالة نصري",
-                "title": "لا تخاف",
-                "lyrics": "لا تخاف من الزمان\nالزمان ماله أمان\nخف من اللي كل آمالك\nفي يديه وتامنه",
-                "nationality": "سورية"
-            },
-            {
-                "artist": "رابح صقر",
-                "title": "وين إنت",
-                "lyrics": "وين إنت ماهي مثلي\nوين إنت دايم\nوين إنت هالمرة على الفين\nوين إنت",
-                "nationality": "سعودي"
-            },
-            {
-                "artist": "ماجد المهندس",
-                "title": "جننت قلبي",
-                "lyrics": "جنّنت قلبي بحبٍ يلوي ذراعي\nلاهو بتايب ولا عبّر تجاريبه\nأمر الله أقوى أحبك والعقل واعي",
-                "nationality": "عراقي"
-            },
-            {
-                "artist": "عبدالمجيد عبدالله",
-                "title": "ياطير",
-                "lyrics": "ياطير يا طاير طير\nوسلم على الحي وقول له\nأنا لولاك يا غالي\nما كنت بدنياي على خير",
-                "nationality": "سعودي"
-            },
-            {
-                "artist": "محمد عبده",
-                "title": "فوق هام السحب",
-                "lyrics": "فوق هام السحب فوق الريح\nطاير طاير أنا طاير\nمع الحلم الجميل",
-                "nationality": "سعودي"
-            },
-            {
-                "artist": "عبدالمجيد عبدالله",
-                "title": "ما يصير",
-                "lyrics": "ما يصير أحبك\nما يصير أعشقك\nحرام الحب حرام\nحتى لو مت من أجلك",
-                "nationality": "سعودي"
-            },
-            {
-                "artist": "راشد الماجد",
-                "title": "يا رايحين",
-                "lyrics": "يا رايحين لحبيبي\nسلموا على قلبي\nقولوا له جفاه النوم\nوالليل ما له صاحب",
-                "nationality": "سعودي"
-            },
-            {
-                "artist": "طلال مداح",
-                "title": "الله يا دار زايد",
-                "lyrics": "الله يا دار زايد\nوين أيامك يا دار\nزمان الخير والود\nزمان الطيب والدار",
-                "nationality": "سعودي"
-            },
-            {
-                "artist": "أصالة نصري",
-                "title": "بنت أكابر",
-                "lyrics": "بنت أكابر بنت أصول\nعمري ما بكيت لا احد يعرف\nبنت ستات ما تعرف الذل",
-                "nationality": "سورية"
-            },
-            {
-                "artist": "رابح صقر",
-                "title": "مشغول",
-                "lyrics": "مشغول مشغول\nقلبي مشغول بك\nمشغول مشغول\nفكري مشغول بك",
-                "nationality": "سعودي"
-            },
-            {
-                "artist": "ماجد المهندس",
-                "title": "بعثرتيني",
-                "lyrics": "بعثرتيني وخذيتي القلب مني\nوخليتيني أنا اللي دايم أقسى\nصرت أكابر وأخفي اللي فيني",
-                "nationality": "عراقي"
-            },
-            {
-                "artist": "عبدالمجيد عبدالله",
-                "title": "زي القمر",
-                "lyrics": "زي القمر وضياه\nزي الربيع وهواه\nجمالك يا أحلى الناس\nربي يبارك فيك",
-                "nationality": "سعودي"
-            },
-            {
-                "artist": "محمد عبده",
-                "title": "ليالي الأنس",
-                "lyrics": "ليالي الأنس في فيينا\nومعزوفات مجنونه\nوذكريات ما تبينا\nتروح وتخلينا",
-                "nationality": "سعودي"
-            },
-            {
-                "artist": "نوال الكويتية",
-                "title": "عسل",
-                "lyrics": "عسل عسل عسل\nيا عسل يا حلو يا سكر\nعيونك عسل",
-                "nationality": "كويتية"
-            },
-            {
-                "artist": "كاظم الساهر",
-                "title": "زدني عشقاً",
-                "lyrics": "زدني عشقاً وغراماً\nعلمني حب الزمان\nحبك صار لي إدمان",
-                "nationality": "عراقي"
-            },
-            {
-                "artist": "نانسي عجرم",
-                "title": "آه ونص",
-                "lyrics": "آه ونص ونص ونص\nقلبي بيموت عليك\nآه ونص ونص",
-                "nationality": "لبنانية"
-            },
-            {
-                "artist": "إليسا",
-                "title": "عكس اللي شايفينها",
-                "lyrics": "عكس اللي شايفينها أنا\nعكس اللي بيقولوا عليا\nمش زي ما بيتصوروا أبداً",
-                "nationality": "لبنانية"
-            },
-            {
-                "artist": "عمرو دياب",
-                "title": "تملي معاك",
-                "lyrics": "تملي معاك ليه ليه ليه\nقول لي ليه",
-                "nationality": "مصري"
-            }
-        ]
+        self.songs = SONGS.copy()
         
         random.shuffle(self.songs)
     
@@ -0,0 +1,214 @@
+"""
+حالة مضغوطة ذات إصدار لكل ألعاب BaseGame
+
+تُستخدم لحفظ اللعبة في مخزن الجلسات ولنقلها بين العمليات بدل pickle:
+- الحقول المعلنة في STATE_BANKS تُحفظ كمواقع عناصرها في بنك الأسئلة المشترك،
+  أو لا تُحفظ إطلاقاً إذا كانت هي البنك نفسه
+- الحقول التي تشير لعنصر من بنك (current_answer من السؤال الحالي مثلاً) تُحفظ كمرجع
+- النقاط والنتائج والمجيبون وباقي حقول اللعبة (used_words، start_time ...) تُحفظ
+  كقيم؛ التواريخ كعدد ميكروثوانٍ
+- الترميز marshal لقيم بايثون الأساسية فقط، فأي حقل غير مدعوم يرفع ValueError
+  عند الحفظ بدل أن يضيع بصمت
+
+الشكل (الإصدار 1):
+    (VERSION, class_name, questions_count, current_question, game_active,
+     scores, results, answered, banks, fields, refs, dates)
+"""
+import marshal
+from array import array
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from .base_game import BaseGame
+
+VERSION = 1
+# صيغة marshal 4 ثابتة منذ Python 3.4
+MARSHAL_FORMAT = 4
+BASE_FIELDS = (
+    'questions_count', 'current_question', 'game_active',
+    'scores', 'player_results', 'answered_users'
+)
+EPOCH = datetime(1970, 1, 1)
+
+_classes = {}
+# {id(bank): (bank, positions, refs)} - البنوك ثابتة على مستوى الوحدة فمعرفاتها ثابتة
+_banks = {}
+
+
+def _game_class(name):
+    if name not in _classes:
+        pending = [BaseGame]
+        while pending:
+            cls = pending.pop()
+            _classes[cls.__name__] = cls
+            pending.extend(cls.__subclasses__())
+    try:
+        return _classes[name]
+    except KeyError:
+        raise ValueError(f"نوع لعبة غير معروف: {name}") from None
+
+
+def _bank(bank):
+    """مواقع عناصر البنك، ومراجع العناصر وقيمها {id: (index, key)}"""
+    cached = _banks.get(id(bank))
+    if cached is None:
+        positions, refs = {}, {}
+        for i, item in enumerate(bank):
+            positions.setdefault(id(item), i)
+            refs.setdefault(id(item), (i, None))
+            if isinstance(item, dict):
+                for key, value in item.items():
+                    refs.setdefault(id(value), (i, key))
+        cached = _banks[id(bank)] = (bank, positions, refs)
+    return cached
+
+
+def _pack_indices(indices, size):
+    if size <= 256:
+        return bytes(indices)
+    return array('H', indices).tobytes()
+
+
+def _unpack_indices(data, size):
+    if size <= 256:
+        return list(data)
+    indices = array('H')
+    indices.frombytes(data)
+    return indices.tolist()
+
+
+def _micros(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _datetime(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def pack(game):
+    """حالة اللعبة كـ tuple من قيم أساسية"""
+    cls = type(game)
+    state = vars(game)
+    banks, fields, refs, dates = {}, {}, {}, {}
+
+    ref_maps = []
+    for name, bank in cls.STATE_BANKS.items():
+        if isinstance(bank, list):
+            ref_maps.append((name, _bank(bank)[2]))
+        if name not in state:
+            continue
+        value = state[name]
+        if value is bank:
+            banks[name] = None
+        elif isinstance(bank, list) and isinstance(value, list):
+            positions = _bank(bank)[1]
+            try:
+                banks[name] = _pack_indices([positions[id(item)] for item in value], len(bank))
+            except KeyError:
+                # عناصر من خارج البنك (مولدة مثلاً) تُحفظ كما هي
+                fields[name] = value
+        else:
+            fields[name] = value
+
+    for name, value in state.items():
+        if name in BASE_FIELDS or name in cls.TRANSIENT or name in cls.STATE_BANKS:
+            continue
+        if isinstance(value, datetime):
+            dates[name] = _micros(value)
+            continue
+        if isinstance(value, (str, list, dict)):
+            for bank_name, bank_refs in ref_maps:
+                ref = bank_refs.get(id(value))
+                if ref is not None:
+                    refs[name] = (bank_name,) + ref
+                    break
+            else:
+                fields[name] = value
+            continue
+        fields[name] = value
+
+    results = game.player_results
+    if all(result.keys() == {'display_name', 'points'} for result in results.values()):
+        order = {user_id: i for i, user_id in enumerate(results)}
+        packed_results = tuple((user_id, r['display_name'], r['points']) for user_id, r in results.items())
+        # المجيبون عادةً ضمن النتائج: يُحفظ موقعهم فيها بدل المعرف الكامل
+        answered = (
+            tuple(order[user_id] for user_id in game.answered_users if user_id in order),
+            tuple(user_id for user_id in game.answered_users if user_id not in order)
+        )
+    else:
+        packed_results = None
+        fields['player_results'] = results
+        answered = ((), tuple(game.answered_users))
+
+    return (
+        VERSION, cls.__name__, game.questions_count, game.current_question, game.game_active,
+        dict(game.scores), packed_results, answered, banks, fields, refs, dates
+    )
+
+
+def unpack(state):
+    """إعادة بناء اللعبة من pack() - line_bot_api وباقي الخدمات تُربط لاحقاً"""
+    if state[0] != VERSION:
+        raise ValueError(f"إصدار حالة لعبة غير مدعوم: {state[0]}")
+    (_, class_name, questions_count, current_question, game_active,
+     scores, results, answered, banks, fields, refs, dates) = state
+
+    cls = _game_class(class_name)
+    game = cls.__new__(cls)
+    values = game.__dict__
+    values['line_bot_api'] = None
+    values['questions_count'] = questions_count
+    values['current_question'] = current_question
+    values['game_active'] = game_active
+    values['scores'] = defaultdict(int, scores)
+
+    if results is not None:
+        values['player_results'] = {
+            user_id: {'display_name': display_name, 'points': points}
+            for user_id, display_name, points in results
+        }
+    user_ids = list(values.get('player_results', ()))
+    values['answered_users'] = {user_ids[i] for i in answered[0]} | set(answered[1])
+
+    for name, packed in banks.items():
+        bank = cls.STATE_BANKS[name]
+        values[name] = bank if packed is None else [bank[i] for i in _unpack_indices(packed, len(bank))]
+    for name, (bank_name, index, key) in refs.items():
+        item = cls.STATE_BANKS[bank_name][index]
+        values[name] = item if key is None else item[key]
+    for name, micros in dates.items():
+        values[name] = _datetime(micros)
+    values.update(fields)
+    return game
+
+
+def encode(game):
+    """ترميز اللعبة إلى bytes"""
+    return marshal.dumps(pack(game), MARSHAL_FORMAT)
+
+
+def decode(data):
+    return unpack(marshal.loads(data))
+
+
+def dumps(game_data):
+    """ترميز بيانات لعبة في السجل (GameRegistry) مع حالتها"""
+    return marshal.dumps((
+        pack(game_data['game']),
+        game_data['type'],
+        _micros(game_data['created_at']),
+        game_data.get('participants')
+    ), MARSHAL_FORMAT)
+
+
+def loads(data):
+    state, game_type, created_at, participants = marshal.loads(data)
+    game_data = {
+        'game': unpack(state),
+        'type': game_type,
+        'created_at': _datetime(created_at)
+    }
+    if participants is not None:
+        game_data['participants'] = participants
+    return game_data
@@ -6,26 +6,31 @@ from .base_game import BaseGame
 import random
 
 
+# قائمة الألوان
+COLORS = {
+    "أحمر": "🔴",
+    "أزرق": "🔵",
+    "أخضر": "🟢",
+    "أصفر": "🟡",
+    "برتقالي": "🟠",
+    "أرجواني": "🟣",
+    "بني": "🟤",
+    "أسود": "⚫",
+    "أبيض": "⚪"
+}
+COLOR_NAMES = list(COLORS)
+
+
 class WordColorGame(BaseGame):
     """لعبة الكلمة واللون"""
     
+    STATE_BANKS = {'colors': COLORS, 'color_names': COLOR_NAMES}
+    
     def __init__(self, line_bot_api, use_ai=False, get_api_key=None, switch_key=None):
         super().__init__(line_bot_api, questions_count=10)
         
-        # قائمة الألوان
-        self.colors = {
-            "أحمر": "🔴",
-            "أزرق": "🔵",
-            "أخضر": "🟢",
-            "أصفر": "🟡",
-            "برتقالي": "🟠",
-            "أرجواني": "🟣",
-            "بني": "🟤",
-            "أسود": "⚫",
-            "أبيض": "⚪"
-        }
-        
-        self.color_names = list(self.colors.keys())
+        self.colors = COLORS
+        self.color_names = COLOR_NAMES
     
     def start_game(self):
         """بدء اللعبة"""
@@ -0,0 +1,167 @@
+"""
+لوحة الصدارة في الذاكرة
+
+- تُحمَّل أعلى N لاعبين من قاعدة البيانات مرة واحدة
+- تُحدَّث تدريجياً بعد كل حفظ للنقاط دون الرجوع لقاعدة البيانات
+- تُعاد القراءة دورياً لالتقاط تحديثات العمليات (workers) الأخرى
+- الصفوف المرسومة تُحفظ حتى يتغير محتوى القائمة فعلاً
+- لوحة منفصلة لكل مجموعة (أو فترة زمنية) تُنشأ عند أول طلب، ويُحتفظ بأحدث
+  max_groups منها فقط
+"""
+import threading
+import time
+import logging
+from collections import OrderedDict
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+
+class Leaderboard:
+    """أعلى N لاعبين مرتبين حسب النقاط"""
+
+    def __init__(self, load, size=10, refresh_interval=30):
+        # load(limit) تعيد صفوفاً فيها user_id, display_name, total_points, games_played, wins
+        self.load = load
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self._entries = {}
+        self._top = ()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._rendered = (None, None)
+        self.version = 0
+        self.counters = {
+            'reads': 0,
+            'loads': 0,
+            'updates': 0,
+            'renders': 0
+        }
+
+    def top(self, limit=None):
+        """أعلى limit لاعبين - لا يلمس قاعدة البيانات إلا عند انتهاء مدة التحديث"""
+        with self._lock:
+            self._ensure_loaded()
+            self.counters['reads'] += 1
+            return self._top[:limit] if limit else self._top
+
+    def record(self, user_id, display_name, total_points, games_played, wins):
+        """تحديث لاعب بعد حفظ نقاطه الجديدة"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self.counters['updates'] += 1
+            entries = self._entries
+            current = entries.get(user_id)
+            if current is None and len(entries) >= self.size:
+                if total_points <= self._top[-1]['total_points']:
+                    return
+            if current is not None and total_points < current['total_points'] and len(entries) >= self.size:
+                # نقص النقاط قد يُدخل لاعباً من خارج القائمة - إعادة تحميل عند القراءة التالية
+                self._loaded_at = None
+                return
+
+            entries[user_id] = {
+                'user_id': user_id,
+                'display_name': display_name,
+                'total_points': total_points,
+                'games_played': games_played,
+                'wins': wins
+            }
+            self._rebuild()
+
+    def rendered(self, render):
+        """نتيجة render(top) محفوظة حتى تتغير القائمة"""
+        with self._lock:
+            self._ensure_loaded()
+            version, value = self._rendered
+            if version == self.version:
+                return value
+            top = self._top
+            version = self.version
+
+        value = render(top)
+        with self._lock:
+            self.counters['renders'] += 1
+            if version == self.version:
+                self._rendered = (version, value)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self):
+        # يجب استدعاؤها مع الإمساك بالقفل
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_interval:
+            return
+        try:
+            rows = self.load(self.size)
+        except Exception as e:
+            logger.error(f"خطأ في تحميل لوحة الصدارة: {e}")
+            return
+        self.counters['loads'] += 1
+        self._entries = {row['user_id']: dict(row) for row in rows}
+        self._loaded_at = time.monotonic()
+        self._rebuild()
+
+    def _rebuild(self):
+        # يجب استدعاؤها مع الإمساك بالقفل
+        ordered = sorted(self._entries.values(), key=lambda e: (-e['total_points'], e['user_id']))
+        for evicted in ordered[self.size:]:
+            del self._entries[evicted['user_id']]
+        top = tuple(ordered[:self.size])
+        if top != self._top:
+            self._top = top
+            self.version += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['size'] = len(self._top)
+            stats['version'] = self.version
+        return stats
+
+
+class GroupLeaderboards:
+    """لوحة صدارة لكل مفتاح (مجموعة أو فترة) مع إزالة الأقدم استخداماً"""
+
+    def __init__(self, load, size=10, refresh_interval=30, max_groups=1000):
+        # load(group_id, limit) مثل Leaderboard.load لكن داخل مجموعة (أو مفتاح) واحد
+        self.load = load
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.max_groups = max_groups
+        self._boards = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, group_id):
+        with self._lock:
+            board = self._boards.get(group_id)
+            if board is None:
+                board = Leaderboard(partial(self.load, group_id), self.size, self.refresh_interval)
+                self._boards[group_id] = board
+                if len(self._boards) > self.max_groups:
+                    self._boards.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._boards.move_to_end(group_id)
+            return board
+
+    def record(self, group_id, user_id, display_name, total_points, games_played, wins):
+        """تحديث لوحة المجموعة إن كانت محملة - وإلا تُقرأ من قاعدة البيانات عند أول طلب"""
+        with self._lock:
+            board = self._boards.get(group_id)
+        if board is not None:
+            board.record(user_id, display_name, total_points, games_played, wins)
+
+    def stats(self):
+        with self._lock:
+            boards = list(self._boards.values())
+            stats = {'groups': len(boards), 'evictions': self.evictions}
+        for board in boards:
+            for name, value in board.stats().items():
+                if name in ('reads', 'loads', 'updates', 'renders'):
+                    stats[name] = stats.get(name, 0) + value
+        return stats
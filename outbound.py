@@ -0,0 +1,264 @@
+"""
+إرسال الرسائل إلى LINE Messaging API
+
+- جلسة HTTP واحدة باتصالات محفوظة (keep-alive) بحجم عدد العمال
+- إعادة المحاولة عند أخطاء 5xx و 429 مع انتظار متزايد وعشوائي؛ الرد (reply) يُعاد
+  عند 429 فقط: بعد 5xx أو انقطاع قد يكون وصل واستُهلك الـ token فتتكرر الرسالة
+- التحويل إلى push فقط عند رفض الـ reply token صراحة (400 Invalid reply token)
+- حفظ الرسائل التي تعذر إرسالها في ملف dead-letter
+"""
+import json
+import os
+import random
+import threading
+import time
+import logging
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+REPLY_PATH = '/v2/bot/message/reply'
+PUSH_PATH = '/v2/bot/message/push'
+INVALID_REPLY_TOKEN = 'invalid reply token'
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def _error_message(body):
+    """حقل message من رد خطأ LINE بأحرف صغيرة - '' إن لم يكن JSON"""
+    try:
+        message = json.loads(body).get('message')
+    except (ValueError, AttributeError):
+        return ''
+    return message.strip().lower() if isinstance(message, str) else ''
+
+
+class RawMessage:
+    """رسالة مُرمّزة مسبقاً كنص JSON - تُدرج في جسم الطلب كما هي دون إعادة ترميز"""
+
+    __slots__ = ('json', 'quick_reply')
+
+    def __init__(self, json_text, quick_reply=None):
+        self.json = json_text
+        self.quick_reply = quick_reply
+
+    def encoded(self):
+        """نص JSON للرسالة مع quickReply إن وجد"""
+        if self.quick_reply is None:
+            return self.json
+        return _with_quick_reply(self.json, self.quick_reply)
+
+    def as_json_dict(self):
+        return json.loads(self.encoded())
+
+
+def encode_message(message):
+    """تحويل رسالة (كائن linebot أو dict) إلى dict جاهز للإرسال"""
+    if isinstance(message, dict):
+        return message
+    return message.as_json_dict()
+
+
+def encode_message_json(message):
+    """تحويل رسالة إلى نص JSON - الرسائل الجاهزة تُعاد كما هي"""
+    if isinstance(message, str):
+        return message
+    if isinstance(message, RawMessage):
+        return message.encoded()
+    quick_reply = getattr(message, 'quick_reply', None)
+    if getattr(quick_reply, 'json', None) is not None:
+        # أزرار مُرمّزة مسبقاً: تُرمّز الرسالة بدونها ثم يُلحق نصها كما هو
+        message.quick_reply = None
+        try:
+            encoded = _dumps(encode_message(message))
+        finally:
+            message.quick_reply = quick_reply
+        return _with_quick_reply(encoded, quick_reply)
+    return _dumps(encode_message(message))
+
+
+def _with_quick_reply(encoded, quick_reply):
+    quick_reply_json = getattr(quick_reply, 'json', None)
+    if quick_reply_json is None:
+        quick_reply_json = encode_message_json(quick_reply)
+    return encoded[:-1] + ',"quickReply":' + quick_reply_json + '}'
+
+
+def _join_messages(encoded):
+    return '[' + ','.join(encoded) + ']'
+
+
+class OutboundDispatcher:
+    """مرسل الردود إلى LINE مع إعادة المحاولة والبدائل"""
+
+    def __init__(self, access_token, base_url='https://api.line.me', pool_size=4,
+                 max_retries=3, backoff=0.5, timeout=10, dead_letter_path=None):
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.dead_letter_path = dead_letter_path
+        self._dead_letter_lock = threading.Lock()
+        self._counters_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {access_token}',
+            'Content-Type': 'application/json'
+        })
+
+        self.counters = {
+            'sent': 0,
+            'retries': 0,
+            'push_fallbacks': 0,
+            'dead_letters': 0
+        }
+
+    def _count(self, name):
+        with self._counters_lock:
+            self.counters[name] += 1
+
+    def reply(self, reply_token, messages, to=None):
+        """إرسال رد - يعيد True عند النجاح (بالرد أو بالبديل push)"""
+        if not isinstance(messages, (list, tuple)):
+            messages = [messages]
+        encoded = [encode_message_json(m) for m in messages]
+
+        # جسم الطلب يُجمّع نصياً حتى لا يُعاد ترميز الرسائل الجاهزة
+        data = '{"replyToken":' + _dumps(reply_token) + ',"messages":' + _join_messages(encoded) + '}'
+        status, body = self._post(REPLY_PATH, data, retry_errors=False)
+        if status == 200:
+            return True
+
+        if status == 400 and to and _error_message(body) == INVALID_REPLY_TOKEN:
+            logger.warning(f"انتهت صلاحية reply token - الإرسال عبر push إلى {to}")
+            self._count('push_fallbacks')
+            return self._push_encoded(to, encoded)
+
+        self._dead_letter(REPLY_PATH, {'replyToken': reply_token, 'to': to, 'messages': encoded}, status, body)
+        return False
+
+    def push(self, to, messages):
+        """إرسال رسالة push مباشرة"""
+        if not isinstance(messages, (list, tuple)):
+            messages = [messages]
+        return self._push_encoded(to, [encode_message_json(m) for m in messages])
+
+    def _push_encoded(self, to, encoded):
+        data = '{"to":' + _dumps(to) + ',"messages":' + _join_messages(encoded) + '}'
+        status, body = self._post(PUSH_PATH, data)
+        if status == 200:
+            return True
+        self._dead_letter(PUSH_PATH, {'to': to, 'messages': encoded}, status, body)
+        return False
+
+    def _post(self, path, data, retry_errors=True):
+        """POST لجسم JSON جاهز مع إعادة المحاولة - يعيد (status, body) و status=None عند فشل الاتصال
+
+        retry_errors=False: يُعاد عند 429 فقط (رُفض الطلب قبل تنفيذه) لا عند 5xx أو الانقطاع
+        """
+        data = data.encode('utf-8')
+        url = self.base_url + path
+        status, body = None, ''
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = self.session.post(url, data=data, timeout=self.timeout)
+                status, body = response.status_code, response.text
+                if status == 200:
+                    self._count('sent')
+                    return status, body
+                if status != 429 and (status < 500 or not retry_errors):
+                    return status, body
+                retry_after = response.headers.get('Retry-After')
+            except requests.RequestException as e:
+                status, body = None, str(e)
+                if not retry_errors:
+                    return status, body
+
+            if attempt == self.max_retries:
+                break
+            self._count('retries')
+            time.sleep(self._delay(attempt, retry_after))
+
+        logger.error(f"فشل الإرسال إلى {path} بعد {self.max_retries + 1} محاولات: {status} {body[:200]}")
+        return status, body
+
+    def _delay(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # full jitter: انتظار عشوائي حتى الحد الأقصى المتضاعف
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    def _dead_letter(self, path, payload, status, body):
+        self._count('dead_letters')
+        if not self.dead_letter_path:
+            return
+        payload = dict(payload, messages=[json.loads(m) for m in payload['messages']])
+        record = {
+            'time': datetime.now().isoformat(),
+            'path': path,
+            'status': status,
+            'error': body[:500],
+            'payload': payload
+        }
+        try:
+            with self._dead_letter_lock:
+                directory = os.path.dirname(self.dead_letter_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        except Exception as e:
+            logger.error(f"خطأ في حفظ الرسالة الفاشلة: {e}")
+
+    def stats(self):
+        with self._counters_lock:
+            return dict(self.counters)
+
+
+class ReplyBuffer:
+    """تجميع ردود حدث واحد وإرسالها في طلب reply واحد (حتى 5 رسائل)"""
+
+    MAX_MESSAGES = 5
+
+    def __init__(self, dispatcher, reply_token, to=None):
+        self.dispatcher = dispatcher
+        self.reply_token = reply_token
+        self.to = to
+        self.messages = []
+        self.flushed = False
+
+    def add(self, message):
+        """إضافة رسالة للرد - الرسائل الزائدة عن الحد تُهمل مع تحذير"""
+        if self.flushed:
+            raise RuntimeError("تم إرسال الرد بالفعل")
+        if len(self.messages) >= self.MAX_MESSAGES:
+            logger.warning("تجاوز الحد الأقصى للرسائل في الرد الواحد - تم تجاهل رسالة")
+            return False
+        self.messages.append(message)
+        return True
+
+    def __len__(self):
+        return len(self.messages)
+
+    def flush(self):
+        """إرسال الرسائل المجمعة مرة واحدة"""
+        if self.flushed:
+            return True
+        self.flushed = True
+        if not self.messages:
+            return True
+        return self.dispatcher.reply(self.reply_token, self.messages, to=self.to)
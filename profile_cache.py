@@ -0,0 +1,154 @@
+"""
+ذاكرة مؤقتة لأسماء مستخدمي LINE
+
+- LRU محدودة الحجم مع مدة صلاحية (TTL)
+- بعد انتهاء الصلاحية يُعاد الاسم القديم فوراً ويُحدَّث في الخلفية
+  (stale-while-revalidate) حتى انتهاء مدة الاحتفاظ
+- اختيارياً: قراءة الاسم المحفوظ في قاعدة البيانات عند أول طلب بعد إعادة التشغيل
+- فشل الجلب دون نسخة سابقة (404، مستخدم حظر البوت) يُحفظ كنتيجة سالبة لمدة
+  negative_ttl قصيرة: يُعاد الاسم الافتراضي دون استدعاء LINE مع كل رسالة
+"""
+import queue
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileCache:
+    """ذاكرة LRU لأسماء العرض مع تحديث في الخلفية"""
+
+    def __init__(self, fetch, max_size=5000, ttl=3600, stale_ttl=86400, negative_ttl=60,
+                 default_name="مستخدم", load_persisted=None, persist=None, clock=time.monotonic):
+        self.fetch = fetch
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.default_name = default_name
+        self.load_persisted = load_persisted
+        self.persist = persist
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refresh_queue = queue.Queue()
+        self._refreshing = set()
+        self._thread = None
+        self.counters = {
+            'hits': 0,
+            'stale_hits': 0,
+            'persisted_hits': 0,
+            'negative_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'refreshes': 0,
+            'errors': 0
+        }
+
+    def start(self):
+        """تشغيل thread التحديث في الخلفية"""
+        self._thread = threading.Thread(target=self._refresh_worker, name="profile-refresh", daemon=True)
+        self._thread.start()
+
+    def get(self, user_id):
+        """اسم العرض للمستخدم - لا يستدعي LINE إلا عند عدم وجود أي نسخة"""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                name, fetched_at = entry
+                age = now - fetched_at
+                if name is None:
+                    # نتيجة سالبة: لا إعادة محاولة قبل انتهاء مدتها
+                    if age < self.negative_ttl:
+                        self._entries.move_to_end(user_id)
+                        self.counters['negative_hits'] += 1
+                        return self.default_name
+                elif age < self.ttl:
+                    self._entries.move_to_end(user_id)
+                    self.counters['hits'] += 1
+                    return name
+                elif age < self.stale_ttl:
+                    self._entries.move_to_end(user_id)
+                    self.counters['stale_hits'] += 1
+                    self._schedule_refresh(user_id)
+                    return name
+
+        if self.load_persisted:
+            name = self.load_persisted(user_id)
+            if name:
+                # الاسم المحفوظ يُعامل كنسخة قديمة: يُستخدم الآن ويُحدَّث في الخلفية
+                with self._lock:
+                    self.counters['persisted_hits'] += 1
+                    self._store(user_id, name, now - self.ttl)
+                    self._schedule_refresh(user_id)
+                return name
+
+        with self._lock:
+            self.counters['misses'] += 1
+        name = self._fetch(user_id)
+        return name if name else self.default_name
+
+    def _fetch(self, user_id):
+        """جلب الاسم من LINE وتخزينه - يعيد None عند الفشل"""
+        try:
+            name = self.fetch(user_id)
+        except Exception as e:
+            with self._lock:
+                self.counters['errors'] += 1
+                # الاسم القديم (إن وُجد) يبقى أفضل من نتيجة سالبة
+                entry = self._entries.get(user_id)
+                if self.negative_ttl > 0 and (entry is None or entry[0] is None):
+                    self._store(user_id, None, self._clock())
+            logger.error(f"خطأ في الحصول على الملف الشخصي: {e}")
+            return None
+
+        with self._lock:
+            previous = self._entries.get(user_id)
+            self._store(user_id, name, self._clock())
+
+        if self.persist and (previous is None or previous[0] != name):
+            try:
+                self.persist(user_id, name)
+            except Exception as e:
+                logger.error(f"خطأ في حفظ اسم المستخدم: {e}")
+        return name
+
+    def _store(self, user_id, name, fetched_at):
+        # يجب استدعاؤها مع الإمساك بالقفل
+        self._entries[user_id] = (name, fetched_at)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def _schedule_refresh(self, user_id):
+        # يجب استدعاؤها مع الإمساك بالقفل
+        if user_id in self._refreshing or self._thread is None:
+            return
+        self._refreshing.add(user_id)
+        self._refresh_queue.put(user_id)
+
+    def _refresh_worker(self):
+        while True:
+            user_id = self._refresh_queue.get()
+            try:
+                if self._fetch(user_id):
+                    with self._lock:
+                        self.counters['refreshes'] += 1
+            finally:
+                with self._lock:
+                    self._refreshing.discard(user_id)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['size'] = len(self._entries)
+            stats['refresh_pending'] = len(self._refreshing)
+        return stats
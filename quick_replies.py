@@ -0,0 +1,70 @@
+"""
+أزرار الرد السريع الثابتة
+
+كل مجموعة أزرار تُبنى وتُرمّز إلى JSON مرة واحدة وتُشارك بين كل الردود.
+النسخ المعدلة (مثل إخفاء زر اللعبة الجارية) تُبنى عند أول طلب وتُحفظ حسب المفتاح.
+"""
+import json
+
+from linebot.models import QuickReply, QuickReplyButton, MessageAction
+
+
+class FrozenQuickReply(QuickReply):
+    """مجموعة أزرار غير قابلة للتعديل مع نص JSON جاهز في self.json"""
+
+    def __init__(self, buttons):
+        buttons = tuple(buttons)
+        super().__init__(items=[
+            QuickReplyButton(action=MessageAction(label=label, text=text))
+            for label, text in buttons
+        ])
+        self.items = tuple(self.items)
+        self.buttons = buttons
+        self.json = json.dumps(
+            {"items": [item.as_json_dict() for item in self.items]},
+            ensure_ascii=False, separators=(',', ':')
+        )
+        self._variants = {}
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError("FrozenQuickReply غير قابل للتعديل")
+        super().__setattr__(name, value)
+
+    def as_json_dict(self):
+        return json.loads(self.json)
+
+    def without(self, name):
+        """نسخة بدون الزر الذي يطابق اسمه أو نصه name - تُحفظ بعد أول بناء"""
+        variant = self._variants.get(name)
+        if variant is None:
+            buttons = [b for b in self.buttons if name not in b]
+            variant = self if len(buttons) == len(self.buttons) else FrozenQuickReply(buttons)
+            variant = self._variants.setdefault(name, variant)
+        return variant
+
+
+# الأزرار الثابتة - ألعاب فقط
+MAIN = FrozenQuickReply([
+    ("أسرع", "أسرع"),
+    ("ذكاء", "ذكاء"),
+    ("لون", "كلمة ولون"),
+    ("أغنية", "أغنية"),
+    ("سلسلة", "سلسلة"),
+    ("ترتيب", "ترتيب الحروف"),
+    ("تكوين", "تكوين كلمات"),
+    ("لعبة", "لعبة"),
+    ("خمن", "خمن"),
+    ("ضد", "ضد"),
+    ("ذاكرة", "ذاكرة"),
+    ("لغز", "لغز"),
+    ("رياضيات", "رياضيات")
+])
+
+# أزرار إضافية
+MORE = FrozenQuickReply([
+    ("إيموجي", "إيموجي"),
+    ("توافق", "توافق"),
+    ("مساعدة", "مساعدة")
+])
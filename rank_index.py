@@ -0,0 +1,199 @@
+"""
+ترتيب اللاعبين حسب النقاط في الذاكرة
+
+- شجرة Fenwick فوق شرائح نقاط بعرض ثابت تعطي عدد اللاعبين فوق أي شريحة في O(log n)
+- داخل الشريحة قائمة مرتبة (-النقاط، user_id)
+- الترتيب تنافسي: عدد من نقاطهم أعلى + 1، فالمتعادلون يتشاركون نفس الترتيب؛
+  user_id يحدد فقط موقع اللاعب في نافذة "اللاعبون حولك"
+- نافذة "اللاعبون حولك" تُحسب بالبحث عن الشريحة التي تحوي الموقع k
+- تُحدّث مع كل جلسة مسجلة، وتُبنى من قاعدة البيانات عبر refresh() في الخلفية
+  (عند الإقلاع ثم دورياً لالتقاط تحديثات العمليات الأخرى) - القراءة لا تحمّل شيئاً
+"""
+import bisect
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FenwickTree:
+    """مجاميع بادئة مع تحديث نقطة في O(log n) - الفهارس تبدأ من 0"""
+
+    def __init__(self, size):
+        self.size = size
+        self._tree = [0] * (size + 1)
+
+    def add(self, index, delta):
+        i = index + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, index):
+        """مجموع العناصر 0..index-1"""
+        total = 0
+        i = index
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, k):
+        """أصغر فهرس يصل عنده المجموع التراكمي إلى k (k يبدأ من 1)"""
+        position = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = position + step
+            if nxt <= self.size and self._tree[nxt] < k:
+                position = nxt
+                k -= self._tree[nxt]
+            step >>= 1
+        return position
+
+
+class RankIndex:
+    """ترتيب دقيق ونسبة مئوية ونافذة حول اللاعب"""
+
+    def __init__(self, load=None, bucket_width=10, buckets=1024, refresh_interval=300):
+        # load() تعيد صفوفاً فيها user_id, display_name, total_points
+        self.load = load
+        self.bucket_width = bucket_width
+        # المدة بين استدعاءات refresh() - يجدولها التطبيق
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        # التحديثات التي وصلت أثناء refresh() تُعاد على الترتيب الجديد
+        self._replay = None
+        self._reset(buckets)
+
+    def _reset(self, buckets):
+        self._buckets = buckets
+        self._tree = FenwickTree(buckets)
+        # الشريحة 0 لأعلى النقاط حتى يكون مجموع البادئة = عدد من هم أعلى
+        self._members = [[] for _ in range(buckets)]
+        self._players = {}
+
+    def _bucket(self, points):
+        return self._buckets - 1 - min(points // self.bucket_width, self._buckets - 1)
+
+    def _insert(self, user_id, name, points):
+        # يجب استدعاؤها مع الإمساك بالقفل
+        if points // self.bucket_width >= self._buckets:
+            self._grow(points)
+        b = self._bucket(points)
+        bisect.insort(self._members[b], (-points, user_id))
+        self._tree.add(b, 1)
+        self._players[user_id] = (points, name)
+
+    def _remove(self, user_id):
+        points, _ = self._players.pop(user_id)
+        b = self._bucket(points)
+        members = self._members[b]
+        del members[bisect.bisect_left(members, (-points, user_id))]
+        self._tree.add(b, -1)
+
+    def _grow(self, points):
+        # مضاعفة عدد الشرائح حتى تتسع للنقاط الجديدة ثم إعادة البناء
+        buckets = self._buckets
+        while points // self.bucket_width >= buckets:
+            buckets *= 2
+        players = self._players
+        self._reset(buckets)
+        for user_id, (p, name) in players.items():
+            self._insert(user_id, name, p)
+
+    def update(self, user_id, display_name, points):
+        """تسجيل مجموع نقاط اللاعب الجديد"""
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((user_id, display_name, points))
+            if self._loaded_at is None and self.load:
+                return
+            self._update(user_id, display_name, points)
+
+    def _update(self, user_id, display_name, points):
+        # يجب استدعاؤها مع الإمساك بالقفل
+        if user_id in self._players:
+            self._remove(user_id)
+        self._insert(user_id, display_name, points)
+
+    def refresh(self):
+        """إعادة بناء الترتيب من load() - القراءة والبناء خارج القفل
+
+        تُستدعى من thread الخلفية، فلا تنتظر القراءات مسح جدول users
+        """
+        with self._lock:
+            self._replay = []
+        try:
+            rows = self.load()
+            fresh = RankIndex(bucket_width=self.bucket_width, buckets=self._buckets)
+            for row in rows:
+                fresh._update(row['user_id'], row['display_name'], row['total_points'])
+        except Exception as e:
+            logger.error(f"خطأ في تحميل ترتيب اللاعبين: {e}")
+            with self._lock:
+                self._replay = None
+            return False
+
+        with self._lock:
+            self._buckets = fresh._buckets
+            self._tree = fresh._tree
+            self._members = fresh._members
+            self._players = fresh._players
+            for update in self._replay:
+                self._update(*update)
+            self._replay = None
+            self._loaded_at = time.monotonic()
+        return True
+
+    def _position(self, user_id):
+        """موقع اللاعب في الترتيب الكامل مع حسم التعادل حسب user_id"""
+        points, _ = self._players[user_id]
+        b = self._bucket(points)
+        return self._tree.prefix_sum(b) + bisect.bisect_left(self._members[b], (-points, user_id)) + 1
+
+    def _rank(self, points):
+        """الترتيب التنافسي لمن لديه points: عدد من نقاطهم أعلى + 1"""
+        b = self._bucket(points)
+        return self._tree.prefix_sum(b) + bisect.bisect_left(self._members[b], (-points,)) + 1
+
+    def _at(self, position):
+        """(user_id, points) للاعب في الموقع position"""
+        b = self._tree.find(position)
+        offset = position - self._tree.prefix_sum(b) - 1
+        negative_points, user_id = self._members[b][offset]
+        return user_id, -negative_points
+
+    def rank(self, user_id, window=2):
+        """{rank, total, top_percent, around} أو None إذا لم يكن اللاعب مرتباً
+
+        المتعادلون في النقاط لهم نفس rank، و top_percent يعني "ضمن أفضل X%"
+        """
+        with self._lock:
+            if user_id not in self._players:
+                return None
+            total = len(self._players)
+            points, _ = self._players[user_id]
+            position = self._position(user_id)
+            around = []
+            for p in range(max(1, position - window), min(total, position + window) + 1):
+                other_id, other_points = self._at(p)
+                around.append({
+                    'rank': self._rank(other_points),
+                    'user_id': other_id,
+                    'display_name': self._players[other_id][1],
+                    'total_points': other_points
+                })
+            rank = self._rank(points)
+            return {
+                'rank': rank,
+                'total': total,
+                'top_percent': rank / total * 100,
+                'around': around
+            }
+
+    def stats(self):
+        with self._lock:
+            return {'players': len(self._players), 'buckets': self._buckets,
+                    'loaded': self._loaded_at is not None}
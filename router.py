@@ -0,0 +1,33 @@
+"""
+موجه الأوامر - جدول يُبنى مرة واحدة ويربط نص الأمر بمعالجه
+"""
+
+
+def normalize_command(text):
+    """توحيد نص الأمر: إزالة المسافات الزائدة وتصغير الحروف اللاتينية"""
+    return ' '.join(text.split()).lower()
+
+
+class CommandRouter:
+    """ربط الأوامر وأسمائها البديلة بالمعالجات عبر بحث واحد في قاموس"""
+
+    def __init__(self):
+        self._routes = {}
+
+    def add(self, names, handler):
+        """تسجيل معالج لكل الأسماء المعطاة"""
+        for name in names:
+            key = normalize_command(name)
+            if key in self._routes:
+                raise ValueError(f"الأمر مسجل مسبقاً: {name}")
+            self._routes[key] = handler
+
+    def resolve(self, text):
+        """المعالج المطابق للنص أو None إذا لم يكن أمراً"""
+        handler = self._routes.get(text)
+        if handler is not None:
+            return handler
+        return self._routes.get(normalize_command(text))
+
+    def commands(self):
+        return list(self._routes)
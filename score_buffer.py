@@ -0,0 +1,362 @@
+"""
+تجميع تحديثات النقاط في الذاكرة وكتابتها دفعة واحدة (write-behind)
+
+- كل جلسة لعب منتهية تضيف فرق النقاط لكل لاعب (النقاط، +1 لعبة، +1 فوز للفائز)
+  وصف جلسة في game_sessions دون لمس قاعدة البيانات
+- flush() تُشغّل على thread كاتب قاعدة البيانات (DBWriter) في كل دورة، أو أبكر
+  عند بلوغ max_rows، وتكتب المجمّع في معاملة واحدة عبر executemany و UPSERT -
+  الجلسة تُكتب كاملة أو لا تُكتب
+- القراءات تدمج الفروق غير المكتوبة حتى يرى اللاعب نقاطه فوراً
+- كل دفعة لها رقم يُكتب في score_flushes (صف لكل عملية) داخل معاملتها نفسها؛
+  consistent_read() تقرأ الرقم في نفس لقطة القراءة فتعرف هل ظهرت الدفعة الجارية
+  كتابتها أم لا، فلا تنتظر القراءة COMMIT ولا تمسك قفلاً أثناءه
+- نفس الفروق تُجمع أيضاً لكل (مجموعة، لاعب) في group_scores، ولكل (يوم، نوع
+  لعبة، لاعب) في daily_scores، وتُكتب مع المجاميع العامة في نفس المعاملة
+"""
+import os
+import time
+import logging
+from datetime import datetime, timezone
+
+from db_writer import real_lock
+
+logger = logging.getLogger(__name__)
+
+UPSERT_USER = '''INSERT INTO users (user_id, display_name, total_points, games_played, wins, last_played)
+                 VALUES (?, ?, ?, ?, ?, ?)
+                 ON CONFLICT(user_id) DO UPDATE SET
+                     total_points = total_points + excluded.total_points,
+                     games_played = games_played + excluded.games_played,
+                     wins = wins + excluded.wins,
+                     last_played = excluded.last_played,
+                     display_name = excluded.display_name'''
+
+INSERT_SESSION = '''INSERT INTO game_sessions (game_type, chat_id, status, players,
+                                               winner_id, started_at, ended_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)'''
+
+UPSERT_GROUP_SCORE = '''INSERT INTO group_scores (group_id, user_id, display_name, total_points,
+                                                 games_played, wins, last_played)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(group_id, user_id) DO UPDATE SET
+                            total_points = total_points + excluded.total_points,
+                            games_played = games_played + excluded.games_played,
+                            wins = wins + excluded.wins,
+                            last_played = excluded.last_played,
+                            display_name = excluded.display_name'''
+
+UPSERT_DAILY_SCORE = '''INSERT INTO daily_scores (game_type, day, user_id, display_name, total_points,
+                                                 games_played, wins)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(game_type, day, user_id) DO UPDATE SET
+                            total_points = total_points + excluded.total_points,
+                            games_played = games_played + excluded.games_played,
+                            wins = wins + excluded.wins,
+                            display_name = excluded.display_name'''
+
+UPSERT_FLUSHED = '''INSERT INTO score_flushes (pid, seq) VALUES (?, ?)
+                    ON CONFLICT(pid) DO UPDATE SET seq = excluded.seq'''
+
+SELECT_FLUSHED = 'SELECT seq FROM score_flushes WHERE pid = ?'
+STALE_READ_RETRIES = 3
+
+# صف يومي إضافي يجمع كل أنواع الألعاب
+ALL_GAMES = '*'
+
+# بصيغة CURRENT_TIMESTAMP في SQLite (UTC) حتى تتوافق المقارنة النصية مع الصفوف القديمة
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+INSERT_HISTORY = '''INSERT INTO game_history (session_id, group_id, user_id, game_type, points, won, played_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)'''
+
+
+class _StaleRead(Exception):
+    """اكتملت دفعة بعد بدء لقطة القراءة وحُذفت من الذاكرة - تُعاد القراءة"""
+
+
+def utc_timestamp(moment=None):
+    """وقت UTC بصيغة TIMESTAMP_FORMAT - moment الساذج يُعامل كوقت محلي"""
+    moment = datetime.now(timezone.utc) if moment is None else moment.astimezone(timezone.utc)
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+
+def _empty_delta():
+    return {'display_name': None, 'total_points': 0, 'games_played': 0, 'wins': 0, 'last_played': None}
+
+
+def _merge_into(target, delta):
+    target['total_points'] += delta['total_points']
+    target['games_played'] += delta['games_played']
+    target['wins'] += delta['wins']
+    if delta['display_name'] is not None:
+        target['display_name'] = delta['display_name']
+    if delta['last_played'] is not None:
+        target['last_played'] = delta['last_played']
+
+
+def merge_pending(user_id, row, delta):
+    """صف المستخدم من قاعدة البيانات (أو None) بعد إضافة الفرق المعلق - يعيد dict أو None"""
+    if delta is None:
+        return dict(row) if row is not None else None
+    merged = dict(row) if row is not None else dict(_empty_delta(), user_id=user_id)
+    _merge_into(merged, delta)
+    return merged
+
+
+def merge_pending_rows(rows, pending, limit=None):
+    """دمج الفروق المعلقة في صفوف {user_id: row} مع إضافة لاعبين لهم نقاط معلقة فقط - مرتبة حسب النقاط"""
+    merged = [merge_pending(user_id, row, pending.get(user_id)) for user_id, row in rows.items()]
+    merged += [merge_pending(user_id, None, delta) for user_id, delta in pending.items() if user_id not in rows]
+    merged.sort(key=lambda row: row['total_points'], reverse=True)
+    return merged if limit is None else merged[:limit]
+
+
+class ScoreBuffer:
+    """فروق النقاط المعلقة لكل لاعب وجلسات اللعب بانتظار الكتابة"""
+
+    def __init__(self, pool, max_rows=100, on_full=None):
+        # pool: اتصال الكتابة - يُستخدم من thread الكاتب فقط
+        self.pool = pool
+        self.max_rows = max_rows
+        self.on_full = on_full
+        self._deltas = {}
+        # {(group_id, user_id): delta}
+        self._group_deltas = {}
+        # {(game_type, day, user_id): delta}
+        self._daily_deltas = {}
+        self._sessions = []
+        # الدفعة التي تُكتب الآن - تبقى مرئية للقراءة حتى اكتمال COMMIT
+        self._flushing = {}
+        self._flushing_groups = {}
+        self._flushing_daily = {}
+        # أرقام الدفعات تبدأ من وقت الإنشاء فلا تختلط بصف عملية سابقة بنفس pid
+        self._start = time.time_ns()
+        self._committed = self._start
+        # رقم الدفعة الجارية كتابتها أو None
+        self._flushing_seq = None
+        # أقفال حقيقية: تُستخدم من thread الكاتب ومن معالجات الطلبات معاً، ولا
+        # يُمسك _lock أثناء أي عملية على قاعدة البيانات
+        self._lock = real_lock()
+        self._flush_lock = real_lock()
+        self.counters = {
+            'sessions': 0,
+            'flushes': 0,
+            'rows_written': 0,
+            'errors': 0
+        }
+
+    def add_session(self, game_type, chat_id, status, started_at, players):
+        """تسجيل جلسة لعب منتهية - players من BaseGame.session_results()"""
+        now = utc_timestamp()
+        session = {
+            'game_type': game_type,
+            'chat_id': chat_id,
+            'status': status,
+            'started_at': started_at,
+            'ended_at': now,
+            'players': players
+        }
+        # نفس يوم substr(played_at, 1, 10) في تعبئة daily_scores من السجل
+        day = now[:10]
+        with self._lock:
+            for player in players:
+                user_id = player['user_id']
+                targets = (
+                    (self._deltas, user_id),
+                    (self._group_deltas, (chat_id, user_id)),
+                    (self._daily_deltas, (game_type, day, user_id)),
+                    (self._daily_deltas, (ALL_GAMES, day, user_id))
+                )
+                for deltas, key in targets:
+                    delta = deltas.get(key)
+                    if delta is None:
+                        delta = deltas[key] = _empty_delta()
+                    delta['display_name'] = player['display_name']
+                    delta['total_points'] += player['points']
+                    delta['games_played'] += 1
+                    delta['wins'] += 1 if player['won'] else 0
+                    delta['last_played'] = now
+            self._sessions.append(session)
+            self.counters['sessions'] += 1
+            rows = len(self._deltas) + len(self._group_deltas) + len(self._daily_deltas) + len(self._sessions)
+            full = rows >= self.max_rows
+        if full and self.on_full:
+            self.on_full()
+
+    def consistent_read(self, conn, read):
+        """read(seen) داخل لقطة قراءة واحدة من conn - يعيد نتيجتها
+
+        seen رقم آخر دفعة ظاهرة في اللقطة، وتمرره read لدوال pending* فتُدمج
+        الفروق غير الظاهرة فقط. إن اكتملت دفعة وخرجت من الذاكرة أثناء القراءة
+        تُعاد read في لقطة جديدة؛ وإن تكرر ذلك (صف score_flushes أقدم من الذاكرة)
+        تُدمج الدفعة الجارية دون رقم كما يفعل pending() بلا seen
+        """
+        for attempt in range(STALE_READ_RETRIES + 1):
+            conn.execute('BEGIN')
+            try:
+                row = conn.execute(SELECT_FLUSHED, (os.getpid(),)).fetchone()
+                if attempt == STALE_READ_RETRIES:
+                    return read(None)
+                return read(row[0] if row else 0)
+            except _StaleRead:
+                continue
+            finally:
+                conn.execute('COMMIT')
+
+    def _include_flushing(self, seen):
+        # يجب استدعاؤها مع الإمساك بالقفل
+        if seen is None:
+            return True
+        # رقم من عملية سابقة بنفس pid: لم تظهر أي دفعة من هذه العملية
+        seen = max(seen, self._start)
+        if seen < self._committed:
+            raise _StaleRead()
+        return self._flushing_seq is not None and seen < self._flushing_seq
+
+    def _pending(self, flushing, queued, key):
+        # يجب استدعاؤها مع الإمساك بالقفل
+        flushing = flushing.get(key)
+        queued = queued.get(key)
+        if flushing is None and queued is None:
+            return None
+        merged = _empty_delta()
+        for delta in (flushing, queued):
+            if delta is not None:
+                _merge_into(merged, delta)
+        return merged
+
+    def pending(self, user_id, seen=None):
+        """الفرق غير المكتوب للاعب أو None
+
+        seen من consistent_read؛ بدونه تُدمج الدفعة الجارية كتابتها دائماً
+        """
+        with self._lock:
+            flushing = self._flushing if self._include_flushing(seen) else {}
+            return self._pending(flushing, self._deltas, user_id)
+
+    def pending_all(self, seen=None):
+        """كل الفروق غير المكتوبة {user_id: delta}"""
+        with self._lock:
+            flushing = self._flushing if self._include_flushing(seen) else {}
+            user_ids = set(flushing) | set(self._deltas)
+            return {user_id: self._pending(flushing, self._deltas, user_id) for user_id in user_ids}
+
+    def pending_group(self, group_id, user_id=None, seen=None):
+        """فروق المجموعة غير المكتوبة {user_id: delta}، أو فرق لاعب واحد فيها"""
+        with self._lock:
+            flushing = self._flushing_groups if self._include_flushing(seen) else {}
+            if user_id is not None:
+                return self._pending(flushing, self._group_deltas, (group_id, user_id))
+            keys = {key for key in flushing if key[0] == group_id}
+            keys.update(key for key in self._group_deltas if key[0] == group_id)
+            return {key[1]: self._pending(flushing, self._group_deltas, key) for key in keys}
+
+    def pending_daily(self, game_type, since_day, seen=None):
+        """فروق daily_scores غير المكتوبة من اليوم since_day فصاعداً مجمعة لكل لاعب"""
+        with self._lock:
+            totals = {}
+            flushing = self._flushing_daily if self._include_flushing(seen) else {}
+            for deltas in (flushing, self._daily_deltas):
+                for (delta_type, day, user_id), delta in deltas.items():
+                    if delta_type != game_type or day < since_day:
+                        continue
+                    total = totals.get(user_id)
+                    if total is None:
+                        total = totals[user_id] = _empty_delta()
+                    _merge_into(total, delta)
+            return totals
+
+    def flush(self):
+        """كتابة كل المعلق في معاملة واحدة - يعيد عدد الصفوف المكتوبة"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._deltas and not self._sessions:
+                    return 0
+                deltas, self._deltas = self._deltas, {}
+                group_deltas, self._group_deltas = self._group_deltas, {}
+                daily_deltas, self._daily_deltas = self._daily_deltas, {}
+                sessions, self._sessions = self._sessions, []
+                self._flushing = deltas
+                self._flushing_groups = group_deltas
+                self._flushing_daily = daily_deltas
+                seq = self._flushing_seq = self._committed + 1
+
+            users = [
+                (user_id, d['display_name'], d['total_points'], d['games_played'], d['wins'], d['last_played'])
+                for user_id, d in deltas.items()
+            ]
+            groups = [
+                (group_id, user_id, d['display_name'], d['total_points'], d['games_played'], d['wins'],
+                 d['last_played'])
+                for (group_id, user_id), d in group_deltas.items()
+            ]
+            daily = [
+                (game_type, day, user_id, d['display_name'], d['total_points'], d['games_played'], d['wins'])
+                for (game_type, day, user_id), d in daily_deltas.items()
+            ]
+
+            def committed():
+                with self._lock:
+                    self._flushing = {}
+                    self._flushing_groups = {}
+                    self._flushing_daily = {}
+                    self._committed = seq
+                    self._flushing_seq = None
+
+            try:
+                with self.pool.write(on_commit=committed) as conn:
+                    conn.execute(UPSERT_FLUSHED, (os.getpid(), seq))
+                    conn.executemany(UPSERT_USER, users)
+                    conn.executemany(UPSERT_GROUP_SCORE, groups)
+                    conn.executemany(UPSERT_DAILY_SCORE, daily)
+                    history = []
+                    for session in sessions:
+                        players = session['players']
+                        winner = next((p['user_id'] for p in players if p['won']), None)
+                        session_id = conn.execute(INSERT_SESSION, (
+                            session['game_type'], session['chat_id'], session['status'],
+                            len(players), winner, session['started_at'], session['ended_at']
+                        )).lastrowid
+                        history.extend(
+                            (session_id, session['chat_id'], p['user_id'], session['game_type'], p['points'],
+                             1 if p['won'] else 0, session['ended_at'])
+                            for p in players
+                        )
+                    conn.executemany(INSERT_HISTORY, history)
+            except Exception as e:
+                logger.error(f"خطأ في كتابة النقاط: {e}")
+                # إعادة الدفعة للمحاولة التالية مع الحفاظ على ترتيب الجلسات
+                with self._lock:
+                    retry = (
+                        (deltas, self._deltas),
+                        (group_deltas, self._group_deltas),
+                        (daily_deltas, self._daily_deltas)
+                    )
+                    for failed, queue in retry:
+                        for key, delta in failed.items():
+                            queued = queue.get(key)
+                            if queued is not None:
+                                _merge_into(delta, queued)
+                            queue[key] = delta
+                    self._sessions = sessions + self._sessions
+                    self._flushing = {}
+                    self._flushing_groups = {}
+                    self._flushing_daily = {}
+                    self._flushing_seq = None
+                    self.counters['errors'] += 1
+                return 0
+
+            with self._lock:
+                self.counters['flushes'] += 1
+                written = len(users) + len(groups) + len(daily) + len(sessions) + len(history)
+                self.counters['rows_written'] += written
+            return written
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['pending_users'] = len(self._deltas)
+            stats['pending_group_rows'] = len(self._group_deltas)
+            stats['pending_daily_rows'] = len(self._daily_deltas)
+            stats['pending_sessions'] = len(self._sessions)
+        return stats
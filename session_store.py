@@ -0,0 +1,422 @@
+"""
+مخزن جلسات اللعب المشترك بين العمليات
+
+كل عملية gunicorn تحتفظ بسجلها الخاص، فإجابة تصل لعملية لم ترَ بدء اللعبة كانت
+تضيع. المخزن يحفظ لكل game_id سجلاً مع رقم نسخة (version) يزداد مع كل حفظ:
+- save(expected=...) تنجح فقط إذا لم يتغير السجل منذ قراءته، وإلا VersionConflict
+  فيعيد المستدعي القراءة والتطبيق (optimistic concurrency)
+- اللاعبون المسجلون وعدادات حد الرسائل تُحفظ في نفس المخزن
+
+الأنواع:
+- MemorySessionStore: داخل العملية، تُحفظ الكائنات كما هي دون ترميز (الافتراضي)
+- SQLiteSessionStore: ملف SQLite مشترك بين عمليات نفس الجهاز
+- RedisSessionStore: خادم Redis (أو أي خادم يتحدث بروتوكول RESP)
+
+المخازن المشتركة (shared=True) تحفظ bytes فقط؛ الترميز في GameRegistry.
+"""
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+from db_pool import ConnectionPool
+
+
+class VersionConflict(Exception):
+    """السجل تغير في عملية أخرى منذ قراءته"""
+
+
+class MemorySessionStore:
+    """مخزن داخل العملية مقسم بأقفال مستقلة لكل جزء"""
+
+    shared = False
+
+    def __init__(self, shards=16):
+        self._shards = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._players = set()
+        self._players_lock = threading.Lock()
+        self._hits = {}
+        self._hits_lock = threading.Lock()
+
+    def _index(self, game_id):
+        return hash(game_id) % len(self._shards)
+
+    # ---------------- الألعاب ----------------
+
+    def load(self, game_id):
+        """(version, record) أو None"""
+        i = self._index(game_id)
+        with self._locks[i]:
+            entry = self._shards[i].get(game_id)
+        return (entry[0], entry[2]) if entry else None
+
+    def save(self, game_id, record, created_at, expected=None):
+        """حفظ السجل وإرجاع رقم النسخة الجديد
+
+        expected=None يستبدل أي سجل موجود؛ 0 يعني "غير موجود"؛ غير ذلك يجب أن يطابق
+        """
+        i = self._index(game_id)
+        with self._locks[i]:
+            entry = self._shards[i].get(game_id)
+            current = entry[0] if entry else 0
+            if expected is not None and expected != current:
+                raise VersionConflict(game_id)
+            self._shards[i][game_id] = (current + 1, created_at, record)
+            return current + 1
+
+    def delete(self, game_id, expected=None):
+        """حذف السجل - يعيد False إذا لم يوجد أو تغيرت نسخته"""
+        i = self._index(game_id)
+        with self._locks[i]:
+            entry = self._shards[i].get(game_id)
+            if entry is None or (expected is not None and entry[0] != expected):
+                return False
+            del self._shards[i][game_id]
+            return True
+
+    def game_ids(self):
+        ids = []
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                ids.extend(shard)
+        return ids
+
+    def games_count(self):
+        return sum(len(shard) for shard in self._shards)
+
+    # ---------------- اللاعبون ----------------
+
+    def add_player(self, user_id):
+        """يعيد False إن كان مسجلاً"""
+        with self._players_lock:
+            if user_id in self._players:
+                return False
+            self._players.add(user_id)
+            return True
+
+    def remove_player(self, user_id):
+        """يعيد False إن لم يكن مسجلاً"""
+        with self._players_lock:
+            if user_id not in self._players:
+                return False
+            self._players.remove(user_id)
+            return True
+
+    def has_player(self, user_id):
+        with self._players_lock:
+            return user_id in self._players
+
+    def players(self):
+        with self._players_lock:
+            return set(self._players)
+
+    def players_count(self):
+        with self._players_lock:
+            return len(self._players)
+
+    # ---------------- حد الرسائل ----------------
+
+    def hit(self, key, window):
+        """عدد مرات key داخل نافذة ثابتة مدتها window ثانية بعد إضافة هذه المرة"""
+        now = time.time()
+        with self._hits_lock:
+            started, count = self._hits.get(key, (now, 0))
+            if now - started >= window:
+                started, count = now, 0
+            self._hits[key] = (started, count + 1)
+            if len(self._hits) > 10000:
+                self._hits = {k: v for k, v in self._hits.items() if now - v[0] < window}
+            return count + 1
+
+
+SQLITE_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS live_games
+       (game_id TEXT PRIMARY KEY, version INTEGER, created_at REAL, data BLOB)''',
+    # فهرس قديم لم يعد يُستخدم - حذفه يوفر تحديثه مع كل حفظ
+    '''DROP INDEX IF EXISTS idx_live_games_created''',
+    '''CREATE TABLE IF NOT EXISTS live_players (user_id TEXT PRIMARY KEY)''',
+    '''CREATE TABLE IF NOT EXISTS rate_limits
+       (key TEXT PRIMARY KEY, window_start REAL, count INTEGER)'''
+)
+
+
+class SQLiteSessionStore:
+    """مخزن في ملف SQLite منفصل تتشاركه عمليات نفس الجهاز"""
+
+    shared = True
+
+    def __init__(self, path, busy_timeout_ms=5000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.pool = ConnectionPool(path, busy_timeout_ms=busy_timeout_ms, cache_size_kb=2048, mmap_size_mb=0)
+        with self.pool.write() as conn:
+            for statement in SQLITE_SCHEMA:
+                conn.execute(statement)
+
+    def load(self, game_id):
+        row = self.pool.connection().execute(
+            'SELECT version, data FROM live_games WHERE game_id = ?', (game_id,)
+        ).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def save(self, game_id, record, created_at, expected=None):
+        with self.pool.write() as conn:
+            row = conn.execute('SELECT version FROM live_games WHERE game_id = ?', (game_id,)).fetchone()
+            current = row[0] if row else 0
+            if expected is not None and expected != current:
+                raise VersionConflict(game_id)
+            conn.execute('''INSERT INTO live_games (game_id, version, created_at, data) VALUES (?, ?, ?, ?)
+                            ON CONFLICT(game_id) DO UPDATE SET
+                                version = excluded.version, created_at = excluded.created_at,
+                                data = excluded.data''',
+                         (game_id, current + 1, created_at, record))
+        return current + 1
+
+    def delete(self, game_id, expected=None):
+        with self.pool.write() as conn:
+            if expected is None:
+                cursor = conn.execute('DELETE FROM live_games WHERE game_id = ?', (game_id,))
+            else:
+                cursor = conn.execute('DELETE FROM live_games WHERE game_id = ? AND version = ?',
+                                      (game_id, expected))
+            return cursor.rowcount > 0
+
+    def game_ids(self):
+        return [row[0] for row in self.pool.connection().execute('SELECT game_id FROM live_games')]
+
+    def games_count(self):
+        return self.pool.connection().execute('SELECT COUNT(*) FROM live_games').fetchone()[0]
+
+    def add_player(self, user_id):
+        with self.pool.write() as conn:
+            return conn.execute('INSERT OR IGNORE INTO live_players VALUES (?)', (user_id,)).rowcount > 0
+
+    def remove_player(self, user_id):
+        with self.pool.write() as conn:
+            return conn.execute('DELETE FROM live_players WHERE user_id = ?', (user_id,)).rowcount > 0
+
+    def has_player(self, user_id):
+        return self.pool.connection().execute(
+            'SELECT 1 FROM live_players WHERE user_id = ?', (user_id,)
+        ).fetchone() is not None
+
+    def players(self):
+        return {row[0] for row in self.pool.connection().execute('SELECT user_id FROM live_players')}
+
+    def players_count(self):
+        return self.pool.connection().execute('SELECT COUNT(*) FROM live_players').fetchone()[0]
+
+    def hit(self, key, window):
+        now = time.time()
+        with self.pool.write() as conn:
+            row = conn.execute('''INSERT INTO rate_limits (key, window_start, count) VALUES (?, ?, 1)
+                                  ON CONFLICT(key) DO UPDATE SET
+                                      count = CASE WHEN ? - window_start >= ? THEN 1 ELSE count + 1 END,
+                                      window_start = CASE WHEN ? - window_start >= ? THEN ? ELSE window_start END
+                                  RETURNING count''',
+                               (key, now, now, window, now, window, now)).fetchone()
+        return row[0]
+
+
+class RESPError(Exception):
+    """رد خطأ من خادم RESP"""
+
+
+class RESPConnection:
+    """اتصال بسيط ببروتوكول RESP2 - أوامر متزامنة فقط"""
+
+    def __init__(self, host, port, db=0, password=None, timeout=5):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.file = self.sock.makefile('rb')
+        if password:
+            self.command('AUTH', password)
+        if db:
+            self.command('SELECT', db)
+
+    @staticmethod
+    def _encode(args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if isinstance(arg, str):
+                arg = arg.encode()
+            elif not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def command(self, *args):
+        self.sock.sendall(self._encode(args))
+        return self._read()
+
+    def pipeline(self, *commands):
+        """إرسال عدة أوامر في رسالة واحدة وقراءة ردودها بالترتيب (رحلة واحدة للخادم)"""
+        self.sock.sendall(b''.join(self._encode(args) for args in commands))
+        replies, error = [], None
+        for _ in commands:
+            # تُقرأ كل الردود حتى بعد خطأ كي لا يبقى في الاتصال رد لأمر لاحق
+            try:
+                replies.append(self._read())
+            except RESPError as e:
+                replies.append(None)
+                error = error or e
+        if error is not None:
+            raise error
+        return replies
+
+    def _read(self):
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("انقطع الاتصال بخادم RESP")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise RESPError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self.file.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(rest)
+            if length < 0:
+                return None
+            return [self._read() for _ in range(length)]
+        raise RESPError(f"رد غير معروف: {line!r}")
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+class RedisSessionStore:
+    """مخزن على خادم Redis - النسخة جزء من القيمة وتُفحص عبر WATCH/MULTI/EXEC"""
+
+    shared = True
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='game:'):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.password = parsed.password
+        self.prefix = prefix
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = RESPConnection(self.host, self.port, self.db, self.password)
+            self._local.conn = conn
+        return conn
+
+    def _command(self, *args):
+        return self._send(lambda conn: conn.command(*args))
+
+    def _send(self, call):
+        try:
+            return call(self._conn())
+        except (OSError, ConnectionError):
+            # اتصال منقطع: محاولة واحدة باتصال جديد
+            self._local.conn = None
+            return call(self._conn())
+
+    def _key(self, game_id):
+        return f"{self.prefix}{game_id}"
+
+    @staticmethod
+    def _split(value):
+        # القيمة: version\n + البيانات
+        version, _, data = value.partition(b'\n')
+        return int(version), data
+
+    def load(self, game_id):
+        value = self._command('GET', self._key(game_id))
+        return self._split(value) if value is not None else None
+
+    def _transaction(self, game_id, expected, commands):
+        """تنفيذ commands(version) ذرياً إذا طابقت النسخة expected - يعيد الإصدار الحالي"""
+        key = self._key(game_id)
+        conn = self._conn()
+        conn.command('WATCH', key)
+        try:
+            value = conn.command('GET', key)
+            current = self._split(value)[0] if value is not None else 0
+            if expected is not None and expected != current:
+                raise VersionConflict(game_id)
+            conn.command('MULTI')
+            for args in commands(current):
+                conn.command(*args)
+            if conn.command('EXEC') is None:
+                raise VersionConflict(game_id)
+            return current
+        except BaseException:
+            conn.command('UNWATCH')
+            raise
+
+    def save(self, game_id, record, created_at, expected=None):
+        key = self._key(game_id)
+        # مجموعة المعرفات (لـ game_ids) تُحدث عند إنشاء اللعبة وحذفها فقط
+        current = self._transaction(game_id, expected, lambda current: [
+            ('SET', key, b'%d\n' % (current + 1) + record)
+        ] + ([('SADD', f"{self.prefix}ids", game_id)] if current == 0 else []))
+        return current + 1
+
+    def delete(self, game_id, expected=None):
+        key = self._key(game_id)
+        try:
+            current = self._transaction(game_id, expected, lambda current: [
+                ('DEL', key),
+                ('SREM', f"{self.prefix}ids", game_id)
+            ])
+        except VersionConflict:
+            return False
+        return current > 0
+
+    def game_ids(self):
+        return [game_id.decode() for game_id in self._command('SMEMBERS', f"{self.prefix}ids")]
+
+    def games_count(self):
+        return self._command('SCARD', f"{self.prefix}ids")
+
+    def add_player(self, user_id):
+        return self._command('SADD', f"{self.prefix}players", user_id) == 1
+
+    def remove_player(self, user_id):
+        return self._command('SREM', f"{self.prefix}players", user_id) == 1
+
+    def has_player(self, user_id):
+        return self._command('SISMEMBER', f"{self.prefix}players", user_id) == 1
+
+    def players(self):
+        return {user_id.decode() for user_id in self._command('SMEMBERS', f"{self.prefix}players")}
+
+    def players_count(self):
+        return self._command('SCARD', f"{self.prefix}players")
+
+    def hit(self, key, window):
+        key = f"{self.prefix}rate:{key}"
+        # إنشاء المفتاح بمدته ثم زيادته في معاملة واحدة: لا يبقى عداد بلا انتهاء
+        # إذا انقطع الاتصال أو انتهى المفتاح بين أمرين
+        replies = self._send(lambda conn: conn.pipeline(
+            ('MULTI',),
+            ('SET', key, 0, 'EX', max(1, int(window)), 'NX'),
+            ('INCR', key),
+            ('EXEC',)
+        ))
+        return replies[-1][1]
+
+
+def create_store(kind, shards=16, path='data/sessions.db', url='redis://localhost:6379/0'):
+    """إنشاء المخزن حسب الإعدادات: memory أو sqlite أو redis"""
+    if kind == 'sqlite':
+        return SQLiteSessionStore(path)
+    if kind == 'redis':
+        return RedisSessionStore(url)
+    return MemorySessionStore(shards)
@@ -0,0 +1,175 @@
+"""
+نسخ احتياطية متسقة من قاعدة البيانات أثناء التشغيل
+
+- اتصال المصدر يفتح معاملة قراءة تثبّت لقطة WAL واحدة، ثم تُنسخ الصفحات عبر
+  Connection.backup على خطوات صغيرة - الكتابة تستمر بالتوازي ولا يُعاد النسخ من
+  البداية عند كل تعديل
+- النسخة تُكتب في ملف مؤقت ثم تُعاد تسميتها (واختيارياً تُضغط gzip) فلا تظهر نسخة ناقصة
+- يُحتفظ بأحدث keep نسخ وتُحذف الأقدم
+- النسخ المجدولة والمطلوبة يدوياً تعمل على thread حقيقي منفصل (حتى تحت gevent)
+- أثناء النسخ لا يتقدم checkpoint بعد اللقطة، فقد يكبر ملف WAL مؤقتاً
+"""
+import os
+import gzip
+import shutil
+import sqlite3
+import time
+import logging
+from datetime import datetime
+
+from db_writer import real_lock, start_real_thread
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotManager:
+    """نسخ قاعدة البيانات على خطوات مع التدوير والجدولة"""
+
+    def __init__(self, path, directory, keep=7, pages=256, sleep_ms=10, compress=False, interval=0):
+        self.path = path
+        self.directory = directory
+        self.keep = keep
+        self.pages = pages
+        self.sleep = sleep_ms / 1000
+        self.compress = compress
+        # 0 = بدون جدولة، النسخ عند الطلب فقط
+        self.interval = interval
+        self.prefix = os.path.splitext(os.path.basename(path))[0] + '-'
+        self._lock = real_lock()
+        self._running = real_lock()
+        self._stop = real_lock()
+        self._stop.acquire()
+        self.counters = {
+            'snapshots': 0,
+            'failures': 0,
+            'deleted': 0
+        }
+        self.last = None
+
+    def start_schedule(self):
+        """تشغيل النسخ الدوري كل interval ثانية"""
+        if self.interval > 0:
+            start_real_thread(self._schedule)
+
+    def _schedule(self):
+        # انتظار إشارة الإيقاف بمهلة interval بدل sleep
+        while not self._stop.acquire(timeout=self.interval):
+            self.snapshot()
+
+    def stop(self):
+        try:
+            self._stop.release()
+        except RuntimeError:
+            pass
+
+    def trigger(self, compress=None):
+        """بدء نسخة في الخلفية - يعيد False إذا كانت نسخة أخرى جارية"""
+        if self._running.locked():
+            return False
+        start_real_thread(self.snapshot, (compress,))
+        return True
+
+    def snapshot(self, compress=None):
+        """أخذ نسخة الآن - يعيد وصفها أو None عند الفشل أو إذا كانت نسخة أخرى جارية"""
+        if not self._running.acquire(blocking=False):
+            return None
+        try:
+            return self._snapshot(self.compress if compress is None else compress)
+        except Exception as e:
+            logger.error(f"خطأ في النسخ الاحتياطي: {e}")
+            with self._lock:
+                self.counters['failures'] += 1
+            return None
+        finally:
+            self._running.release()
+
+    def _snapshot(self, compress):
+        os.makedirs(self.directory, exist_ok=True)
+        name = self.prefix + datetime.now().strftime('%Y%m%d-%H%M%S-%f') + '.db'
+        target_path = os.path.join(self.directory, name)
+        partial = target_path + '.part'
+
+        final_path = target_path + '.gz' if compress else target_path
+        started = time.perf_counter()
+        progress = {'pages': 0}
+        try:
+            self._copy(partial, progress)
+            copied_at = time.perf_counter()
+            if compress:
+                with open(partial, 'rb') as src, gzip.open(final_path + '.part', 'wb', compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                os.remove(partial)
+                os.replace(final_path + '.part', final_path)
+            else:
+                os.replace(partial, final_path)
+        except BaseException:
+            for leftover in (partial, final_path + '.part'):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            raise
+        finished = time.perf_counter()
+
+        copy_seconds = copied_at - started
+        info = {
+            'path': final_path,
+            'bytes': os.path.getsize(final_path),
+            'pages': progress['pages'],
+            'compressed': bool(compress),
+            'duration_ms': round((finished - started) * 1000, 1),
+            'copy_ms': round(copy_seconds * 1000, 1),
+            'pages_per_sec': round(progress['pages'] / copy_seconds) if copy_seconds > 0 else None,
+            'created_at': datetime.now().isoformat()
+        }
+        deleted = self._rotate()
+        with self._lock:
+            self.counters['snapshots'] += 1
+            self.counters['deleted'] += deleted
+            self.last = info
+        logger.info(f"نسخة احتياطية: {final_path} ({info['pages']} صفحة في {info['duration_ms']} مللي ثانية)")
+        return info
+
+    def _copy(self, partial, progress):
+        source = sqlite3.connect(self.path, isolation_level=None)
+        target = sqlite3.connect(partial)
+        try:
+            # تثبيت لقطة واحدة: كل الخطوات تقرأ نفس الحالة مهما كُتب بعدها
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+
+            def on_step(status, remaining, total):
+                progress['pages'] = total
+
+            source.backup(target, pages=self.pages, progress=on_step, sleep=self.sleep)
+            source.execute('COMMIT')
+        finally:
+            target.close()
+            source.close()
+
+    def files(self):
+        """النسخ الموجودة من الأحدث للأقدم"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = [
+            name for name in os.listdir(self.directory)
+            if name.startswith(self.prefix) and name.endswith(('.db', '.db.gz'))
+        ]
+        # الاسم يحوي التاريخ فالترتيب النصي ترتيب زمني
+        return [os.path.join(self.directory, name) for name in sorted(names, reverse=True)]
+
+    def _rotate(self):
+        deleted = 0
+        for old in self.files()[self.keep:]:
+            try:
+                os.remove(old)
+                deleted += 1
+            except OSError as e:
+                logger.error(f"تعذر حذف نسخة قديمة {old}: {e}")
+        return deleted
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['last'] = self.last
+        stats['running'] = self._running.locked()
+        stats['kept'] = len(self.files())
+        return stats
@@ -0,0 +1,201 @@
+"""
+اختبار نقاط الحفظ الدورية واستعادة الألعاب بعد إعادة التشغيل
+"""
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from checkpoint import Checkpointer, claim_slot, slot_path
+from game_registry import GameRegistry
+from session_store import SQLiteSessionStore
+from games import state
+from games.math_game import MathGame
+from games.riddle_game import RiddleGame
+
+
+class CountingCodec:
+    """ترميز games.state مع عد مرات الترميز"""
+
+    def __init__(self):
+        self.dumps_calls = 0
+
+    def dumps(self, value):
+        self.dumps_calls += 1
+        return state.dumps(value)
+
+    def loads(self, blob):
+        return state.loads(blob)
+
+
+def _start(registry, game_id, game_class=MathGame, game_type='رياضيات'):
+    game = game_class(None)
+    game.start_game()
+    registry.put(game_id, game, game_type, {'U1'})
+    return game
+
+
+def test_writes_only_changed_games():
+    with tempfile.TemporaryDirectory() as tmp:
+        codec = CountingCodec()
+        registry = GameRegistry(codec=codec)
+        checkpointer = Checkpointer(registry, os.path.join(tmp, 'checkpoint.db'), interval=0)
+        for game_id, game_class in (('G1', MathGame), ('G2', RiddleGame), ('G3', MathGame)):
+            game = game_class(None)
+            game.start_game()
+            registry.put(game_id, game, 'رياضيات', {'U1'})
+        registry.register('U1')
+        assert checkpointer.checkpoint()['games'] == 3
+
+        # إجابة في لعبة واحدة وإيقاف أخرى
+        game_data = registry.get('G1')
+        game_data['game'].check_answer(game_data['game'].current_answer, 'U1', 'أحمد')
+        registry.save('G1', game_data)
+        registry.remove('G3')
+        # الترميز تم في save() فالحفظ يكتب bytes فقط
+        encoded = codec.dumps_calls
+        info = checkpointer.checkpoint()
+        assert (info['games'], info['deleted'], info['players']) == (1, 1, 0)
+        assert codec.dumps_calls == encoded
+        assert checkpointer.checkpoint() is None
+        # حفظ دون تعديل (رسالة دردشة) لا يُسجل اللعبة
+        registry.save('G1', registry.get('G1'))
+        assert checkpointer.checkpoint() is None
+
+        # لعبة حُفظت ثم حُذفت تُكتب كمحذوفة
+        game_data = registry.get('G2')
+        game_data['participants'].add('U2')
+        registry.save('G2', game_data)
+        registry.store.delete('G2')
+        info = checkpointer.checkpoint()
+        assert (info['games'], info['deleted']) == (0, 1)
+
+
+def test_restore_after_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'data', 'checkpoint.db')
+        registry = GameRegistry(codec=state)
+        checkpointer = Checkpointer(registry, path, interval=0)
+        game = RiddleGame(None)
+        game.start_game()
+        game.check_answer(game.current_answer, 'U1', 'أحمد')
+        registry.put('G1', game, 'لغز', {'U1', 'U2'})
+        registry.register('U1')
+        registry.register('U2')
+        registry.unregister('U2')
+        checkpointer.stop()
+
+        # عملية جديدة
+        attached = []
+        restarted = GameRegistry(attach=attached.append, codec=state)
+        restored = Checkpointer(restarted, path, interval=0).restore()
+        assert (restored['games'], restored['players'], restored['failed']) == (1, 1, 0)
+        assert restored['bytes'] > 0 and restored['duration_ms'] >= 0
+
+        game_data = restarted.get('G1')
+        assert game_data['type'] == 'لغز' and game_data['participants'] == {'U1'}
+        assert game_data['game'].scores == game.scores and attached == [game_data['game']]
+        assert game_data['game'].current_answer == game.current_answer
+        assert restarted.is_registered('U1') and not restarted.is_registered('U2')
+        # الاستعادة لا تُحسب تغييراً يُكتب من جديد
+        assert restarted.take_changes() == ({}, set())
+
+
+def test_workers_restore_each_game_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'checkpoint.db')
+        # ثلاث عمليات على نفس المسار: لكل منها ملفها
+        workers = [GameRegistry(codec=state) for _ in range(3)]
+        checkpointers = [Checkpointer(registry, path, interval=0) for registry in workers]
+        assert [checkpointer.slot for checkpointer in checkpointers] == [0, 1, 2]
+        for i, registry in enumerate(workers):
+            _start(registry, f"G{i}")
+            registry.register(f"U{i}")
+        for checkpointer in checkpointers:
+            checkpointer.stop()
+
+        # إعادة تشغيل بعمليتين: كل لعبة تعود في عملية واحدة فقط
+        restarted = [GameRegistry(codec=state) for _ in range(2)]
+        first = Checkpointer(restarted[0], path, interval=0)
+        second = Checkpointer(restarted[1], path, interval=0)
+        info = first.restore()
+        assert (info['slot'], info['adopted'], info['games'], info['players']) == (0, 1, 2, 2)
+        assert second.restore()['games'] == 1
+        ids = [set(registry.store.game_ids()) for registry in restarted]
+        assert ids[0] == {'G0', 'G2'} and ids[1] == {'G1'}
+        assert not os.path.exists(os.path.join(tmp, 'checkpoint.2.db'))
+
+        # الألعاب المتبناة أصبحت في ملف العملية الأولى
+        first.stop()
+        second.stop()
+        again = GameRegistry(codec=state)
+        info = Checkpointer(again, path, interval=0).restore()
+        assert (info['adopted'], info['games']) == (1, 3)
+        assert again.is_registered('U2') and again.get('G2')['type'] == 'رياضيات'
+
+
+def test_participants_updated_through_run():
+    ran = []
+    registry = GameRegistry(codec=state, run=lambda game_id, task: ran.append((game_id, task)))
+    for game_id in ('G1', 'G2'):
+        _start(registry, game_id)
+    registry.register('U2')
+    # التعديل ينتظر عامل كل لعبة ولا يحدث في thread المستدعي
+    assert sorted(game_id for game_id, _ in ran) == ['G1', 'G2']
+    assert 'U2' not in registry.get('G1')['participants']
+    for _, task in ran:
+        task()
+    assert all('U2' in registry.get(game_id)['participants'] for game_id in ('G1', 'G2'))
+
+
+def test_hibernated_file_per_slot():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'checkpoint.db')
+        cold_path = os.path.join(tmp, 'hibernated.db')
+        workers = []
+        for i in range(2):
+            claim = claim_slot(path)
+            registry = GameRegistry(codec=state, cold_store=SQLiteSessionStore(slot_path(cold_path, claim[0])))
+            checkpointer = Checkpointer(registry, path, interval=0, claim=claim, companions=[cold_path])
+            _start(registry, f"G{i}")
+            registry.hibernate_idle(-1)
+            workers.append((registry, checkpointer))
+        # كل عملية تنوّم ألعابها في ملفها فقط
+        assert [checkpointer.slot for _, checkpointer in workers] == [0, 1]
+        assert [set(registry.cold.game_ids()) for registry, _ in workers] == [{'G0'}, {'G1'}]
+        for registry, checkpointer in workers:
+            checkpointer.stop()
+            registry.cold.pool.close()
+
+        # عملية واحدة بعد إعادة التشغيل تتبنى الـ slot الثاني وتحذف ملف ألعابه النائمة
+        claim = claim_slot(path)
+        restarted = GameRegistry(codec=state, cold_store=SQLiteSessionStore(slot_path(cold_path, claim[0])))
+        checkpointer = Checkpointer(restarted, path, interval=0, claim=claim, companions=[cold_path])
+        assert checkpointer.restore()['adopted'] == 1
+        assert restarted.get('G0') is not None and restarted.get('G1') is not None
+        assert not os.path.exists(slot_path(cold_path, 1))
+        checkpointer.stop()
+
+
+def run_all_tests():
+    tests = [
+        test_writes_only_changed_games,
+        test_restore_after_restart,
+        test_workers_restore_each_game_once,
+        test_participants_updated_through_run,
+        test_hibernated_file_per_slot
+    ]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ نجح - {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ فشل - {test.__name__}: {e!r}")
+    print(f"\nالنتيجة النهائية: {passed}/{len(tests)}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,90 @@
+"""
+اختبار ضغط سجل اللعب القديم
+"""
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_pool import ConnectionPool
+from compactor import HistoryCompactor
+from score_buffer import utc_timestamp
+
+
+def _make_pool(tmp, auto_vacuum='INCREMENTAL'):
+    pool = ConnectionPool(os.path.join(tmp, 'scores.db'), auto_vacuum=auto_vacuum)
+    conn = pool.connection()
+    conn.execute('''CREATE TABLE game_history
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id INTEGER, group_id TEXT, user_id TEXT,
+                     game_type TEXT, points INTEGER, won INTEGER, played_at TEXT)''')
+    conn.execute('''CREATE TABLE game_sessions
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, game_type TEXT, chat_id TEXT,
+                     status TEXT, players INTEGER, winner_id TEXT, started_at TEXT, ended_at TEXT)''')
+    old = utc_timestamp(datetime.now() - timedelta(days=200))
+    recent = utc_timestamp()
+    with pool.write() as conn:
+        conn.executemany(
+            'INSERT INTO game_history (user_id, game_type, points, won, played_at) VALUES (?, ?, ?, 0, ?)',
+            [(f"U{i % 40}", 'ذكاء', 10, old) for i in range(12000)] +
+            [(f"U{i % 40}", 'ذكاء', 10, recent) for i in range(100)]
+        )
+        conn.executemany('INSERT INTO game_sessions (game_type, ended_at) VALUES (?, ?)',
+                         [('ذكاء', old)] * 300 + [('ذكاء', recent)] * 5)
+    return pool
+
+
+def _run(compactor):
+    calls = 0
+    compactor()
+    while compactor.stats()['running']:
+        compactor()
+        calls += 1
+        assert calls < 1000
+    return compactor.stats()
+
+
+def test_compacts_old_rows_in_batches():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = _make_pool(tmp)
+        compactor = HistoryCompactor(pool, retention_days=90, batch_size=5000, vacuum_pages=100)
+        stats = _run(compactor)
+
+        conn = pool.connection()
+        assert conn.execute('SELECT COUNT(*) FROM game_history').fetchone()[0] == 100
+        assert conn.execute('SELECT COUNT(*) FROM game_sessions').fetchone()[0] == 5
+        assert (stats['rows_compacted'], stats['sessions_compacted']) == (12000, 300)
+        assert stats['batches'] >= 3
+        assert stats['bytes_reclaimed'] > 0 and stats['last_run']['free_pages'] == 0
+
+        # التشغيل التالي بعد المهلة فقط
+        assert compactor() == 0 and compactor.stats()['runs'] == 1
+
+
+def test_without_incremental_vacuum_pages_stay_free():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = _make_pool(tmp, auto_vacuum=None)
+        stats = _run(HistoryCompactor(pool, retention_days=90))
+        assert stats['rows_compacted'] == 12000
+        assert stats['bytes_reclaimed'] == 0 and stats['last_run']['free_pages'] > 0
+
+
+def run_all_tests():
+    tests = [
+        test_compacts_old_rows_in_batches,
+        test_without_incremental_vacuum_pages_stay_free
+    ]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ نجح - {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ فشل - {test.__name__}: {e!r}")
+    print(f"\nالنتيجة النهائية: {passed}/{len(tests)}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,77 @@
+"""
+اختبار سجل الألعاب (game_registry.py) مع المخزن المحلي المقسم على أجزاء
+"""
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from game_registry import GameRegistry
+from games.math_game import MathGame
+
+
+def test_sharded_registry_under_concurrency():
+    registry = GameRegistry(shards=8)
+    game_ids = [f"G{i}" for i in range(64)]
+    user_ids = [f"U{i}" for i in range(8)]
+    errors = []
+
+    def play(worker):
+        try:
+            for round_ in range(20):
+                for game_id in game_ids[worker::len(user_ids)]:
+                    previous = registry.put(game_id, MathGame(None), 'رياضيات',
+                                            registry.participants_for(user_ids[worker]))
+                    assert previous is None or previous['type'] == 'رياضيات'
+                    game_data = registry.get(game_id)
+                    assert game_data is not None and user_ids[worker] in game_data['participants']
+                    if round_ % 2:
+                        assert registry.remove(game_id) is game_data
+                registry.register(user_ids[worker])
+                registry.unregister(user_ids[worker])
+                registry.register(user_ids[worker])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=play, args=(worker,)) for worker in range(len(user_ids))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors, errors
+    # الجولة الأخيرة فردية فحذفت كل ألعابها
+    assert registry.games_count() == 0
+    assert registry.players_count() == len(user_ids)
+    assert all(registry.is_registered(user_id) for user_id in user_ids)
+
+    for game_id in game_ids:
+        registry.put(game_id, MathGame(None), 'رياضيات', {'U0'})
+    # الألعاب موزعة على أكثر من جزء
+    shards = registry.store._shards
+    assert sum(len(shard) for shard in shards) == 64 and sum(1 for shard in shards if shard) > 1
+    # التسجيل يصل لكل الألعاب في كل الأجزاء
+    registry.register('U-new')
+    assert all('U-new' in registry.get(game_id)['participants'] for game_id in game_ids)
+    assert registry.remove('G0') is not None and registry.remove('G0') is None
+    assert registry.games_count() == 63
+
+
+def run_all_tests():
+    tests = [
+        test_sharded_registry_under_concurrency
+    ]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ نجح - {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ فشل - {test.__name__}: {e!r}")
+    print(f"\nالنتيجة النهائية: {passed}/{len(tests)}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
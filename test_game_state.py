@@ -0,0 +1,111 @@
+"""
+اختبار حفظ حالة الألعاب واستعادتها (games/state.py)
+"""
+import sys
+import os
+import pickle
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import games
+from games import state
+from games.iq_game import QUESTIONS
+from game_registry import GameRegistry
+from session_store import SQLiteSessionStore
+
+PLAYERS = [(f"U{i:032x}", f"لاعب {i}") for i in range(3)]
+
+
+def _answer(game):
+    answer = game.current_answer
+    if isinstance(answer, list):
+        answer = answer[0]['word'] if isinstance(answer[0], dict) else answer[0]
+    return str(answer) if answer else 'تفاحة'
+
+
+def _persistent(game):
+    return {name: value for name, value in vars(game).items() if name not in game.TRANSIENT}
+
+
+def test_round_trip_all_games():
+    for name in games.__all__:
+        game = getattr(games, name)(None)
+        game.start_game()
+        for user_id, display_name in PLAYERS:
+            game.check_answer(_answer(game), user_id, display_name)
+
+        data = state.encode(game)
+        restored = state.decode(data)
+        assert type(restored) is type(game), name
+        assert _persistent(restored) == _persistent(game), name
+        assert len(data) < 512, (name, len(data))
+        if game.STATE_BANKS:
+            assert len(data) * 2 < len(pickle.dumps(game)), (name, len(data))
+
+        # اللعبة المستعادة تكمل اللعب
+        restored.check_answer(_answer(restored), 'U-next', 'لاعب جديد')
+        assert state.decode(state.encode(restored)).current_question == restored.current_question
+
+
+def test_banks_and_game_fields():
+    iq = games.IQGame(None)
+    iq.start_game()
+    restored = state.decode(state.encode(iq))
+    # عناصر البنك المشترك نفسها لا نسخ منها
+    assert restored.questions[0] is iq.questions[0] and restored.questions[0] in QUESTIONS
+    assert restored.hints_dict is iq.hints_dict and restored.current_answer == iq.current_answer
+
+    chain = games.ChainWordsGame(None)
+    chain.start_game()
+    chain.used_words.update({'رمان', 'نمر'})
+    assert state.decode(state.encode(chain)).used_words == chain.used_words
+
+    typing = games.FastTypingGame(None)
+    typing.start_game()
+    typing.start_time = datetime(2025, 1, 2, 3, 4, 5, 678901)
+    assert state.decode(state.encode(typing)).start_time == typing.start_time
+
+
+def test_version_and_registry_codec():
+    encoded = state.pack(games.MathGame(None))
+    try:
+        state.unpack((state.VERSION + 1,) + encoded[1:])
+        raise AssertionError("إصدار غير معروف يجب أن يُرفض")
+    except ValueError:
+        pass
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteSessionStore(os.path.join(tmp, 'sessions.db'))
+        first = GameRegistry(store=store, codec=state)
+        second = GameRegistry(store=store, codec=state)
+        game = games.SongGame(None)
+        game.start_game()
+        first.put('G1', game, 'أغنية', {'U1', 'U2'})
+
+        remote = second.get('G1')
+        assert remote['participants'] == {'U1', 'U2'} and remote['type'] == 'أغنية'
+        assert _persistent(remote['game']) == _persistent(game)
+        assert len(store.load('G1')[1]) < 512
+
+
+def run_all_tests():
+    tests = [
+        test_round_trip_all_games,
+        test_banks_and_game_fields,
+        test_version_and_registry_codec
+    ]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ نجح - {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ فشل - {test.__name__}: {e!r}")
+    print(f"\nالنتيجة النهائية: {passed}/{len(tests)}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,95 @@
+"""
+اختبار لوحة الصدارة في الذاكرة (leaderboard.py)
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from leaderboard import Leaderboard, GroupLeaderboards
+
+
+def _row(user_id, points):
+    return {'user_id': user_id, 'display_name': f"لاعب {user_id}", 'total_points': points,
+            'games_played': 1, 'wins': 0}
+
+
+def _ids(board):
+    return [entry['user_id'] for entry in board.top()]
+
+
+def test_record_updates_without_reload():
+    # قاعدة بيانات وهمية: {user_id: points}
+    db = {'U1': 50, 'U2': 40, 'U3': 30, 'U4': 20}
+    loads = []
+
+    def load(limit):
+        loads.append(limit)
+        rows = sorted(db.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [_row(user_id, points) for user_id, points in rows]
+
+    board = Leaderboard(load, size=3, refresh_interval=3600)
+    assert _ids(board) == ['U1', 'U2', 'U3'] and len(loads) == 1
+
+    # لاعب يتجاوز الثالث يدخل القائمة ويخرج الأخير، ولاعب أقل لا يغيرها
+    db['U4'] = 45
+    board.record('U4', 'لاعب U4', 45, 2, 1)
+    db['U5'] = 10
+    board.record('U5', 'لاعب U5', 10, 1, 0)
+    assert _ids(board) == ['U1', 'U4', 'U2'] and len(loads) == 1
+    version = board.version
+
+    renders = []
+    render = lambda top: renders.append(len(top)) or [entry['user_id'] for entry in top]
+    assert board.rendered(render) == ['U1', 'U4', 'U2']
+    assert board.rendered(render) == ['U1', 'U4', 'U2'] and renders == [3]
+
+    # نقص نقاط لاعب داخل القائمة يعيد التحميل عند القراءة التالية
+    db['U1'] = 5
+    board.record('U1', 'لاعب U1', 5, 3, 1)
+    assert _ids(board) == ['U4', 'U2', 'U3'] and len(loads) == 2
+    assert board.version > version and board.rendered(render) == ['U4', 'U2', 'U3'] and renders == [3, 3]
+
+    # invalidate تجبر القراءة التالية على التحميل
+    board.invalidate()
+    board.top()
+    assert len(loads) == 3 and board.stats()['updates'] == 3
+
+
+def test_group_boards_evict_least_recent():
+    loads = []
+
+    def load(group_id, limit):
+        loads.append(group_id)
+        return [_row(f"{group_id}-U1", 10)]
+
+    boards = GroupLeaderboards(load, size=5, max_groups=2)
+    first = boards.get('G1')
+    assert _ids(first) == ['G1-U1'] and boards.get('G1') is first
+    boards.get('G2').top()
+    boards.get('G1')
+    boards.get('G3').top()
+    # G2 الأقدم استخداماً هي التي خرجت
+    assert boards.get('G1') is first and boards.evictions == 1
+    boards.get('G2').top()
+    assert loads == ['G1', 'G2', 'G3', 'G2'] and boards.evictions == 2
+
+
+def run_all_tests():
+    tests = [
+        test_record_updates_without_reload,
+        test_group_boards_evict_least_recent
+    ]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ نجح - {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ فشل - {test.__name__}: {e!r}")
+    print(f"\nالنتيجة النهائية: {passed}/{len(tests)}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,198 @@
+"""
+اختبار مرسل الرسائل على خادم محلي يحاكي LINE Messaging API
+"""
+import sys
+import os
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from linebot.models import TextSendMessage
+from outbound import OutboundDispatcher, RawMessage
+import quick_replies
+
+
+class StubLineApi:
+    """خادم محلي يرد حسب قائمة ردود مبرمجة مسبقاً"""
+
+    def __init__(self):
+        self.requests = []
+        self.responses = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length))
+                stub.requests.append((self.path, body, self.headers.get('Authorization')))
+                status, payload = stub.responses.pop(0) if stub.responses else (200, {})
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _make(stub, dead_letter_path=None):
+    return OutboundDispatcher('TOKEN', base_url=stub.url, max_retries=2, backoff=0.01,
+                              timeout=5, dead_letter_path=dead_letter_path)
+
+
+def test_reply_success():
+    stub = StubLineApi()
+    try:
+        dispatcher = _make(stub)
+        assert dispatcher.reply('tok', TextSendMessage(text='مرحبا'), to='G1')
+        path, body, auth = stub.requests[0]
+        assert path == '/v2/bot/message/reply'
+        assert body == {'replyToken': 'tok', 'messages': [{'type': 'text', 'text': 'مرحبا'}]}
+        assert auth == 'Bearer TOKEN'
+        assert dispatcher.stats()['sent'] == 1
+    finally:
+        stub.close()
+
+
+def test_retry_on_server_error_and_rate_limit():
+    stub = StubLineApi()
+    try:
+        stub.responses = [(500, {}), (429, {'message': 'rate limit'}), (200, {})]
+        dispatcher = _make(stub)
+        assert dispatcher.push('G1', TextSendMessage(text='x'))
+        assert len(stub.requests) == 3
+        assert dispatcher.stats()['retries'] == 2
+    finally:
+        stub.close()
+
+
+def test_reply_not_retried_on_server_error():
+    stub = StubLineApi()
+    try:
+        # قد يكون الرد وصل: لا إعادة ولا push حتى لا تتكرر الرسالة
+        stub.responses = [(500, {}), (200, {})]
+        dispatcher = _make(stub)
+        assert not dispatcher.reply('tok', TextSendMessage(text='x'), to='G1')
+        assert len(stub.requests) == 1
+        assert dispatcher.stats()['push_fallbacks'] == 0
+
+        # 429 يعني أن الطلب لم يُنفذ فيُعاد
+        stub.requests = []
+        stub.responses = [(429, {'message': 'rate limit'}), (200, {})]
+        assert dispatcher.reply('tok', TextSendMessage(text='x'), to='G1')
+        assert [path for path, _, _ in stub.requests] == ['/v2/bot/message/reply'] * 2
+    finally:
+        stub.close()
+
+
+def test_expired_reply_token_falls_back_to_push():
+    stub = StubLineApi()
+    try:
+        stub.responses = [(400, {'message': 'Invalid reply token'}), (200, {})]
+        dispatcher = _make(stub)
+        assert dispatcher.reply('old', TextSendMessage(text='x'), to='G1')
+        assert stub.requests[1][0] == '/v2/bot/message/push'
+        assert stub.requests[1][1]['to'] == 'G1'
+        assert dispatcher.stats()['push_fallbacks'] == 1
+    finally:
+        stub.close()
+
+
+def test_undeliverable_goes_to_dead_letter():
+    stub = StubLineApi()
+    try:
+        stub.responses = [(503, {})]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'dead.jsonl')
+            dispatcher = _make(stub, dead_letter_path=path)
+            assert not dispatcher.reply('tok', TextSendMessage(text='x'), to='G1')
+            with open(path, encoding='utf-8') as f:
+                record = json.loads(f.readline())
+            assert record['status'] == 503
+            assert record['payload']['messages'] == [{'type': 'text', 'text': 'x'}]
+            assert dispatcher.stats()['dead_letters'] == 1
+    finally:
+        stub.close()
+
+
+def test_client_error_is_not_retried():
+    stub = StubLineApi()
+    try:
+        stub.responses = [(400, {'message': 'The request body has 1 error(s)'})]
+        dispatcher = _make(stub)
+        assert not dispatcher.reply('tok', TextSendMessage(text='x'), to='G1')
+        assert len(stub.requests) == 1
+        # خطأ 400 آخر يذكر الـ token لا يحول إلى push
+        stub.responses = [(400, {'message': 'reply token is malformed'})]
+        assert not dispatcher.reply('tok', TextSendMessage(text='x'), to='G1')
+        assert len(stub.requests) == 2
+    finally:
+        stub.close()
+
+
+def test_raw_message_sent_verbatim():
+    stub = StubLineApi()
+    try:
+        dispatcher = _make(stub)
+        raw = RawMessage('{"type":"text","text":"جاهز"}', quick_reply={'items': []})
+        assert dispatcher.reply('tok', [raw, TextSendMessage(text='x')])
+        path, body, auth = stub.requests[0]
+        assert body['messages'] == [
+            {'type': 'text', 'text': 'جاهز', 'quickReply': {'items': []}},
+            {'type': 'text', 'text': 'x'}
+        ]
+    finally:
+        stub.close()
+
+
+def test_frozen_quick_reply_spliced():
+    stub = StubLineApi()
+    try:
+        dispatcher = _make(stub)
+        message = TextSendMessage(text='x', quick_reply=quick_replies.MAIN.without('ذكاء'))
+        assert dispatcher.reply('tok', message)
+        sent = stub.requests[0][1]['messages'][0]
+        labels = [item['action']['label'] for item in sent['quickReply']['items']]
+        assert 'ذكاء' not in labels and len(labels) == len(quick_replies.MAIN.items) - 1
+        assert message.quick_reply is quick_replies.MAIN.without('ذكاء')
+    finally:
+        stub.close()
+
+
+def run_all_tests():
+    tests = [
+        test_reply_success,
+        test_retry_on_server_error_and_rate_limit,
+        test_reply_not_retried_on_server_error,
+        test_expired_reply_token_falls_back_to_push,
+        test_undeliverable_goes_to_dead_letter,
+        test_client_error_is_not_retried,
+        test_raw_message_sent_verbatim,
+        test_frozen_quick_reply_spliced
+    ]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ نجح - {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ فشل - {test.__name__}: {e!r}")
+    print(f"\nالنتيجة النهائية: {passed}/{len(tests)}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,138 @@
+"""
+اختبار ذاكرة أسماء المستخدمين (profile_cache.py)
+"""
+import sys
+import os
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from profile_cache import ProfileCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_persisted_and_eviction():
+    clock = FakeClock()
+    calls, persisted = [], {}
+    saved = {'U4': 'محفوظ'}
+
+    def fetch(user_id):
+        calls.append(user_id)
+        if user_id == 'U-bad':
+            raise RuntimeError("LINE")
+        return f"اسم {user_id} {len(calls)}"
+
+    # دون نتائج سالبة: U-bad لا يشغل مكاناً في الذاكرة (انظر test_failed_lookup_cached_briefly)
+    cache = ProfileCache(fetch, max_size=2, ttl=10, stale_ttl=100, negative_ttl=0,
+                         load_persisted=saved.get, persist=persisted.__setitem__, clock=clock)
+    assert cache.get('U1') == 'اسم U1 1' and persisted == {'U1': 'اسم U1 1'}
+    assert cache.get('U1') == 'اسم U1 1'
+
+    # بعد TTL يُعاد الاسم القديم دون انتظار LINE
+    clock.now += 20
+    assert cache.get('U1') == 'اسم U1 1' and calls == ['U1']
+    # بعد مدة الاحتفاظ يُجلب من جديد
+    clock.now += 100
+    assert cache.get('U1') == 'اسم U1 2' and persisted['U1'] == 'اسم U1 2'
+
+    # الاسم المحفوظ في القاعدة يُستخدم دون استدعاء LINE
+    assert cache.get('U4') == 'محفوظ' and calls == ['U1', 'U1']
+    assert cache.get('U-bad') == cache.default_name
+    cache.get('U5')
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['stale_hits'], stats['persisted_hits']) == (1, 1, 1)
+    assert (stats['misses'], stats['errors']) == (4, 1)
+    # U1 ثم U4 ثم U5 بحد أقصى 2: خرج U1 الأقدم استخداماً
+    assert (stats['size'], stats['evictions']) == (2, 1)
+    assert cache.get('U1') == 'اسم U1 5' and cache.stats()['evictions'] == 2
+
+
+def test_stale_refresh_is_deduplicated():
+    clock = FakeClock()
+    release = threading.Event()
+    calls = []
+
+    def fetch(user_id):
+        calls.append(user_id)
+        if len(calls) > 1:
+            release.wait(5)
+        return f"اسم {len(calls)}"
+
+    cache = ProfileCache(fetch, ttl=10, stale_ttl=100, clock=clock)
+    cache.start()
+    assert cache.get('U1') == 'اسم 1'
+    clock.now += 20
+    for _ in range(5):
+        assert cache.get('U1') == 'اسم 1'
+    deadline = time.monotonic() + 5
+    while len(calls) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # طلب تحديث واحد فقط مهما تكررت القراءات القديمة
+    assert calls == ['U1', 'U1'] and cache.stats()['refresh_pending'] == 1
+
+    release.set()
+    while cache.stats()['refresh_pending'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get('U1') == 'اسم 2'
+    stats = cache.stats()
+    assert (stats['refreshes'], stats['stale_hits'], stats['hits']) == (1, 5, 1)
+
+
+def test_failed_lookup_cached_briefly():
+    clock = FakeClock()
+    calls = []
+    blocked = {'U-blocked'}
+
+    def fetch(user_id):
+        calls.append(user_id)
+        if user_id in blocked:
+            raise RuntimeError("404 Not Found")
+        return f"اسم {len(calls)}"
+
+    cache = ProfileCache(fetch, ttl=10, stale_ttl=100, negative_ttl=5, clock=clock)
+    # المستخدم الذي حظر البوت لا يُطلب من LINE مع كل رسالة
+    assert [cache.get('U-blocked') for _ in range(3)] == [cache.default_name] * 3
+    assert calls == ['U-blocked']
+    stats = cache.stats()
+    assert (stats['negative_hits'], stats['errors'], stats['misses']) == (2, 1, 1)
+
+    # بعد انتهاء المدة يُعاد الطلب
+    clock.now += 6
+    blocked.clear()
+    assert cache.get('U-blocked') == 'اسم 2'
+
+    # فشل التحديث لا يستبدل الاسم القديم بنتيجة سالبة
+    clock.now += 20
+    blocked.add('U-blocked')
+    assert cache._fetch('U-blocked') is None
+    assert cache.get('U-blocked') == 'اسم 2'
+
+
+def run_all_tests():
+    tests = [
+        test_ttl_persisted_and_eviction,
+        test_stale_refresh_is_deduplicated,
+        test_failed_lookup_cached_briefly
+    ]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ نجح - {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ فشل - {test.__name__}: {e!r}")
+    print(f"\nالنتيجة النهائية: {passed}/{len(tests)}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
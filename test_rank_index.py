@@ -0,0 +1,88 @@
+"""
+اختبار ترتيب اللاعبين مقارنة بالترتيب الكامل
+"""
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rank_index import RankIndex
+
+
+def _expected(points):
+    return sorted(points, key=lambda user_id: (-points[user_id], user_id))
+
+
+def test_rank_matches_full_sort():
+    rnd = random.Random(7)
+    # شرائح قليلة وضيقة لاختبار التوسع والتعادل داخل الشريحة
+    index = RankIndex(bucket_width=7, buckets=4)
+    points = {}
+    for step in range(3000):
+        user_id = f"U{rnd.randint(0, 200)}"
+        points[user_id] = rnd.choice([rnd.randint(0, 30), rnd.randint(0, 5000)])
+        index.update(user_id, f"لاعب {user_id}", points[user_id])
+        if step % 150 == 0:
+            order = _expected(points)
+            for user_id in rnd.sample(order, min(15, len(order))):
+                info = index.rank(user_id, window=2)
+                position = order.index(user_id) + 1
+                # الترتيب التنافسي: من لديهم نقاط أكثر + 1
+                expected = sum(1 for other in points.values() if other > points[user_id]) + 1
+                assert info['rank'] == expected and info['total'] == len(order)
+                around = [p['user_id'] for p in info['around']]
+                assert around == order[max(0, position - 3):position + 2]
+                assert all(p['rank'] == sum(1 for other in points.values() if other > p['total_points']) + 1
+                           for p in info['around'])
+
+
+def test_load_and_unknown_player():
+    rows = [
+        {'user_id': 'U1', 'display_name': 'أحمد', 'total_points': 50},
+        {'user_id': 'U2', 'display_name': 'سارة', 'total_points': 80},
+        {'user_id': 'U3', 'display_name': 'علي', 'total_points': 50}
+    ]
+    index = RankIndex(lambda: rows)
+    # لا تحميل في مسار القراءة: قبل refresh() لا يوجد ترتيب
+    index.update('U1', 'أحمد', 50)
+    assert index.rank('U1') is None
+    assert index.refresh() and index.rank('U9') is None
+
+    # U1 وU3 متعادلان فلهما نفس الترتيب، وuser_id يحدد موقعهما في النافذة فقط
+    info = index.rank('U3', window=1)
+    assert (info['rank'], info['total']) == (2, 3)
+    assert [(p['user_id'], p['rank']) for p in info['around']] == [('U1', 2), ('U3', 2)]
+    assert index.rank('U1')['rank'] == 2
+
+    index.update('U3', 'علي', 90)
+    info = index.rank('U3')
+    assert info['rank'] == 1 and abs(info['top_percent'] - 100 / 3) < 1e-9
+
+    # تحديث يصل أثناء إعادة البناء لا يضيع
+    def load():
+        index.update('U4', 'منى', 70)
+        return rows
+    index.load = load
+    assert index.refresh()
+    assert [index.rank(user_id)['rank'] for user_id in ('U2', 'U4', 'U1')] == [1, 2, 3]
+
+
+def run_all_tests():
+    tests = [
+        test_rank_matches_full_sort,
+        test_load_and_unknown_player
+    ]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ نجح - {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ فشل - {test.__name__}: {e!r}")
+    print(f"\nالنتيجة النهائية: {passed}/{len(tests)}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,278 @@
+"""
+اختبار تجميع النقاط وكتابتها دفعة واحدة عبر كاتب قاعدة البيانات
+"""
+import sys
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from functools import partial
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_pool import ConnectionPool
+from db_writer import DBWriter
+from score_buffer import ScoreBuffer, merge_pending, ALL_GAMES
+from games import MathGame
+
+
+class MockLineBotApi:
+    pass
+
+
+def _make_pool(tmp):
+    pool = ConnectionPool(os.path.join(tmp, 'scores.db'))
+    conn = pool.connection()
+    conn.execute('''CREATE TABLE users
+                    (user_id TEXT PRIMARY KEY, display_name TEXT, total_points INTEGER DEFAULT 0,
+                     games_played INTEGER DEFAULT 0, wins INTEGER DEFAULT 0, last_played TEXT,
+                     registered_at TEXT DEFAULT CURRENT_TIMESTAMP)''')
+    conn.execute('''CREATE TABLE game_history
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, session_id INTEGER, group_id TEXT, user_id TEXT,
+                     game_type TEXT, points INTEGER, won INTEGER,
+                     played_at TEXT DEFAULT CURRENT_TIMESTAMP)''')
+    conn.execute('''CREATE TABLE game_sessions
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT, game_type TEXT, chat_id TEXT,
+                     status TEXT, players INTEGER, winner_id TEXT, started_at TEXT, ended_at TEXT)''')
+    conn.execute('''CREATE TABLE group_scores
+                    (group_id TEXT, user_id TEXT, display_name TEXT, total_points INTEGER DEFAULT 0,
+                     games_played INTEGER DEFAULT 0, wins INTEGER DEFAULT 0, last_played TEXT,
+                     PRIMARY KEY (group_id, user_id)) WITHOUT ROWID''')
+    conn.execute('''CREATE TABLE daily_scores
+                    (game_type TEXT, day TEXT, user_id TEXT, display_name TEXT, total_points INTEGER DEFAULT 0,
+                     games_played INTEGER DEFAULT 0, wins INTEGER DEFAULT 0,
+                     PRIMARY KEY (game_type, day, user_id)) WITHOUT ROWID''')
+    conn.execute('CREATE TABLE score_flushes (pid INTEGER PRIMARY KEY, seq INTEGER)')
+    return pool
+
+
+def _player(user_id, name, points, won=False):
+    return {'user_id': user_id, 'display_name': name, 'points': points, 'won': won}
+
+
+def _session(buffer, players, game_type='رياضيات', group_id='G1'):
+    buffer.add_session(game_type, group_id, 'completed', '2024-01-01T00:00:00', players)
+
+
+def _read(pool, buffer, user_id):
+    conn = pool.connection()
+    row, delta = buffer.consistent_read(conn, lambda seen: (
+        conn.execute('SELECT * FROM users WHERE user_id = ?', (user_id,)).fetchone(),
+        buffer.pending(user_id, seen)
+    ))
+    return merge_pending(user_id, row, delta)
+
+
+def test_pending_points_visible_before_flush():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = _make_pool(tmp)
+        buffer = ScoreBuffer(pool, max_rows=1000)
+        _session(buffer, [_player('U1', 'أحمد', 10)])
+        _session(buffer, [_player('U1', 'أحمد', 5, won=True)])
+
+        stats = _read(pool, buffer, 'U1')
+        assert stats['total_points'] == 15 and stats['games_played'] == 2 and stats['wins'] == 1
+        assert pool.connection().execute('SELECT COUNT(*) FROM users').fetchone()[0] == 0
+
+
+def test_flush_upserts_in_one_transaction():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = _make_pool(tmp)
+        buffer = ScoreBuffer(pool, max_rows=1000)
+        _session(buffer, [_player('U2', 'سارة', 20, won=True), _player('U1', 'أحمد', 10)], 'ذكاء')
+        # مستخدمان + صفا مجموعة + 4 صفوف يومية (النوع و '*') + جلسة + سطرا سجل
+        assert buffer.flush() == 11
+        _session(buffer, [_player('U1', 'أحمد علي', 7, won=True)], 'ذكاء')
+        buffer.flush()
+
+        conn = pool.connection()
+        row = conn.execute('SELECT * FROM users WHERE user_id = ?', ('U1',)).fetchone()
+        assert (row['total_points'], row['games_played'], row['wins']) == (17, 2, 1)
+        assert row['display_name'] == 'أحمد علي'
+        assert conn.execute('SELECT COUNT(*) FROM game_history').fetchone()[0] == 3
+        session = conn.execute('SELECT * FROM game_sessions ORDER BY id').fetchone()
+        assert (session['players'], session['winner_id']) == (2, 'U2')
+        linked = conn.execute('SELECT COUNT(*) FROM game_history WHERE session_id = ?', (session['id'],))
+        assert linked.fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM game_history WHERE group_id = 'G1'").fetchone()[0] == 3
+        assert _read(pool, buffer, 'U1')['total_points'] == 17
+        assert pool.stats()['transactions'] == 2
+
+
+def test_group_and_daily_scores():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = _make_pool(tmp)
+        buffer = ScoreBuffer(pool, max_rows=1000)
+        _session(buffer, [_player('U1', 'أحمد', 10, won=True)], group_id='G1')
+        _session(buffer, [_player('U1', 'أحمد', 4), _player('U2', 'سارة', 6, won=True)], group_id='G2')
+        assert set(buffer.pending_group('G2')) == {'U1', 'U2'}
+        assert buffer.pending_group('G1', 'U1')['total_points'] == 10
+        buffer.flush()
+        _session(buffer, [_player('U1', 'أحمد', 5)], group_id='G2')
+
+        conn = pool.connection()
+        rows = conn.execute('''SELECT group_id, user_id, total_points, wins FROM group_scores
+                               ORDER BY group_id, user_id''').fetchall()
+        assert [tuple(row) for row in rows] == [('G1', 'U1', 10, 1), ('G2', 'U1', 4, 0), ('G2', 'U2', 6, 1)]
+        row, delta = buffer.consistent_read(conn, lambda seen: (
+            conn.execute("SELECT * FROM group_scores WHERE group_id = 'G2' AND user_id = 'U1'").fetchone(),
+            buffer.pending_group('G2', 'U1', seen)
+        ))
+        assert merge_pending('U1', row, delta)['total_points'] == 9
+        assert _read(pool, buffer, 'U1')['total_points'] == 19
+
+        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        rows = conn.execute('''SELECT game_type, user_id, total_points, games_played FROM daily_scores
+                               WHERE day = ? ORDER BY game_type, user_id''', (today,)).fetchall()
+        assert [tuple(row) for row in rows] == [('*', 'U1', 14, 2), ('*', 'U2', 6, 1),
+                                                ('رياضيات', 'U1', 14, 2), ('رياضيات', 'U2', 6, 1)]
+        assert buffer.pending_daily(ALL_GAMES, today)['U1']['total_points'] == 5
+        assert buffer.pending_daily(ALL_GAMES, '9999-01-01') == {}
+
+
+def test_writer_stop_flushes_remaining():
+    with tempfile.TemporaryDirectory() as tmp:
+        _make_pool(tmp)
+        writer = DBWriter(os.path.join(tmp, 'scores.db'), interval_ms=60000)
+        buffer = ScoreBuffer(writer.pool, max_rows=1000, on_full=writer.wake)
+        writer.add_periodic(buffer.flush)
+        writer.start()
+        writer.submit(lambda conn: conn.execute("INSERT INTO users (user_id, display_name) VALUES ('U2', 'سارة')"))
+        writer.submit(lambda conn: conn.execute("INSERT INTO missing_table VALUES (1)"))
+        _session(buffer, [_player('U1', 'أحمد', 10)])
+        writer.stop()
+
+        reader = ConnectionPool(os.path.join(tmp, 'scores.db'), readonly=True)
+        rows = reader.connection().execute('SELECT user_id, total_points FROM users ORDER BY user_id').fetchall()
+        assert [tuple(row) for row in rows] == [('U1', 10), ('U2', 0)]
+        assert buffer.stats()['pending_users'] == 0
+        stats = writer.stats()
+        assert (stats['executed'], stats['failed'], stats['queue_depth']) == (1, 1, 0)
+
+
+def test_writer_retries_failed_transaction():
+    with tempfile.TemporaryDirectory() as tmp:
+        _make_pool(tmp)
+        writer = DBWriter(os.path.join(tmp, 'scores.db'), interval_ms=10)
+        write = writer.pool.write
+        failures = []
+
+        def busy_once(*args, **kwargs):
+            if not failures:
+                failures.append(True)
+                raise RuntimeError("database is locked")
+            return write(*args, **kwargs)
+
+        writer.pool.write = busy_once
+        writer.start()
+        for user_id in ('U1', 'U2'):
+            writer.submit(partial(_insert_user, user_id))
+        writer.stop()
+
+        # فشل BEGIN لا يُهمل الدفعة: تُعاد بعد مهلة وتُكتب بترتيبها
+        rows = writer.pool.connection().execute('SELECT user_id FROM users ORDER BY rowid').fetchall()
+        assert [row[0] for row in rows] == ['U1', 'U2']
+        stats = writer.stats()
+        assert (stats['executed'], stats['failed'], stats['retries'], stats['queue_depth']) == (2, 0, 1, 0)
+
+
+def _insert_user(user_id, conn):
+    conn.execute('INSERT INTO users (user_id) VALUES (?)', (user_id,))
+
+
+class PausingPool:
+    """اتصال كتابة يتوقف قبل COMMIT وبعده حتى يُسمح له بالمتابعة"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.reached = {'before': threading.Event(), 'after': threading.Event()}
+        self.resume = {'before': threading.Event(), 'after': threading.Event()}
+
+    def _pause(self, stage):
+        self.reached[stage].set()
+        assert self.resume[stage].wait(5)
+
+    @contextmanager
+    def write(self, on_commit=None):
+        def committed():
+            self._pause('after')
+            on_commit()
+
+        with self.pool.write(on_commit=committed) as conn:
+            yield conn
+            self._pause('before')
+
+
+def test_reads_do_not_wait_for_commit():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'scores.db')
+        _make_pool(tmp)
+        writer = PausingPool(ConnectionPool(path))
+        reader = ConnectionPool(path, readonly=True)
+        buffer = ScoreBuffer(writer, max_rows=1000)
+        _session(buffer, [_player('U1', 'أحمد', 10)])
+        flushing = threading.Thread(target=buffer.flush)
+        flushing.start()
+
+        # القراءة تكتمل والكاتب متوقف داخل المعاملة، ثم بعد COMMIT وقبل إفراغ الدفعة
+        for stage in ('before', 'after'):
+            assert writer.reached[stage].wait(5)
+            _session(buffer, [_player('U1', 'أحمد', 1)])
+            result = []
+            reading = threading.Thread(target=lambda: result.append(_read(reader, buffer, 'U1')))
+            reading.start()
+            reading.join(5)
+            assert result, stage
+            expected = 11 if stage == 'before' else 12
+            assert (result[0]['total_points'], result[0]['games_played']) == (expected, expected - 9), stage
+            writer.resume[stage].set()
+        flushing.join(5)
+        assert _read(reader, buffer, 'U1')['total_points'] == 12
+
+        # صف أقدم من الذاكرة لا يعلق القراءة
+        writer.pool.connection().execute('UPDATE score_flushes SET seq = seq - 1')
+        assert _read(reader, buffer, 'U1')['total_points'] == 12
+
+
+def test_game_counts_one_session_per_game():
+    game = MathGame(MockLineBotApi())
+    game.start_game()
+    for _ in range(3):
+        game.add_score('U1', 'أحمد', 10)
+    game.add_score('U2', 'سارة', 10)
+    results = game.session_results()
+    assert [(r['user_id'], r['points'], r['won']) for r in results] == [('U1', 30, True), ('U2', 10, False)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = _make_pool(tmp)
+        buffer = ScoreBuffer(pool)
+        _session(buffer, results)
+        buffer.flush()
+        row = pool.connection().execute('SELECT * FROM users WHERE user_id = ?', ('U1',)).fetchone()
+        assert (row['total_points'], row['games_played'], row['wins']) == (30, 1, 1)
+
+
+def run_all_tests():
+    tests = [
+        test_game_counts_one_session_per_game,
+        test_pending_points_visible_before_flush,
+        test_flush_upserts_in_one_transaction,
+        test_group_and_daily_scores,
+        test_writer_stop_flushes_remaining,
+        test_writer_retries_failed_transaction,
+        test_reads_do_not_wait_for_commit
+    ]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ نجح - {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ فشل - {test.__name__}: {e!r}")
+    print(f"\nالنتيجة النهائية: {passed}/{len(tests)}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,258 @@
+"""
+اختبار مخزن الجلسات المشترك بين العمليات
+
+كل GameRegistry هنا يمثل عملية gunicorn مستقلة فوق نفس المخزن. بدل خادم Redis
+حقيقي يعمل خادم RESP صغير داخل الاختبار يدعم الأوامر المستخدمة فقط.
+"""
+import sys
+import os
+import socketserver
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from game_registry import GameRegistry
+from session_store import SQLiteSessionStore, RedisSessionStore, VersionConflict
+from games import state
+from games.math_game import MathGame
+from games.riddle_game import RiddleGame
+
+
+class FakeRESPServer(socketserver.ThreadingTCPServer):
+    """خادم RESP في الذاكرة مع WATCH/MULTI/EXEC"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeRESPHandler)
+        self.data = {}
+        # رقم تعديل لكل مفتاح حتى تكتشف EXEC تغير المفاتيح المراقبة
+        self.revisions = {}
+        # {key: ثواني} المدة المضبوطة بـ SET EX أو EXPIRE
+        self.ttls = {}
+        self.lock = threading.Lock()
+
+    def touch(self, key):
+        self.revisions[key] = self.revisions.get(key, 0) + 1
+
+
+class FakeRESPHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        self.watched = {}
+        self.queued = None
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            self.wfile.write(self.dispatch(args))
+
+    def dispatch(self, args):
+        name = args[0].decode().upper()
+        server = self.server
+        with server.lock:
+            if name == 'WATCH':
+                self.watched.update((key, server.revisions.get(key, 0)) for key in args[1:])
+                return b'+OK\r\n'
+            if name == 'UNWATCH':
+                self.watched = {}
+                return b'+OK\r\n'
+            if name == 'MULTI':
+                self.queued = []
+                return b'+OK\r\n'
+            if name == 'EXEC':
+                queued, self.queued = self.queued, None
+                changed = any(server.revisions.get(key, 0) != revision for key, revision in self.watched.items())
+                self.watched = {}
+                if changed:
+                    return b'*-1\r\n'
+                return b'*%d\r\n' % len(queued) + b''.join(self.execute(command) for command in queued)
+            if self.queued is not None:
+                self.queued.append(args)
+                return b'+QUEUED\r\n'
+            return self.execute(args)
+
+    def execute(self, args):
+        name, key, rest = args[0].decode().upper(), args[1], args[2:]
+        data = self.server.data
+        if name in ('SET', 'DEL', 'SADD', 'SREM', 'INCR'):
+            self.server.touch(key)
+        if name == 'GET':
+            value = data.get(key)
+            return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+        if name == 'SET':
+            options = [option.upper() for option in rest[1:]]
+            if b'NX' in options and key in data:
+                return b'$-1\r\n'
+            data[key] = rest[0]
+            self.server.ttls.pop(key, None)
+            if b'EX' in options:
+                self.server.ttls[key] = int(options[options.index(b'EX') + 1])
+            return b'+OK\r\n'
+        if name == 'DEL':
+            return b':%d\r\n' % (data.pop(key, None) is not None)
+        if name == 'INCR':
+            data[key] = b'%d' % (int(data.get(key, b'0')) + 1)
+            return b':%s\r\n' % data[key]
+        if name == 'EXPIRE':
+            self.server.ttls[key] = int(rest[0])
+            return b':1\r\n'
+        if name in ('SADD', 'SREM', 'SISMEMBER', 'SMEMBERS', 'SCARD'):
+            members = data.setdefault(key, set())
+            if name == 'SADD':
+                added = rest[0] not in members
+                members.add(rest[0])
+                return b':%d\r\n' % added
+            if name == 'SREM':
+                removed = rest[0] in members
+                members.discard(rest[0])
+                return b':%d\r\n' % removed
+            if name == 'SISMEMBER':
+                return b':%d\r\n' % (rest[0] in members)
+            if name == 'SCARD':
+                return b':%d\r\n' % len(members)
+            return self.array(members)
+        return b'-ERR unknown command\r\n'
+
+    @staticmethod
+    def array(items):
+        return b'*%d\r\n' % len(items) + b''.join(b'$%d\r\n%s\r\n' % (len(item), item) for item in items)
+
+
+def _two_processes(make_store):
+    """تشغيل لعبة بين سجلين على نفس المخزن والتحقق من التوافق والتعارض"""
+    first = GameRegistry(store=make_store())
+    second = GameRegistry(store=make_store())
+
+    game = MathGame(None)
+    game.start_game()
+    first.put('G1', game, 'رياضيات', {'U1'})
+    assert second.games_count() == 1
+
+    # إجابة تصل للعملية الثانية
+    remote = second.get('G1')
+    assert remote['game'] is not game and remote['game'].current_answer == game.current_answer
+    remote['game'].check_answer(str(remote['game'].current_answer), 'U2', 'لاعب')
+    second.save('G1', remote)
+
+    # العملية الأولى ترى الإجابة، ونسختها القديمة لا تُحفظ فوقها
+    stale = {**first._cache['G1']}
+    current = first.get('G1')
+    assert current['game'].scores['لاعب'] == 10 and current['version'] == 2
+    try:
+        first.save('G1', stale)
+        raise AssertionError("الحفظ فوق نسخة أحدث يجب أن يفشل")
+    except VersionConflict:
+        pass
+    assert first.stats()['conflicts'] == 1
+
+    # اللاعبون المسجلون يُضافون للألعاب في كل العمليات
+    assert second.register('U3') and not first.register('U3')
+    assert first.is_registered('U3') and 'U3' in first.get('G1')['participants']
+
+    finished = second.remove('G1', second.get('G1')['game'])
+    assert finished and first.get('G1') is None and first.games_count() == 0
+
+    # حد الرسائل مشترك
+    store = make_store()
+    assert [store.hit('U1', 60) for _ in range(3)][-1] == 3
+    assert make_store().hit('U1', 60) == 4
+
+
+def test_sqlite_store_shared_between_registries():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sessions', 'sessions.db')
+        _two_processes(lambda: SQLiteSessionStore(path))
+
+
+def test_hibernate_idle_games_to_disk():
+    with tempfile.TemporaryDirectory() as tmp:
+        attached = []
+        path = os.path.join(tmp, 'hibernated.db')
+        registry = GameRegistry(attach=attached.append, codec=state, cold_store=SQLiteSessionStore(path))
+        for game_id in ('G1', 'G2', 'G3'):
+            game = RiddleGame(None)
+            game.start_game()
+            registry.put(game_id, game, 'لغز', {'U1'})
+        stale = registry.get('G3')
+
+        assert registry.hibernate_idle(0) == 3
+        stats = registry.stats()
+        assert (stats['resident'], stats['hibernated'], registry.games_count()) == (0, 3, 3)
+
+        # رسالة في محادثة بلا لعبة لا تقرأ القرص
+        loads = []
+        cold_load = registry.cold.load
+        registry.cold.load = lambda game_id: loads.append(game_id) or cold_load(game_id)
+        assert registry.get('G-none') is None and loads == []
+        del registry.cold.load
+
+        # الرسالة التالية توقظ اللعبة بحالتها
+        answer = registry.get('G1', wake=False)['game'].current_answer
+        assert registry.stats()['resident'] == 0
+        game_data = registry.get('G1')
+        assert game_data['game'].current_answer == answer and attached[-1] is game_data['game']
+        assert registry.get('G1') is game_data and registry.stats()['wakes'] == 1
+
+        # التسجيل يعدل الألعاب النائمة دون إيقاظها
+        registry.register('U2')
+        assert registry.stats()['resident'] == 1
+        assert registry.get('G2', wake=False)['participants'] == {'U1', 'U2'}
+
+        # رسالة كانت قيد المعالجة عند التنويم تُحفظ في النسخة على القرص
+        stale['game'].check_answer(stale['game'].current_answer, 'U1', 'أحمد')
+        registry.save('G3', stale)
+        assert registry.get('G3')['game'].scores['أحمد'] == 10
+
+        # حذف لعبة نائمة يوقظها ثم يحذفها
+        assert all(registry.remove(game_id) is not None for game_id in ('G1', 'G2', 'G3'))
+        assert registry.games_count() == 0
+
+        # عملية أخرى تشارك ملف القرص أيقظت اللعبة: لا تبقى نسختان
+        game = RiddleGame(None)
+        game.start_game()
+        registry.put('G4', game, 'لغز', {'U1'})
+        registry.hibernate_idle(0)
+        other = GameRegistry(codec=state, cold_store=SQLiteSessionStore(path))
+        assert other.get('G4') is not None
+        assert registry.get('G4') is None and registry.games_count() == 0
+
+
+def test_redis_store_with_fake_server():
+    server = FakeRESPServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"redis://127.0.0.1:{server.server_address[1]}/0"
+        _two_processes(lambda: RedisSessionStore(url))
+        # عداد حد الرسائل يُنشأ بمدته في نفس المعاملة
+        assert server.ttls == {b'game:rate:U1': 60}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run_all_tests():
+    tests = [
+        test_sqlite_store_shared_between_registries,
+        test_hibernate_idle_games_to_disk,
+        test_redis_store_with_fake_server
+    ]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ نجح - {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ فشل - {test.__name__}: {e!r}")
+    print(f"\nالنتيجة النهائية: {passed}/{len(tests)}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
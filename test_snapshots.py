@@ -0,0 +1,102 @@
+"""
+اختبار النسخ الاحتياطي أثناء الكتابة والتدوير والضغط
+"""
+import sys
+import os
+import gzip
+import sqlite3
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_pool import ConnectionPool
+from snapshots import SnapshotManager
+
+
+def _make_db(tmp, rows=3000):
+    pool = ConnectionPool(os.path.join(tmp, 'game_scores.db'))
+    with pool.write() as conn:
+        conn.execute('CREATE TABLE users (user_id TEXT PRIMARY KEY, display_name TEXT, total_points INTEGER)')
+        conn.executemany('INSERT INTO users VALUES (?, ?, ?)',
+                         [(f"U{i}", 'لاعب ' * 20, i) for i in range(rows)])
+    return pool
+
+
+def _count(path):
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+        return conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_snapshot_consistent_while_writing():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = _make_db(tmp)
+        manager = SnapshotManager(pool.path, os.path.join(tmp, 'snapshots'), pages=4, sleep_ms=1)
+        stop = threading.Event()
+        written = []
+
+        def write():
+            i = 0
+            while not stop.is_set():
+                with pool.write() as conn:
+                    conn.execute('INSERT INTO users VALUES (?, ?, ?)', (f"W{i}", 'كاتب', i))
+                i += 1
+                written.append(i)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            info = manager.snapshot()
+        finally:
+            stop.set()
+            writer.join()
+
+        assert info is not None and info['pages'] > 100 and info['pages_per_sec']
+        # لقطة واحدة: لا صفوف ناقصة من البداية، ولا أكثر مما كُتب
+        assert 3000 <= _count(info['path']) <= 3000 + len(written)
+        assert written, "الكتابة يجب أن تستمر أثناء النسخ"
+
+
+def test_rotation_and_compression():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = _make_db(tmp, rows=100)
+        manager = SnapshotManager(pool.path, os.path.join(tmp, 'snapshots'), keep=2)
+        first = manager.snapshot()
+        manager.snapshot()
+        compressed = manager.snapshot(compress=True)
+
+        files = manager.files()
+        assert files == [compressed['path'], files[1]] and first['path'] not in files
+        assert compressed['path'].endswith('.db.gz')
+        restored = os.path.join(tmp, 'restored.db')
+        with gzip.open(compressed['path'], 'rb') as src, open(restored, 'wb') as dst:
+            dst.write(src.read())
+        assert _count(restored) == 100
+
+        stats = manager.stats()
+        assert (stats['snapshots'], stats['deleted'], stats['kept']) == (3, 1, 2)
+        assert not [name for name in os.listdir(os.path.join(tmp, 'snapshots')) if name.endswith('.part')]
+
+
+def run_all_tests():
+    tests = [
+        test_snapshot_consistent_while_writing,
+        test_rotation_and_compression
+    ]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ نجح - {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ فشل - {test.__name__}: {e!r}")
+    print(f"\nالنتيجة النهائية: {passed}/{len(tests)}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
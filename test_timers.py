@@ -0,0 +1,109 @@
+"""
+اختبار المؤقتات الهرمية (timers.py) ومهل الألعاب في GameRegistry
+"""
+import sys
+import os
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from timers import TimerWheel
+from game_registry import GameRegistry
+from session_store import SQLiteSessionStore
+from games import state
+from games.math_game import MathGame
+from games.riddle_game import RiddleGame
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_timers_fire_on_time_across_levels():
+    clock = FakeClock()
+    wheel = TimerWheel(tick=1.0, slots=8, levels=3, clock=clock)
+    fired = {}
+    rng = random.Random(7)
+    # ما بعد مدى المستويات (8^3 tick) أيضاً
+    delays = [rng.uniform(0, 700) for _ in range(300)] + [1, 8, 64, 512]
+    timers = [wheel.schedule(delay, fired.__setitem__, i, None) for i, delay in enumerate(delays)]
+    for timer in timers[::10]:
+        assert wheel.cancel(timer) and not wheel.cancel(timer)
+    wheel.arm('k', 5, fired.__setitem__, 'k', None)
+    wheel.arm('k', 30, fired.__setitem__, 'k', None)
+    assert wheel.stats()['pending'] == len(delays) - len(timers[::10]) + 1
+
+    fired_at = {}
+    while wheel.stats()['pending']:
+        clock.now += 0.5
+        wheel.advance()
+        for key in fired:
+            fired_at.setdefault(key, clock.now - 1000)
+
+    for i, delay in enumerate(delays):
+        if i % 10 == 0:
+            assert i not in fired_at, i
+        else:
+            # لا ينطلق قبل موعده ولا بعده بأكثر من tick
+            assert delay <= fired_at[i] < delay + 1, (i, delay, fired_at[i])
+    assert 30 <= fired_at['k'] < 31 and not wheel.armed('k')
+    stats = wheel.stats()
+    assert stats['fired'] == len(fired) and stats['lag']['max_ms'] <= 1000
+
+
+def test_game_expiry_resets_on_activity():
+    clock = FakeClock()
+    wheel = TimerWheel(tick=1.0, clock=clock)
+    with tempfile.TemporaryDirectory() as tmp:
+        expired, handed_off = [], []
+        registry = GameRegistry(codec=state,
+                                cold_store=SQLiteSessionStore(os.path.join(tmp, 'hibernated.db')),
+                                run=lambda game_id, task: handed_off.append(game_id) or task())
+        registry.put('G0', MathGame(None), 'رياضيات', {'U1'})
+        registry.hibernate_idle(0)
+        # الألعاب الموجودة قبل ربط المؤقتات (والنائمة على القرص) تُضبط مهلتها أيضاً
+        registry.use_timers(wheel, 600, lambda game_id, game_data: expired.append((game_id, game_data['type'])))
+        for game_id in ('G1', 'G2'):
+            game = RiddleGame(None)
+            game.start_game()
+            registry.put(game_id, game, 'لغز', {'U1'})
+        registry.remove('G2')
+        assert wheel.stats()['pending'] == 2
+
+        # نشاط في G1 يؤجل مهلتها، وG0 تنتهي على القرص دون إيقاظها
+        clock.now += 500
+        registry.get('G1')
+        clock.now += 100
+        wheel.advance()
+        assert expired == [('G0', 'رياضيات')] and registry.games_count() == 1
+        clock.now += 500
+        wheel.advance()
+        assert expired[-1] == ('G1', 'لغز') and registry.games_count() == 0
+        assert wheel.stats()['pending'] == 0 and registry.stats()['wakes'] == 0
+        # المهلات تُسلم لـ run ولا يُحذف شيء على thread المؤقتات
+        assert handed_off == ['G0', 'G1']
+
+
+def run_all_tests():
+    tests = [
+        test_timers_fire_on_time_across_levels,
+        test_game_expiry_resets_on_activity
+    ]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ نجح - {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ فشل - {test.__name__}: {e!r}")
+    print(f"\nالنتيجة النهائية: {passed}/{len(tests)}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
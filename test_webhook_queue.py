@@ -0,0 +1,139 @@
+"""
+اختبار طابور الأحداث (webhook_queue.py): ترتيب أحداث المفتاح الواحد والتوازي بين المفاتيح
+"""
+import sys
+import os
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from webhook_queue import WebhookQueue
+
+
+def _wait(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "انتهت المهلة"
+        time.sleep(0.01)
+
+
+def test_per_key_order_and_single_worker():
+    processed = {}
+    active = set()
+    overlaps = []
+    threads_seen = set()
+    lock = threading.Lock()
+
+    def handle(event):
+        key, seq = event
+        with lock:
+            if key in active:
+                overlaps.append(key)
+            active.add(key)
+            threads_seen.add(threading.current_thread().name)
+        time.sleep(0.002)
+        with lock:
+            active.discard(key)
+            processed.setdefault(key, []).append(seq)
+
+    webhook_queue = WebhookQueue(handle, lambda event: event[0], workers=4, maxsize=1000)
+    webhook_queue.start()
+    keys = [f"G{i}" for i in range(6)]
+    # دفعات متداخلة بين المفاتيح
+    for batch in range(10):
+        events = [(key, batch * 3 + i) for i in range(3) for key in keys]
+        assert webhook_queue.submit_all(events)
+    _wait(lambda: webhook_queue.stats()['queue_depth'] == 0 and sum(map(len, processed.values())) == 180)
+
+    assert not overlaps, overlaps
+    for key in keys:
+        assert processed[key] == list(range(30)), (key, processed[key])
+    # المفاتيح المختلفة تُعالج على أكثر من عامل
+    assert len(threads_seen) > 1
+    assert webhook_queue.stats()['active_keys'] == 0
+
+
+def test_full_batch_rejected_whole():
+    release = threading.Event()
+    handled = []
+
+    def handle(event):
+        release.wait(5)
+        handled.append(event)
+
+    webhook_queue = WebhookQueue(handle, lambda event: event[0], workers=1, maxsize=5)
+    webhook_queue.start()
+    assert webhook_queue.submit_all([('G1', 1), ('G1', 2), ('G2', 1)])
+    # 3 + 3 > 5: لا يُضاف أي حدث من الدفعة
+    assert not webhook_queue.submit_all([('G3', 1), ('G3', 2), ('G4', 1)])
+    stats = webhook_queue.stats()
+    assert (stats['queue_depth'], stats['active_keys'], stats['rejected']) == (3, 2, 3)
+
+    release.set()
+    _wait(lambda: len(handled) == 3)
+    assert sorted(handled) == [('G1', 1), ('G1', 2), ('G2', 1)]
+    assert webhook_queue.submit_all([('G3', 1), ('G3', 2), ('G4', 1)])
+    _wait(lambda: len(handled) == 6)
+
+
+def test_stop_drains_pending_events():
+    handled = []
+
+    def handle(event):
+        time.sleep(0.005)
+        handled.append(event)
+
+    webhook_queue = WebhookQueue(handle, lambda event: event[0], workers=2, maxsize=1000)
+    webhook_queue.start()
+    events = [(f"G{i % 3}", i) for i in range(60)]
+    assert webhook_queue.submit_all(events)
+    # الإيقاف ينتظر معالجة كل الأحداث المقبولة ثم يرفض الجديدة
+    webhook_queue.stop(timeout=10)
+    assert sorted(handled, key=lambda event: event[1]) == events
+    assert not webhook_queue.submit_all([('G1', 99)])
+    stats = webhook_queue.stats()
+    assert (stats['queue_depth'], stats['active_keys'], stats['rejected']) == (0, 0, 1)
+
+
+def test_stop_without_drain_drops_waiting():
+    release = threading.Event()
+    handled = []
+
+    def handle(event):
+        release.wait(5)
+        handled.append(event)
+
+    webhook_queue = WebhookQueue(handle, lambda event: event[0], workers=1, maxsize=1000)
+    webhook_queue.start()
+    assert webhook_queue.submit_all([('G1', 1), ('G1', 2), ('G2', 1)])
+    _wait(lambda: webhook_queue.stats()['stages']['queue_wait']['count'] == 1)
+    stopping = threading.Thread(target=webhook_queue.stop, kwargs={'drain': False})
+    stopping.start()
+    _wait(lambda: webhook_queue._stopping)
+    release.set()
+    stopping.join(5)
+    # الحدث الجاري يكتمل والباقي يُهمل
+    assert handled == [('G1', 1)] and webhook_queue.stats()['dropped'] == 2
+
+
+def run_all_tests():
+    tests = [
+        test_per_key_order_and_single_worker,
+        test_full_batch_rejected_whole,
+        test_stop_drains_pending_events,
+        test_stop_without_drain_drops_waiting
+    ]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ نجح - {test.__name__}")
+            passed += 1
+        except Exception as e:
+            print(f"❌ فشل - {test.__name__}: {e!r}")
+    print(f"\nالنتيجة النهائية: {passed}/{len(tests)}")
+
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,202 @@
+"""
+مؤقتات هرمية (hierarchical timer wheel) على thread جدولة واحد
+
+بدل حلقات تنام ثم تمر على كل الألعاب، يُضبط لكل لعبة مؤقت ينطلق عند موعدها:
+- المستوى 0 فيه slots خانة بعرض tick ثانية، وكل مستوى بعده أعرض بـ slots مرة
+  (64 خانة و4 مستويات بـ tick ثانية واحدة تغطي أكثر من 190 يوماً)
+- المؤقت يوضع في خانة المستوى المناسب لبُعد موعده، وعند وصول العقرب لخانة في
+  مستوى أعلى تُنقل مؤقتاتها للمستويات الأدنى
+- الخانة dict فالإضافة والإلغاء O(1)؛ المؤقت بمفتاح (arm) يحل محل سابقه بنفس
+  المفتاح، وهذا ما يُستخدم لإعادة ضبط المهلة مع كل نشاط
+- الـ callbacks تعمل على thread الجدولة نفسه خارج القفل، فيجب أن تكون قصيرة:
+  التطبيق يسلم أي عمل فيه قراءة أو كتابة لعمال الطابور (run_in_background)
+
+التأخر (lag) هو الفرق بين الموعد المطلوب ووقت التنفيذ الفعلي: حتى tick واحد
+بطبيعة الخانات، وما زاد عليه فسببه callbacks بطيئة أو thread مشغول.
+"""
+import math
+import time
+import logging
+import threading
+
+from webhook_queue import StageTimer
+
+logger = logging.getLogger(__name__)
+
+
+class Timer:
+    """مؤقت واحد في TimerWheel"""
+    __slots__ = ('deadline', 'expires', 'callback', 'args', 'key', 'slot')
+
+    def __init__(self, deadline, expires, callback, args, key):
+        self.deadline = deadline
+        # رقم الـ tick الذي ينطلق فيه
+        self.expires = expires
+        self.callback = callback
+        self.args = args
+        self.key = key
+        # الخانة التي يوجد فيها - None بعد الانطلاق أو الإلغاء
+        self.slot = None
+
+    @property
+    def pending(self):
+        return self.slot is not None
+
+
+class TimerWheel:
+    """مؤقتات هرمية بإضافة وإلغاء O(1)"""
+
+    def __init__(self, tick=1.0, slots=64, levels=4, clock=time.monotonic):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._clock = clock
+        self._origin = clock()
+        # آخر tick تمت معالجته
+        self._now = 0
+        self._wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        # {key: Timer} للمؤقتات ذات المفتاح
+        self._keys = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.lag = StageTimer()
+        self.counters = {
+            'armed': 0,
+            'fired': 0,
+            'cancelled': 0,
+            'errors': 0
+        }
+
+    def start(self):
+        """تشغيل thread الجدولة"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="timer-wheel", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # الاستيقاظ على حدود الـ tick نفسها حتى لا يتأخر الانطلاق tick إضافياً
+        while not self._stop.wait(self.tick - (self._clock() - self._origin) % self.tick):
+            try:
+                self.advance()
+            except Exception as e:
+                logger.error(f"خطأ في جدولة المؤقتات: {e}")
+
+    # ---------------- الإضافة والإلغاء ----------------
+
+    def schedule(self, delay, callback, *args):
+        """تشغيل callback(*args) بعد delay ثانية - يعيد Timer للإلغاء"""
+        return self._arm(None, delay, callback, args)
+
+    def arm(self, key, delay, callback, *args):
+        """مثل schedule مع مفتاح: يلغي المؤقت السابق بنفس المفتاح إن وُجد"""
+        return self._arm(key, delay, callback, args)
+
+    def cancel(self, timer):
+        """إلغاء مؤقت - يعيد False إن كان قد انطلق أو أُلغي"""
+        with self._lock:
+            if timer.slot is None:
+                return False
+            self._unlink(timer)
+            self.counters['cancelled'] += 1
+            return True
+
+    def disarm(self, key):
+        """إلغاء المؤقت ذي المفتاح key - يعيد False إن لم يوجد"""
+        with self._lock:
+            timer = self._keys.get(key)
+            if timer is None:
+                return False
+            self._unlink(timer)
+            self.counters['cancelled'] += 1
+            return True
+
+    def armed(self, key):
+        with self._lock:
+            return key in self._keys
+
+    def _arm(self, key, delay, callback, args):
+        deadline = self._clock() + max(delay, 0)
+        expires = math.ceil((deadline - self._origin) / self.tick)
+        timer = Timer(deadline, expires, callback, args, key)
+        with self._lock:
+            timer.expires = max(expires, self._now + 1)
+            if key is not None:
+                previous = self._keys.get(key)
+                if previous is not None:
+                    self._unlink(previous)
+                self._keys[key] = timer
+            self._place(timer)
+            self._pending += 1
+            self.counters['armed'] += 1
+        return timer
+
+    def _place(self, timer):
+        delta = max(timer.expires - self._now, 0)
+        level, span = 0, 1
+        while delta >= span * self.slots and level < self.levels - 1:
+            level += 1
+            span *= self.slots
+        # ما بعد مدى المستوى الأعلى يوضع في آخر خانة يصلها، ويُعاد توزيعه منها
+        expires = min(timer.expires, self._now + span * self.slots - 1)
+        slot = self._wheels[level][(expires // span) % self.slots]
+        slot[timer] = None
+        timer.slot = slot
+
+    def _unlink(self, timer):
+        del timer.slot[timer]
+        timer.slot = None
+        self._pending -= 1
+        if timer.key is not None and self._keys.get(timer.key) is timer:
+            del self._keys[timer.key]
+
+    # ---------------- التقدم والتنفيذ ----------------
+
+    def advance(self, now=None):
+        """تقديم العقرب حتى now وتنفيذ المؤقتات المستحقة - يعيد عددها"""
+        now = self._clock() if now is None else now
+        target = int((now - self._origin) / self.tick)
+        due = []
+        with self._lock:
+            while self._now < target:
+                self._now += 1
+                self._cascade()
+                slot = self._wheels[0][self._now % self.slots]
+                for timer in [timer for timer in slot if timer.expires <= self._now]:
+                    self._unlink(timer)
+                    due.append(timer)
+
+        for timer in due:
+            self.lag.add(max(self._clock() - timer.deadline, 0))
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                logger.error(f"خطأ في تنفيذ مؤقت {timer.key or timer.callback}: {e}")
+                with self._lock:
+                    self.counters['errors'] += 1
+        with self._lock:
+            self.counters['fired'] += len(due)
+        return len(due)
+
+    def _cascade(self):
+        span = 1
+        for level in range(1, self.levels):
+            span *= self.slots
+            if self._now % span:
+                break
+            slot = self._wheels[level][(self._now // span) % self.slots]
+            timers = list(slot)
+            slot.clear()
+            for timer in timers:
+                self._place(timer)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['pending'] = self._pending
+        stats['lag'] = self.lag.snapshot()
+        return stats
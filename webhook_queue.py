@@ -0,0 +1,178 @@
+"""
+طابور أحداث webhook ومجموعة العمال الخلفية
+
+الأحداث تُوزع على صناديق بريد حسب المفتاح (معرف اللعبة): أحداث المفتاح
+الواحد تُعالج بالترتيب وبواسطة عامل واحد في كل مرة، والمفاتيح المختلفة
+تُعالج بالتوازي على جميع العمال.
+
+عند الإيقاف stop() يتوقف القبول ثم تُعالج الأحداث المتبقية (أو تُهمل) قبل
+انتهاء العمال، فيُستدعى قبل إيقاف كاتب قاعدة البيانات.
+"""
+import queue
+import threading
+import time
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimer:
+    """تجميع أزمنة مرحلة واحدة من مراحل المعالجة"""
+
+    def __init__(self, lock=None):
+        self._lock = lock or threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        with self._lock:
+            avg = self.total / self.count if self.count else 0.0
+            return {
+                'count': self.count,
+                'avg_ms': round(avg * 1000, 3),
+                'max_ms': round(self.max * 1000, 3)
+            }
+
+
+class WebhookQueue:
+    """طابور محدود مقسم حسب المفتاح مع عمال يفرغونه في الخلفية"""
+
+    def __init__(self, handle_event, key_func, workers=4, maxsize=1000):
+        self.handle_event = handle_event
+        self.key_func = key_func
+        self.workers = workers
+        self.maxsize = maxsize
+        # المفتاح موجود في _mailboxes طالما لديه أحداث قيد الانتظار أو المعالجة،
+        # ويظهر في _ready مرة واحدة على الأكثر
+        self._mailboxes = {}
+        self._ready = queue.Queue()
+        self._lock = threading.Lock()
+        # يُنبَّه عند فراغ الطابور (stop مع drain)
+        self._drained = threading.Condition(self._lock)
+        self._pending = 0
+        self._stopping = False
+        self._drain = True
+        self._threads = []
+        self.timers = {
+            'verify': StageTimer(),
+            'queue_wait': StageTimer(),
+            'handle': StageTimer()
+        }
+        self.rejected = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def start(self):
+        """تشغيل العمال"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"webhook-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"بدأ {self.workers} عامل لمعالجة الأحداث")
+
+    def submit_all(self, events):
+        """إضافة أحداث دفعة واحدة - يعيد False دون إضافة شيء إذا لم تتسع"""
+        now = time.perf_counter()
+        items = [(self.key_func(event), event) for event in events]
+        ready_keys = []
+
+        with self._lock:
+            if self._stopping or self._pending + len(items) > self.maxsize:
+                self.rejected += len(items)
+                return False
+
+            self._pending += len(items)
+            for key, event in items:
+                mailbox = self._mailboxes.get(key)
+                if mailbox is None:
+                    mailbox = self._mailboxes[key] = deque()
+                    ready_keys.append(key)
+                mailbox.append((event, now))
+
+        for key in ready_keys:
+            self._ready.put(key)
+        return True
+
+    def stop(self, drain=True, timeout=10):
+        """إيقاف القبول ثم انتظار العمال - drain=False يهمل الأحداث التي لم تبدأ"""
+        with self._lock:
+            self._stopping = True
+            self._drain = drain
+        if not self._threads:
+            return
+        deadline = time.monotonic() + timeout
+        with self._drained:
+            if not self._drained.wait_for(lambda: self._pending == 0, timeout):
+                logger.error(f"انتهت مهلة إيقاف طابور الأحداث: {self._pending} حدث متبقٍ")
+        for _ in self._threads:
+            self._ready.put(None)
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        self._threads = []
+
+    def _worker(self):
+        while True:
+            key = self._ready.get()
+            if key is None:
+                return
+            with self._lock:
+                mailbox = self._mailboxes[key]
+                if self._stopping and not self._drain:
+                    self.dropped += len(mailbox)
+                    self._pending -= len(mailbox)
+                    del self._mailboxes[key]
+                    self._drained.notify_all()
+                    continue
+                event, enqueued_at = mailbox.popleft()
+
+            self._run(event, enqueued_at)
+
+            with self._lock:
+                self._pending -= 1
+                if mailbox:
+                    requeue = True
+                else:
+                    del self._mailboxes[key]
+                    requeue = False
+                if not self._pending:
+                    self._drained.notify_all()
+
+            # إعادة المفتاح لآخر الطابور حتى لا تحتكر مجموعة نشطة أحد العمال
+            if requeue:
+                self._ready.put(key)
+
+    def _run(self, event, enqueued_at):
+        started = time.perf_counter()
+        self.timers['queue_wait'].add(started - enqueued_at)
+        try:
+            self.handle_event(event)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"خطأ في معالجة حدث من الطابور: {e}")
+        finally:
+            self.timers['handle'].add(time.perf_counter() - started)
+
+    def stats(self):
+        """إحصائيات الطابور وأزمنة المراحل"""
+        with self._lock:
+            pending = self._pending
+            active_keys = len(self._mailboxes)
+        return {
+            'workers': self.workers,
+            'queue_depth': pending,
+            'queue_capacity': self.maxsize,
+            'active_keys': active_keys,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'stages': {name: timer.snapshot() for name, timer in self.timers.items()}
+        }